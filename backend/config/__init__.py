@@ -1,4 +1,4 @@
 from .settings import settings
-from .logging_config import setup_logging
+from .logging_config import setup_logging, stop_logging, logging_stats
 
-__all__ = ['settings', 'setup_logging'] 
\ No newline at end of file
+__all__ = ['settings', 'setup_logging', 'stop_logging', 'logging_stats'] 
\ No newline at end of file
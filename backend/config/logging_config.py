@@ -1,10 +1,111 @@
+import atexit
 import logging
 import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
+from typing import Dict, Optional
 from .settings import settings
 
+# The running listener, so setup_logging can be called again (e.g. on reload)
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background writer thread without ever blocking.
+
+    When the bounded queue is full, records are dropped and counted instead
+    of stalling the event loop behind a slow disk.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Don't copy and format a record that would only be dropped
+        if self.queue.full():
+            self.dropped += 1
+            return
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, since they may change before the writer
+        # thread runs, but leave the (costlier) formatting to that thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in N DEBUG records from high-volume loggers.
+
+    `rates` maps a logger name to N; it also applies to the logger's children.
+    Records at INFO and above are never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate > 1}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _rate(self, name: str) -> int:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate == 1:
+            return True
+        with self._lock:
+            count = self._counts.get(record.name, 0)
+            self._counts[record.name] = count + 1
+        return count % rate == 0
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def logging_stats() -> Dict[str, int]:
+    """Queue depth and records dropped because the queue was full."""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
 def setup_logging():
+    global _listener, _queue_handler
+
     # Create logs directory if it doesn't exist
     if not os.path.exists(settings.LOG_DIR):
         os.makedirs(settings.LOG_DIR)
@@ -12,7 +113,7 @@ def setup_logging():
     # Generate filename with timestamp
     current_time = datetime.now().strftime("%Y%m%d")
     log_filename = os.path.join(
-        settings.LOG_DIR, 
+        settings.LOG_DIR,
         f"{settings.LOG_FILENAME_PREFIX}_{current_time}.log"
     )
 
@@ -43,14 +144,22 @@ def setup_logging():
     console_handler.setFormatter(console_formatter)
 
     # Remove existing handlers to avoid duplicates
+    stop_logging()
     root_logger.handlers = []
 
-    # Add handlers to root logger
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    # Loggers only enqueue records; a background thread formats and writes them
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLING))
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    root_logger.addHandler(_queue_handler)
 
     # Create logger for this module
     logger = logging.getLogger(__name__)
-    logger.info(f"Logging setup complete. Writing to {log_filename}")
+    logger.info("Logging setup complete. Writing to %s", log_filename)
+
+    return logger
+
 
-    return logger 
\ No newline at end of file
+atexit.register(stop_logging)
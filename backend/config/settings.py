@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, Optional
 import os
 from dotenv import load_dotenv, find_dotenv
 
@@ -17,10 +18,23 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = os.getenv("DB_PASSWORD")
     DB_NAME: str = os.getenv("DB_NAME")
 
+    # Async database pool settings
+    DB_POOL_SIZE: int = 10  # Connections kept open
+    DB_MAX_OVERFLOW: int = 10  # Extra connections allowed under load
+    DB_POOL_TIMEOUT: float = 10.0  # Seconds to wait for a connection before failing
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+
     # Authentication settings
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    USER_CACHE_ENABLED: bool = True  # Cache authenticated users between requests
+    USER_CACHE_TTL: float = 300.0  # Seconds, further bounded by the token's expiry
+    USER_CACHE_NEGATIVE_TTL: float = 30.0  # Seconds an unknown user stays cached
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    BCRYPT_ROUNDS: int = 12  # Existing hashes with another cost are rehashed on login
+    PASSWORD_HASH_WORKERS: Optional[int] = None  # Defaults to min(4, number of cores)
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Further logins are rejected with 503
 
     # API settings
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY")
@@ -30,6 +44,94 @@ class Settings(BaseSettings):
     GOOGLE_SEARCH_NUM_RESULTS: int = 10
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
 
+    # Outbound HTTP connection pool settings
+    HTTP_POOL_LIMIT: int = 100  # Total simultaneous connections
+    HTTP_POOL_LIMIT_PER_HOST: int = 20
+    HTTP_DNS_CACHE_TTL: int = 300  # Seconds
+    HTTP_KEEPALIVE_TIMEOUT: float = 30.0  # Seconds
+    HTTP_REQUEST_TIMEOUT: float = 30.0  # Seconds
+
+    # Page fetch client settings
+    FETCH_HTTP2: bool = True
+    FETCH_MAX_CONNECTIONS: int = 100
+    FETCH_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    FETCH_KEEPALIVE_EXPIRY: float = 30.0  # Seconds
+    FETCH_TIMEOUT: float = 20.0  # Seconds
+    FETCH_CONNECT_TIMEOUT: float = 10.0  # Seconds
+
+    # Page fetch scheduling settings
+    FETCH_MAX_CONCURRENCY: int = 10  # Simultaneous fetches across all requests
+    FETCH_PER_DOMAIN_RATE: float = 2.0  # Requests per second per domain
+    FETCH_PER_DOMAIN_BURST: float = 4.0
+    FETCH_BATCH_DEADLINE: float = 30.0  # Seconds allowed for a /fetch-urls batch
+
+    # HTML extraction settings
+    EXTRACTION_EXECUTOR: str = "process"  # One of: process, thread, inline
+    EXTRACTION_WORKERS: Optional[int] = None  # Defaults to the number of cores
+    EXTRACTION_START_METHOD: str = "spawn"  # Multiprocessing start method
+    HTML_EXTRACTION_ENGINE: str = "bs4"  # One of: bs4, lxml (faster; repairs some malformed pages differently)
+
+    # Fetched page cache settings
+    PAGE_CACHE_ENABLED: bool = True
+    PAGE_CACHE_DIR: str = "cache/pages"
+    PAGE_CACHE_TTL: int = 24 * 60 * 60  # Seconds before a page is revalidated
+    PAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB
+
+    # Search result cache settings
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_TTL: int = 60 * 60  # Seconds before a query is searched again
+    SEARCH_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32MB
+    SEARCH_CACHE_SQLITE_PATH: Optional[str] = None  # e.g. "cache/search.sqlite3"
+
+    # LLM response cache settings
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_BACKEND: str = "memory"  # One of: memory, disk
+    LLM_CACHE_PATH: str = "cache/llm_responses.sqlite3"  # Used by the disk backend
+    LLM_CACHE_TTL: int = 24 * 60 * 60  # Seconds a response stays valid
+    LLM_CACHE_MAX_ENTRIES: int = 2000
+
+    # Structured output settings
+    STRUCTURED_OUTPUT_NATIVE: bool = True  # Use provider tool-use / JSON mode for JSON responses
+    STRUCTURED_OUTPUT_REPAIR_ATTEMPTS: int = 1  # Repair requests before giving up on invalid JSON
+
+    # Question analysis settings
+    ANALYSIS_SPECULATIVE: bool = False  # Stream the analysis while the current events check runs
+    ANALYSIS_SPECULATION_STRATEGY: str = "restart"  # One of: merge, restart
+
+    # Relevance scoring settings
+    SCORING_BATCH_WINDOW: float = 0.15  # Seconds to gather results from other queries
+    SCORING_MAX_BATCH_RESULTS: int = 40  # Send a batch early once it holds this many results
+    RELEVANCE_SCORING_MODE: str = "hybrid"  # One of: llm, local, hybrid
+    PRE_RANK_BAND_LOW: float = 10.0  # Hybrid mode sends local scores in [low, high] to the LLM
+    PRE_RANK_BAND_HIGH: float = 60.0
+    PRE_RANK_CALIBRATED_LOW: float = 30.0  # Local scores are rescaled so the band edges land here
+    PRE_RANK_CALIBRATED_HIGH: float = 90.0  # on the LLM's rubric and sort alongside LLM scores
+    PRE_RANK_BM25_WEIGHT: float = 0.5  # Remainder weights hashed-vector cosine similarity
+
+    # Research answer context packing settings
+    CONTEXT_PASSAGE_TOKENS: int = 200  # Target size of the passages sources are split into
+    CONTEXT_TOKEN_BUDGET_DEFAULT: int = 24000  # Source tokens per answer for unlisted models
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {
+        "claude-3-5-sonnet-20241022": 48000,
+        "claude-3-5-haiku-20241022": 24000,
+        "gpt-4-turbo-preview": 32000,
+    }
+
+    # Map-reduce answer synthesis settings
+    SYNTHESIS_MAP_CONCURRENCY: int = 4  # Concurrent per-source extraction calls
+    SYNTHESIS_MAP_CHUNK_TOKENS: int = 6000  # Larger sources are split into chunks of this size
+    SYNTHESIS_MAP_REDUCE_MIN_SOURCES: int = 8  # 'auto' mode uses map-reduce from this many sources
+
+    # LLM admission control settings
+    LLM_ADMISSION_ENABLED: bool = True
+    LLM_MAX_CONCURRENCY: int = 8  # Per-model ceiling for in-flight requests
+    LLM_MIN_CONCURRENCY: int = 1  # Floor the adaptive limit backs off to
+    LLM_AIMD_DECREASE: float = 0.5  # Limit multiplier on 429/529 responses
+    LLM_TOKENS_PER_MINUTE_DEFAULT: int = 80000
+    LLM_TOKENS_PER_MINUTE: Dict[str, int] = {}  # Per-model overrides
+    LLM_MAX_RETRIES: int = 4
+    LLM_RETRY_BASE_DELAY: float = 1.0  # Seconds; doubled per retry, with jitter
+
     # CORS settings
     CORS_ORIGINS: list[str] = ["*"]  # In production, specify exact origins
     CORS_ALLOW_CREDENTIALS: bool = True
@@ -38,21 +140,32 @@ class Settings(BaseSettings):
     CORS_EXPOSE_HEADERS: list[str] = ["Authorization"]
 
     # Logging settings
-    LOG_LEVEL: str = "DEBUG"
-    # LOG_LEVEL: str = "INFO"
+    LOG_LEVEL: str = "INFO"
     LOG_DIR: str = "logs"
     LOG_FILENAME_PREFIX: str = "app"
     LOG_MAX_BYTES: int = 10 * 1024 * 1024  # 10MB
     LOG_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped rather than blocking
+    # Keep one in N DEBUG records from these high-volume loggers
+    LOG_SAMPLING: Dict[str, int] = {"services.ai_service": 10}
+
+    # Tracing settings
+    TRACING_EXPORTER: str = "none"  # One of: none, jsonl, otlp
+    TRACING_FILE: str = "logs/traces.jsonl"
+    TRACING_QUEUE_SIZE: int = 10000  # Finished spans beyond this are dropped
+    TRACING_BATCH_SIZE: int = 100  # Spans written per file append
+    TRACING_CORRELATION_HEADER: str = "X-Correlation-ID"
 
     # Neo4j Settings
     NEO4J_URI: str = "neo4j+ssc://801e8074.databases.neo4j.io"
     NEO4J_API_KEY: str = os.getenv("NEO4J_API_KEY", "")
     NEO4J_DATABASE: str = os.getenv("NEO4J_DATABASE", "neo4j")
+    NEO4J_WRITE_BATCH_SIZE: int = 500  # Rows per UNWIND statement when storing graph elements
+    NEO4J_SCHEMA_ON_STARTUP: bool = True  # Create missing indexes and constraints at startup
 
     @property
-    def DATABASE_URL(self) -> str:
-        return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
     @property
     def anthropic_model(self) -> str:
@@ -1,47 +1,69 @@
-from typing import Generator
+from typing import AsyncGenerator
 import logging
+from fastapi import Depends
 from models import Base
 from config.settings import settings
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import pymysql
-pymysql.install_as_MySQLdb()
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 logger = logging.getLogger(__name__)
 
-# Create engine with AWS RDS connection
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=1800,
+# Async engine with AWS RDS connection; queries never block the event loop
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
     pool_pre_ping=True
 )
 
-# Create sessionmaker
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit, since handlers return them after the session closes
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False)
 
 
-def get_db() -> Generator:
+def get_session_factory() -> async_sessionmaker:
     """
-    FastAPI dependency that provides a database session
+    FastAPI dependency that provides the async session factory
+
+    Both get_async_db and auth_service.validate_token open their sessions
+    from it, so overriding it (e.g. in tests) redirects every session.
+
+    Returns:
+        async_sessionmaker: Factory for AsyncSession objects
+    """
+    return AsyncSessionLocal
+
+
+async def get_async_db(
+    session_factory: async_sessionmaker = Depends(get_session_factory)
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency that provides an async database session
+
+    The session checks out a pooled connection on its first query rather
+    than when it is created. Depend on this only in endpoints that query the
+    database; a dependency is not released until the response, including any
+    stream, has finished.
 
     Yields:
-        Session: SQLAlchemy database session
+        AsyncSession: SQLAlchemy async database session
     """
-    db = SessionLocal()
-    try:
+    async with session_factory() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
+async def init_db():
     logger.info("Initializing database...")
     try:
-        Base.metadata.create_all(bind=engine)
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
         raise e
+
+
+async def close_db():
+    """Close all pooled connections"""
+    await async_engine.dispose()
@@ -0,0 +1,224 @@
+# CPU-bound HTML extraction helpers. These run in worker processes, so keep
+# them free of application state and settings. The module lives outside the
+# services package so that importing it in a worker doesn't import the app.
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+from bs4 import BeautifulSoup
+import bleach
+import lxml.html
+
+logger = logging.getLogger(__name__)
+
+# Configure allowed HTML tags and attributes
+ALLOWED_TAGS = [
+    'p', 'br', 'b', 'i', 'u', 'em', 'strong', 'a', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'table', 'thead', 'tbody', 'tr', 'td', 'th',
+    'ul', 'ol', 'li', 'blockquote', 'pre', 'code', 'hr', 'div', 'span', 'img'
+]
+
+ALLOWED_ATTRIBUTES = {
+    '*': ['class'],
+    'a': ['href', 'title'],
+    'img': ['src', 'alt', 'title', 'width', 'height'],
+}
+
+REMOVED_TAGS = ["script", "style", "iframe", "noscript"]
+
+NO_TITLE = "No title found"
+
+# Bump when extraction output changes so cached extractions are redone
+EXTRACTOR_VERSION = 2
+
+# Tags whose text BeautifulSoup keeps verbatim
+PRESERVE_WHITESPACE_TAGS = ('pre', 'textarea')
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+WARMUP_HTML = "<html><head><title>warmup</title></head><body><main><p>ok</p></main></body></html>"
+
+
+class ExtractionEngine(ABC):
+    """Base class for HTML extraction engines"""
+
+    name: str
+
+    @abstractmethod
+    def extract_main_content(self, html: str) -> Tuple[str, str]:
+        """
+        Strip non-content elements and locate the main content of a page.
+
+        Args:
+            html (str): Raw HTML of the page
+
+        Returns:
+            Tuple[str, str]: The page title and the serialized main content HTML
+        """
+        pass
+
+
+class BeautifulSoupEngine(ExtractionEngine):
+    """Pure-Python engine using BeautifulSoup's html.parser"""
+
+    name = "bs4"
+
+    def extract_main_content(self, html: str) -> Tuple[str, str]:
+        # Parse the HTML content
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Extract title
+        title = str(soup.title.string) if soup.title and soup.title.string else NO_TITLE
+
+        # Clean up the content
+        # Remove script and style elements
+        for script in soup(REMOVED_TAGS):
+            script.decompose()
+
+        # Find the main content area (this is a simple heuristic - might need adjustment)
+        main_content = soup.find('main') or soup.find('article') or soup.find('body')
+        return title, str(main_content)
+
+
+def _collapse_whitespace(text: Optional[str]) -> Optional[str]:
+    # BeautifulSoup replaces whitespace-only strings with a single newline or space
+    if not text or text.strip(ASCII_SPACES):
+        return text
+    return '\n' if '\n' in text else ' '
+
+
+class LxmlEngine(ExtractionEngine):
+    """
+    C-backed engine using lxml. Removes scripts and styles and finds the
+    title and main/article/body candidates in a single pass over the tree.
+
+    Output matches the BeautifulSoup engine for well-formed pages and for
+    common breakage (misnested and stray tags, implied end tags, markup in
+    scripts), but lxml repairs some documents differently:
+
+    - Text after an unclosed block element is kept inside it, where
+      html.parser may drop it
+    - Pages without <body>, <main> or <article> get an implied body, where
+      the BeautifulSoup engine finds no content
+    - The first of duplicated attributes wins, where html.parser keeps the last
+    """
+
+    name = "lxml"
+
+    def extract_main_content(self, html: str) -> Tuple[str, str]:
+        root = lxml.html.document_fromstring(html)
+
+        title = None
+        candidates: Dict[str, lxml.html.HtmlElement] = {}
+        removed = []
+
+        # Depth-first walk in document order, skipping removed subtrees.
+        # Each entry carries whether its parent preserves whitespace.
+        stack = [(root, False)]
+        while stack:
+            element, parent_preserves = stack.pop()
+            tag = element.tag
+            if not isinstance(tag, str):
+                # Comments and processing instructions
+                if not parent_preserves:
+                    element.tail = _collapse_whitespace(element.tail)
+                continue
+            if tag in REMOVED_TAGS:
+                if not parent_preserves:
+                    element.tail = _collapse_whitespace(element.tail)
+                removed.append(element)
+                continue
+            if tag == 'title':
+                if title is None:
+                    title = element
+            elif tag in ('main', 'article', 'body'):
+                candidates.setdefault(tag, element)
+
+            # Match BeautifulSoup's whitespace handling and attribute order
+            preserves = parent_preserves or tag in PRESERVE_WHITESPACE_TAGS
+            if not preserves:
+                element.text = _collapse_whitespace(element.text)
+            if not parent_preserves:
+                element.tail = _collapse_whitespace(element.tail)
+            if len(element.attrib) > 1:
+                attributes = sorted(element.attrib.items())
+                element.attrib.clear()
+                element.attrib.update(attributes)
+
+            stack.extend((child, preserves) for child in reversed(element))
+
+        for element in removed:
+            element.drop_tree()
+
+        title_text = title.text if title is not None and len(title) == 0 else None
+        # Elements with no children are falsy in lxml, so test for None explicitly
+        main_content = next(
+            (candidates[tag] for tag in ('main', 'article', 'body') if tag in candidates), None)
+        if main_content is None:
+            return title_text or NO_TITLE, "None"
+        return title_text or NO_TITLE, lxml.html.tostring(
+            main_content, encoding='unicode', with_tail=False)
+
+
+ENGINES: Dict[str, ExtractionEngine] = {
+    engine.name: engine for engine in (BeautifulSoupEngine(), LxmlEngine())
+}
+
+DEFAULT_ENGINE = "bs4"
+
+
+def get_engine(name: Optional[str] = None) -> ExtractionEngine:
+    """
+    Get an extraction engine by name.
+
+    Args:
+        name (str, optional): Engine name ('bs4' or 'lxml'), defaults to 'bs4'
+
+    Returns:
+        ExtractionEngine: The requested engine
+    """
+    engine = ENGINES.get(name or DEFAULT_ENGINE)
+    if engine is None:
+        raise ValueError(f"Unsupported extraction engine: {name}")
+    return engine
+
+
+def extract_html_content(html: str, engine: Optional[str] = None) -> Tuple[str, str, float]:
+    """
+    Extract the title and sanitized main content from an HTML page.
+
+    Args:
+        html (str): Raw HTML of the page
+        engine (str, optional): Extraction engine name ('bs4' or 'lxml')
+
+    Returns:
+        Tuple[str, str, float]: Title, sanitized HTML of the main content and
+        the parse duration in seconds
+    """
+    start_time = time.perf_counter()
+
+    extraction_engine = get_engine(engine)
+    try:
+        title, main_html = extraction_engine.extract_main_content(html)
+    except Exception as e:
+        if extraction_engine.name == DEFAULT_ENGINE:
+            raise
+        # e.g. empty documents or XML encoding declarations rejected by lxml
+        logger.warning(
+            f"{extraction_engine.name} extraction failed ({str(e)}), falling back to {DEFAULT_ENGINE}")
+        title, main_html = get_engine(DEFAULT_ENGINE).extract_main_content(html)
+
+    # Sanitize the HTML content
+    cleaned_html = bleach.clean(
+        main_html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        strip=True
+    )
+    return title, cleaned_html, time.perf_counter() - start_time
+
+
+def warm_up() -> bool:
+    """Run a tiny extraction so parser imports and caches are loaded in the worker."""
+    for name in ENGINES:
+        extract_html_content(WARMUP_HTML, name)
+    return True
@@ -1,11 +1,24 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from routers import search, auth, research
-from database import get_db, init_db
+from database import get_async_db, init_db, close_db
 from models import Base
 from config import settings, setup_logging
+from services.http_client import http_client_pool
+from services.extraction_executor import extraction_executor
+from services.password_service import password_service
+from services.batch_scorer import batch_scorer
+from services.page_cache import page_cache
+from services.search_cache import search_cache
+from services.neo4j_schema import neo4j_schema
+from services.ai_service import ai_service
+from services.user_cache import user_cache
+from services.metrics import registry, register_cache, CONTENT_TYPE
+from services.tracing import (
+    NOOP_SPAN, tracer, use_span, trace_body, set_correlation_id, correlation_id
+)
 
 # Setup logging first
 logger = setup_logging()
@@ -24,11 +37,24 @@ app = FastAPI(
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info("="*50)
-    logger.info(f"Request: {request.method} {request.url}")
-    logger.info(f"Auth header: {request.headers.get('authorization', 'No auth header')}")
-    
-    return await call_next(request)
+    logger.info("Request: %s %s", request.method, request.url.path)
+    set_correlation_id(request.headers.get(settings.TRACING_CORRELATION_HEADER))
+    span = tracer.span(f"{request.method} {request.url.path}", kind="server",
+                       method=request.method, path=request.url.path)
+    try:
+        with use_span(span):
+            response = await call_next(request)
+    except Exception as e:
+        span.record_error(e)
+        span.end()
+        raise
+
+    response.headers[settings.TRACING_CORRELATION_HEADER] = correlation_id()
+    if span is not NOOP_SPAN:
+        span.set_attribute("status_code", response.status_code)
+        # Streamed bodies are still being produced; end the span once they finish
+        response.body_iterator = trace_body(span, response.body_iterator)
+    return response
 
 # CORS configuration
 app.add_middleware(
@@ -66,20 +92,56 @@ logger.info("Routers included")
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application starting up...")
-    init_db()
+    await init_db()
     logger.info("Database initialized")
+    await http_client_pool.startup()
+    logger.info("HTTP connection pool initialized")
+    await extraction_executor.startup()
+    logger.info("Extraction executor initialized")
+    if settings.PAGE_CACHE_ENABLED:
+        page_cache.open()
+    if settings.NEO4J_SCHEMA_ON_STARTUP:
+        neo4j_schema.start()
     #logger.info(f"Settings object: {settings}")
     #logger.info(f"ACCESS_TOKEN_EXPIRE_MINUTES value: {settings.ACCESS_TOKEN_EXPIRE_MINUTES}")
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Application shutting down...")
+    await batch_scorer.shutdown()
+    await http_client_pool.close()
+    logger.info("HTTP connection pool closed")
+    await extraction_executor.shutdown()
+    logger.info("Extraction executor shut down")
+    password_service.shutdown()
+    page_cache.close()
+    search_cache.close()
+    await neo4j_schema.stop()
+    tracer.flush()
+    await close_db()
+    logger.info("Database connections closed")
+
 # Health and test endpoints
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     try:
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Cache hit ratios are read from each cache's stats() when /metrics is scraped
+register_cache("llm", lambda: ai_service.cache_stats() or {})
+register_cache("search", search_cache.stats, hit_keys=("hits", "disk_hits"))
+register_cache("page", page_cache.stats, miss_keys=("misses", "stale"))
+register_cache("user", user_cache.stats, hit_keys=("hits", "negative_hits"))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 @app.get("/test")
 async def test_endpoint():
     logger.info("Test endpoint called")
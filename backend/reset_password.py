@@ -1,18 +1,20 @@
+import asyncio
 from sqlalchemy import text
-from database import engine
+from database import async_engine
 from services.auth_service import get_password_hash
 
-def reset_admin_password():
+async def reset_admin_password():
     # Generate new password hash
     new_password = "admin"
     hashed_password = get_password_hash(new_password)
     
     # Update password in database
-    with engine.connect() as connection:
+    async with async_engine.connect() as connection:
         query = text("UPDATE users SET password = :password WHERE email = 'admin@cognify.com'")
-        connection.execute(query, {"password": hashed_password})
-        connection.commit()
+        await connection.execute(query, {"password": hashed_password})
+        await connection.commit()
         print("Password reset successfully")
+    await async_engine.dispose()
 
 if __name__ == "__main__":
-    reset_admin_password() 
\ No newline at end of file
+    asyncio.run(reset_admin_password()) 
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from services import auth_service
-from schemas import UserCreate, Token
+from schemas import UserCreate, UserResponse, Token
 from typing import Annotated
 
 router = APIRouter()
@@ -10,10 +10,10 @@ router = APIRouter()
 
 @router.post(
     "/register",
-    response_model=UserCreate,
+    response_model=UserResponse,
     summary="Register a new user"
 )
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user with:
     - **email**: valid email address
@@ -46,7 +46,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
 async def login(
     username: Annotated[str, Form(description="User's email address")],
     password: Annotated[str, Form(description="User's password")],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Login with email and password to get a JWT token.
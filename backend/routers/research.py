@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, Query, Body, Response, HTTPException
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from typing import List, Dict, TypedDict
+from typing import List, Dict, Optional, TypedDict
 from pydantic import BaseModel, Field
-from database import get_db
 from services import auth_service, research_service, ai_service, neo4j_service
+from services.answer_synthesis import answer_synthesizer
+from services.research_service import ANALYSIS_RESTART_MARKER
+from services.stream_parser import MarkdownEventParser, JSONEventParser, stream_events
 from schemas import (
     SearchResult, ResearchAnswer, URLContent, QuestionAnalysis, 
     ExecuteQueriesRequest, GetResearchAnswerRequest, CurrentEventsCheck, 
@@ -40,37 +41,68 @@ async def analyze_question_stream(
     question: str = Query(
         description="The question to analyze for scope and components"
     ),
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    speculative: Optional[bool] = Query(
+        None,
+        description="Stream the analysis while the current events check runs; defaults to the server setting"
+    ),
+    stream_format: str = Query(
+        "text",
+        alias="format",
+        pattern="^(text|events)$",
+        description="'text' streams the raw model output, 'events' streams NDJSON events as parts complete"
+    ),
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Stream the question analysis process, returning components as they are generated.
 
     Parameters:
     - **question**: The input question to analyze
+    - **speculative**: Start analyzing before the current events check completes. If context
+      is needed, a current events section is appended, or with the 'restart' strategy the
+      stream contains an `<!-- analysis-restart -->` marker after which the analysis starts over
 
-    Returns a stream of JSON objects, each containing:
-    - **type**: The type of data being returned (key_components, scope_boundaries, etc.)
-    - **data**: The actual data for that component
+    - **format**: 'text' for the raw markdown, 'events' for NDJSON events
+
+    With format=events, returns a stream of JSON objects, each containing:
+    - **type**: section_started, item, text, restart, or a completed section's key
+      (key_components, scope_boundaries, etc.)
+    - **section**: The section an item or text line belongs to
+    - **data**: The heading, item, line, or for a completed section all of its items
     """
     logger.info(
         f"analyze_question_stream endpoint called with question: {question}")
 
-    return StreamingResponse(
-        research_service.analyze_question_stream(question),
-        media_type="application/x-ndjson"
-    )
+    stream = research_service.analyze_question_stream(question, speculative)
+    if stream_format == "events":
+        stream = stream_events(stream, MarkdownEventParser(
+            markers={ANALYSIS_RESTART_MARKER.strip(): "restart"}))
+    return StreamingResponse(stream, media_type="application/x-ndjson")
 
 
 @router.get("/expand-question/stream")
 async def expand_question_stream(
     question: str = Query(..., description="The question to expand"),
-    db: Session = Depends(get_db),
+    stream_format: str = Query(
+        "text",
+        alias="format",
+        pattern="^(text|events)$",
+        description="'text' streams the raw model output, 'events' streams NDJSON events as parts complete"
+    ),
     current_user=Depends(auth_service.validate_token),
 ):
     """
     Stream the question expansion process, returning markdown-formatted results.
+
+    With format=events, each query is streamed as an `item` event as soon as its line
+    completes, followed by a `queries` event with all of them.
     """
+    if stream_format == "events":
+        return StreamingResponse(
+            stream_events(research_service.expand_question_stream(question),
+                          MarkdownEventParser(default_section="queries")),
+            media_type="application/x-ndjson"
+        )
     return StreamingResponse(
         research_service.expand_question_stream(question),
         media_type="text/event-stream"
@@ -80,8 +112,7 @@ async def expand_question_stream(
 @router.post("/execute-queries/stream")
 async def execute_queries_stream(
     request: ExecuteQueriesRequest,
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ):
     """Stream search results for multiple queries."""
     queries = request.queries
@@ -89,7 +120,7 @@ async def execute_queries_stream(
         f"execute_queries_stream endpoint called with {len(queries)} queries")
 
     return StreamingResponse(
-        research_service.execute_queries_stream(queries),
+        research_service.execute_queries_stream(queries, request.scoring_mode),
         media_type="text/event-stream"
     )
 
@@ -137,8 +168,7 @@ async def analyze_question(
     question: str = Query(
         description="The question to analyze for scope and components"
     ),
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Analyze a question to identify its key components, scope boundaries, success criteria,
@@ -182,8 +212,7 @@ async def expand_question(
     question: str = Query(
         description="The question to expand into related queries"
     ),
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Expand a question into multiple related search queries using AI.
@@ -215,14 +244,14 @@ async def expand_question(
 )
 async def execute_queries(
     request: ExecuteQueriesRequest,
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Execute multiple search queries and return collated, deduplicated results
 
     Parameters:
     - **queries**: List of search queries to execute
+    - **scoring_mode**: Optional relevance scoring mode ('llm', 'local' or 'hybrid')
 
     Returns a list of unique search results from all queries, sorted by relevance.
     """
@@ -230,7 +259,8 @@ async def execute_queries(
     queries = request.queries[:3]
     logger.info(
         f"execute_queries endpoint called with {len(queries)} queries (limited to first 3)")
-    return await research_service.execute_queries(db, queries, current_user.user_id)
+    return await research_service.execute_queries(
+        queries, current_user.user_id, request.scoring_mode)
 
 
 @router.post(
@@ -258,8 +288,7 @@ async def execute_queries(
 )
 async def get_research_answer(
     request: GetResearchAnswerRequest,
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Generate a comprehensive research answer from analyzed sources.
@@ -267,6 +296,7 @@ async def get_research_answer(
     Parameters:
     - **question**: The research question to answer
     - **source_content**: List of URL content objects to analyze
+    - **mode**: 'single', 'map_reduce' or 'auto' (default 'single')
 
     Returns a research answer with synthesized information, sources used, and confidence score.
     """
@@ -274,14 +304,65 @@ async def get_research_answer(
         f"get_research_answer endpoint called with question: {request.question}")
     logger.info(f"Number of sources provided: {len(request.source_content)}")
 
-    # Use AI service to generate the research answer
-    result = await ai_service.get_research_answer(
+    # Generate the research answer in one call or by map-reduce
+    result = await answer_synthesizer.answer(
         question=request.question,
-        source_content=request.source_content
+        source_content=request.source_content,
+        mode=request.mode
     )
     return result
 
 
+@router.post(
+    "/get-answer/stream",
+    summary="Stream a research answer, including per-source progress in map-reduce mode",
+    responses={
+        200: {
+            "description": "Research answer streamed successfully",
+            "content": {
+                "application/x-ndjson": {
+                    "example": {
+                        "type": "map_result",
+                        "data": {
+                            "url": "https://example.com/climate-research",
+                            "title": "Climate research",
+                            "chunk": 0,
+                            "chunks": 1,
+                            "notes": "- Urban heat islands raise temperatures by 1-3C"
+                        }
+                    }
+                }
+            }
+        },
+        401: {"description": "Not authenticated"}
+    }
+)
+async def get_research_answer_stream(
+    request: GetResearchAnswerRequest,
+    current_user=Depends(auth_service.validate_token)
+):
+    """
+    Stream a research answer from analyzed sources.
+
+    Parameters:
+    - **question**: The research question to answer
+    - **source_content**: List of URL content objects to analyze
+    - **mode**: 'single', 'map_reduce' or 'auto' (default 'single')
+
+    Returns a stream of JSON objects, each containing:
+    - **type**: map_started, map_result, map_error, answer_delta, answer or error
+    - **data**: The payload for that event; the final answer event holds the full ResearchAnswer
+    """
+    logger.info(
+        f"get_research_answer_stream endpoint called with question: {request.question}, mode: {request.mode}")
+
+    return StreamingResponse(
+        answer_synthesizer.answer_stream(
+            request.question, request.source_content, request.mode),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.post(
     "/evaluate-answer",
     response_model=ResearchEvaluation,
@@ -319,8 +400,7 @@ async def get_research_answer(
 )
 async def evaluate_answer(
     request: EvaluateAnswerRequest,
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Evaluate how well an answer addresses a research question.
@@ -375,8 +455,13 @@ async def check_current_events_stream(
     question: str = Query(
         description="The question to check for current events context requirements"
     ),
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    stream_format: str = Query(
+        "text",
+        alias="format",
+        pattern="^(text|events)$",
+        description="'text' streams the raw model output, 'events' streams NDJSON events as parts complete"
+    ),
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Stream the process of checking whether a question requires current events context.
@@ -384,15 +469,18 @@ async def check_current_events_stream(
     Parameters:
     - **question**: The input question to analyze
 
-    Returns a stream of JSON objects containing the analysis of current events context requirements.
+    - **format**: 'text' for the raw JSON output, 'events' for NDJSON events
+
+    With format=events, each top-level field is streamed as `{"type": <field>, "data": <value>}`
+    as soon as it completes, and elements of key_events and search_queries as `item` events.
     """
     logger.info(
         f"check_current_events_stream endpoint called with question: {question}")
 
-    return StreamingResponse(
-        research_service.check_current_events_context_stream(question),
-        media_type="application/x-ndjson"
-    )
+    stream = research_service.check_current_events_context_stream(question)
+    if stream_format == "events":
+        stream = stream_events(stream, JSONEventParser())
+    return StreamingResponse(stream, media_type="application/x-ndjson")
 
 
 @router.get(
@@ -421,8 +509,7 @@ async def check_current_events(
     question: str = Query(
         description="The question to check for current events context requirements"
     ),
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Check whether a question requires current events context.
@@ -469,8 +556,7 @@ async def improve_question(
     question: str = Query(
         description="The complex question to analyze and improve"
     ),
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Analyze a complex question and suggest improvements for clarity, completeness, and effectiveness.
@@ -525,8 +611,7 @@ async def improve_question(
 )
 async def extract_knowledge_graph(
     request: ExtractKnowledgeGraphRequest,
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    current_user=Depends(auth_service.validate_token)
 ) -> KnowledgeGraphElements:
     """
     Extract knowledge graph elements from a document and store them in Neo4j.
@@ -1,7 +1,5 @@
 from fastapi import APIRouter, Depends, status, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import List, Optional
 from schemas import SearchResult, URLContent, FetchURLsRequest
 from services import auth_service, search_service
 import logging
@@ -19,8 +17,7 @@ router = APIRouter()
     summary="Fetch and extract content from multiple URLs in parallel"
 )
 async def fetch_urls(request: FetchURLsRequest,
-                     current_user=Depends(auth_service.validate_token),
-                     db: Session = Depends(get_db)
+                     current_user=Depends(auth_service.validate_token)
                      ) -> List[URLContent]:
     """
     Fetch and extract content from multiple URLs in parallel.
@@ -28,6 +25,9 @@ async def fetch_urls(request: FetchURLsRequest,
     Args:
         request: FetchURLsRequest containing:
             - urls: List of URLs to fetch content from
+            - relevance_scores: Optional score per URL, higher scores are fetched first
+            - deadline_seconds: Optional time budget for the batch
+            - engine: Optional HTML extraction engine ('lxml' or 'bs4')
 
     Returns:
         List of URLContent objects, each containing:
@@ -37,7 +37,12 @@ async def fetch_urls(request: FetchURLsRequest,
         - error: Error message if failed
     """
     try:
-        return await search_service.fetch_urls_content(request.urls)
+        return await search_service.fetch_urls_content(
+            request.urls,
+            relevance_scores=request.relevance_scores,
+            deadline=request.deadline_seconds,
+            engine=request.engine
+        )
     except Exception as e:
         logger.error(f"Error in parallel URL fetching: {str(e)}")
         raise HTTPException(
@@ -72,8 +77,12 @@ async def search(
         le=100.0,
         description="Minimum relevance score threshold"
     ),
-    current_user=Depends(auth_service.validate_token),
-    db: Session = Depends(get_db)
+    scoring_mode: Optional[str] = Query(
+        default=None,
+        pattern="^(llm|local|hybrid)$",
+        description="Relevance scoring mode ('llm', 'local' or 'hybrid'); defaults to the server setting"
+    ),
+    current_user=Depends(auth_service.validate_token)
 ):
     """
     Search across topics and their content with AI-powered relevance scoring
@@ -82,6 +91,8 @@ async def search(
     - **query**: Search query string
     - **num_results**: Number of results to return (1-50)
     - **min_score**: Minimum relevance score threshold (0-100)
+    - **scoring_mode**: 'llm' scores every result with the LLM, 'local' uses only the
+      local pre-ranker, 'hybrid' sends only ambiguous results to the LLM
 
     Returns a list of search results sorted by relevance score.
     Each result includes a relevance score indicating how well it matches the query.
@@ -90,7 +101,8 @@ async def search(
         f"search endpoint called with query: {query}, num_results: {num_results}, min_score: {min_score}")
 
     # Get scored results
-    results = await search_service.search(db, query, current_user.user_id)
+    results = await search_service.search(
+        query, current_user.user_id, scoring_mode)
 
     # Filter by minimum score and limit results
     filtered_results = [r for r in results if r.relevance_score >= min_score]
@@ -103,14 +115,19 @@ async def search(
     summary="Fetch and extract content from a given URL"
 )
 async def fetch_url(url: str = Query(..., description="URL to fetch content from"),
-                   current_user=Depends(auth_service.validate_token),
-                   db: Session = Depends(get_db)
+                   engine: Optional[str] = Query(
+                       default=None,
+                       pattern="^(lxml|bs4)$",
+                       description="HTML extraction engine ('lxml' or 'bs4'); defaults to the server setting"
+                   ),
+                   current_user=Depends(auth_service.validate_token)
                    ) -> URLContent:
     """
     Fetch and extract content from a given URL.
 
     Args:
         url: The URL to fetch content from
+        engine: Optional HTML extraction engine ('lxml' or 'bs4')
 
     Returns:
         URLContent object containing:
@@ -121,7 +138,7 @@ async def fetch_url(url: str = Query(..., description="URL to fetch content from
     """
     try:
         # Since fetch_url_content already returns URLContent, don't wrap it again
-        return await search_service.fetch_url_content(url)
+        return await search_service.fetch_url_content(url, engine=engine)
     except Exception as e:
         logger.error(f"Error fetching URL content: {str(e)}")
         return URLContent(
@@ -64,9 +64,35 @@ class SearchResult(BaseModel):
     )
 
 
+class RelevanceScore(BaseModel):
+    """Schema for an LLM relevance score of a search result"""
+    url: str = Field(description="URL of the scored result")
+    score: float = Field(description="Relevance score from 0-100")
+
+
+class BatchRelevanceScore(RelevanceScore):
+    """Schema for a relevance score from a request scoring several queries"""
+    query: int = Field(description="Number of the query the result was scored against")
+
+
 class FetchURLsRequest(BaseModel):
     """Request model for fetching multiple URLs"""
     urls: List[str] = Field(description="List of URLs to fetch content from")
+    relevance_scores: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Optional relevance score per URL; higher scored URLs are fetched first"
+    )
+    deadline_seconds: Optional[float] = Field(
+        default=None,
+        gt=0.0,
+        le=120.0,
+        description="Optional time budget for the whole batch; URLs not fetched in time are returned with an error"
+    )
+    engine: Optional[str] = Field(
+        default=None,
+        pattern="^(lxml|bs4)$",
+        description="Optional HTML extraction engine ('lxml' or 'bs4'); defaults to the server setting"
+    )
 
 
 class URLContent(BaseModel):
@@ -102,6 +128,24 @@ class CurrentEventsCheck(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class QuestionIssues(BaseModel):
+    """Schema for the issues found when improving a question"""
+    clarity_issues: List[str] = Field(description="Unclear terms or concepts")
+    scope_issues: List[str] = Field(description="Points about the question's scope")
+    precision_issues: List[str] = Field(description="Areas needing more precise language")
+    implicit_assumptions: List[str] = Field(description="Assumptions that should be stated")
+    missing_context: List[str] = Field(description="Required context that is absent")
+    structural_improvements: List[str] = Field(description="Suggestions for better phrasing")
+
+
+class QuestionImprovement(BaseModel):
+    """Schema for suggested improvements to a question"""
+    original_question: str = Field(description="The original question text")
+    analysis: QuestionIssues = Field(description="Issues found in the question")
+    improved_question: str = Field(description="The question rewritten with all improvements")
+    improvement_explanation: str = Field(description="Explanation of the key improvements made")
+
+
 class QuestionAnalysis(BaseModel):
     """Schema for question analysis results"""
     key_components: List[str] = Field(
@@ -123,6 +167,11 @@ class QuestionAnalysis(BaseModel):
 class ExecuteQueriesRequest(BaseModel):
     """Request model for executing multiple search queries"""
     queries: List[str] = Field(description="List of search queries to execute")
+    scoring_mode: Optional[str] = Field(
+        default=None,
+        pattern="^(llm|local|hybrid)$",
+        description="Optional relevance scoring mode ('llm', 'local' or 'hybrid'); defaults to the server setting"
+    )
 
 
 class GetResearchAnswerRequest(BaseModel):
@@ -130,6 +179,12 @@ class GetResearchAnswerRequest(BaseModel):
     question: str = Field(description="The research question to answer")
     source_content: List[URLContent] = Field(
         description="List of URL content to analyze")
+    mode: str = Field(
+        default="single",
+        pattern="^(single|map_reduce|auto)$",
+        description="Synthesis mode: 'single' answers in one call, 'map_reduce' extracts notes per source "
+                    "concurrently before answering, 'auto' picks map_reduce for large source sets"
+    )
 
 
 class EvaluateAnswerRequest(BaseModel):
@@ -186,6 +241,18 @@ class ResearchEvaluation(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ContextStats(BaseModel):
+    """Schema for how source content was packed into an answer prompt"""
+    sources: int = Field(description="Number of sources without fetch errors")
+    sources_used: int = Field(description="Number of sources with at least one passage in the prompt")
+    passages: int = Field(description="Number of passages the sources were split into")
+    passages_used: int = Field(description="Number of passages included in the prompt")
+    token_budget: int = Field(description="Token budget for source content")
+    tokens_total: int = Field(description="Estimated tokens of all source text")
+    tokens_used: int = Field(description="Estimated tokens included in the prompt")
+    tokens_dropped: int = Field(description="Estimated tokens left out to fit the budget")
+
+
 class ResearchAnswer(BaseModel):
     """Schema for final research answer"""
     answer: str = Field(description="Final synthesized answer")
@@ -196,6 +263,9 @@ class ResearchAnswer(BaseModel):
         ge=0.0,
         le=100.0
     )
+    context_stats: Optional[ContextStats] = Field(
+        default=None,
+        description="How the source content was packed into the prompt")
 
     model_config = ConfigDict(from_attributes=True)
 
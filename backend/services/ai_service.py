@@ -1,12 +1,18 @@
+import asyncio
 import logging
-from typing import Optional, List, Dict, TypedDict, AsyncGenerator
+from typing import Optional, List, Dict, Tuple, TypedDict, AsyncGenerator
 from config.settings import settings
 from .llm.base import LLMProvider
 from .llm.anthropic_provider import AnthropicProvider
 from .llm.openai_provider import OpenAIProvider
+from .llm.cache import CachingProvider, create_response_cache
+from .llm.structured import structured_output, parse_json
+from .context_packer import context_packer, get_token_budget
+from .tracing import traced
 from schemas import (
-    QuestionAnalysis, ResearchAnswer, URLContent, 
-    KnowledgeGraphElements, KnowledgeGraphNode, KnowledgeGraphRelationship
+    QuestionAnalysis, ResearchAnswer, URLContent, ContextStats, CurrentEventsCheck,
+    ResearchEvaluation, QuestionImprovement, RelevanceScore, BatchRelevanceScore,
+    KnowledgeGraphElements
 )
 
 logger = logging.getLogger(__name__)
@@ -68,6 +74,16 @@ Use proper markdown formatting:
 
 IMPORTANT: Return ONLY the markdown text. Do not include any JSON formatting or additional explanations."""
 
+ANALYSIS_CONTEXT_ADDENDUM_PROMPT = """You are an expert research analyst. An analysis of a question was written before current events context was available. Using the context below, write one additional markdown section that updates the analysis.
+
+The section must:
+- Start with the heading ## Current Events Context
+- Use - for bullet points
+- Explain how recent developments affect the key components, scope, success criteria or conflicting viewpoints already identified
+- Not repeat points from the existing analysis
+
+IMPORTANT: Return ONLY the markdown section. Do not include any JSON formatting or additional explanations."""
+
 SCORE_RESULTS_PROMPT = """You are an expert at evaluating search results for relevance to a query.
 For each search result, analyze its relevance to the query and provide a score from 0-100 where:
 - 90-100: Perfect match, directly answers the query
@@ -95,6 +111,35 @@ Example response format:
 
 Do not include any other text or explanation in your response, only the JSON array."""
 
+SCORE_BATCH_RESULTS_PROMPT = """You are an expert at evaluating search results for relevance to queries.
+You will be given several numbered queries, each followed by its own search results.
+Score each result only against the query it is listed under, from 0-100 where:
+- 90-100: Perfect match, directly answers the query
+- 70-89: Highly relevant, contains most of the needed information
+- 50-69: Moderately relevant, contains some useful information
+- 30-49: Somewhat relevant, tangentially related
+- 0-29: Not relevant or too general
+
+Consider:
+- How directly the content answers the query
+- The specificity and depth of information
+- The credibility of the source domain
+- The comprehensiveness of the snippet
+- The relevance of the title
+
+IMPORTANT: Your response must be a valid JSON array of objects. Each object must have exactly three fields:
+- "query": the number of the query the result is listed under
+- "url": the exact URL from the search result
+- "score": a number between 0 and 100
+
+Example response format:
+[
+    {"query": 1, "url": "example.com/page1", "score": 85},
+    {"query": 2, "url": "example.com/page2", "score": 45}
+]
+
+Do not include any other text or explanation in your response, only the JSON array."""
+
 RESEARCH_ANSWER_PROMPT = """You are an expert research analyst synthesizing information to answer a question.
 
 Question: {question}
@@ -132,6 +177,20 @@ Example response format:
 
 IMPORTANT: Your response must be ONLY a valid JSON object. Do not include any explanatory text, markdown formatting, or code blocks outside the JSON structure."""
 
+EXTRACT_SOURCE_NOTES_PROMPT = """You are an expert research analyst reading one source as part of a larger research task.
+
+Question: {question}
+
+Source ({url}):
+Title: {title}
+{source_text}
+
+Extract everything in this source that helps answer the question: key facts, figures, dates, definitions, arguments and any caveats or disagreements. Write concise markdown bullet points, preserving specific details and numbers. Do not answer the question itself and do not add information that is not in the source.
+
+If the source contains nothing relevant to the question, reply with exactly: NO_RELEVANT_INFORMATION"""
+
+NO_RELEVANT_INFORMATION = "NO_RELEVANT_INFORMATION"
+
 CURRENT_EVENTS_CHECK_PROMPT = """You are an expert at determining whether questions require current events context to be properly understood and answered.
 
 Analyze if the given question requires current events context. Consider:
@@ -328,19 +387,58 @@ IMPORTANT:
 3. Ensure all IDs are unique and referenced correctly in relationships.'''
 
 
+EVALUATION_SCORE_FIELDS = ('completeness_score', 'accuracy_score', 'relevance_score', 'overall_score')
+
+
+def _normalize_evaluation(data):
+    """Clamp scores and default optional lists before validating an evaluation."""
+    if isinstance(data, dict):
+        for field in EVALUATION_SCORE_FIELDS:
+            try:
+                data[field] = max(0.0, min(100.0, float(data.get(field, 0.0))))
+            except (TypeError, ValueError):
+                pass
+        for field in ('missing_aspects', 'improvement_suggestions', 'conflicting_aspects'):
+            data.setdefault(field, [])
+    return data
+
+
+def _normalize_knowledge_graph(data):
+    """Default missing properties, which the prompt asks for but models sometimes omit."""
+    if isinstance(data, dict):
+        for key in ('nodes', 'relationships'):
+            for element in data.get(key) or []:
+                if isinstance(element, dict):
+                    element.setdefault('properties', {})
+    return data
+
+
 class AIService:
     def __init__(self):
-        self.provider: LLMProvider = AnthropicProvider()
+        # One response cache shared across providers; keys include the provider name
+        self.response_cache = create_response_cache() if settings.LLM_CACHE_ENABLED else None
+        self.provider: LLMProvider = self._wrap_provider(AnthropicProvider())
+
+    def _wrap_provider(self, provider: LLMProvider) -> LLMProvider:
+        if self.response_cache is None:
+            return provider
+        return CachingProvider(provider, self.response_cache)
 
     def set_provider(self, provider: str):
         """Change the LLM provider"""
         if provider == "openai":
-            self.provider = OpenAIProvider()
+            self.provider = self._wrap_provider(OpenAIProvider())
         elif provider == "anthropic":
-            self.provider = AnthropicProvider()
+            self.provider = self._wrap_provider(AnthropicProvider())
         else:
             raise ValueError(f"Unsupported provider: {provider}")
 
+    def cache_stats(self) -> Optional[Dict]:
+        """Get LLM response cache statistics, or None if caching is disabled"""
+        if isinstance(self.provider, CachingProvider):
+            return self.provider.stats()
+        return None
+
     async def analyze_question(self, question: str, model: Optional[str] = None) -> QuestionAnalysis:
         """
         Analyze a question to determine its key components, scope, and success criteria.
@@ -357,43 +455,14 @@ class AIService:
                 {"role": "user", "content": f"Analyze this question: {question}"}
             ]
 
-            content = await self.provider.create_chat_completion(
-                messages=messages,
+            return await structured_output.generate(
+                self.provider,
+                QuestionAnalysis,
+                messages,
                 system=ANALYZE_QUESTION_PROMPT,
                 model=model
             )
 
-            try:
-                # Clean the response string
-                response_text = content.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text.split('```')[1].strip()
-                elif response_text.startswith('```'):
-                    response_text = response_text.split('```')[1].strip()
-
-                # Parse JSON response and create Pydantic model
-                import json
-                analysis_dict = json.loads(response_text)
-
-                # Create and validate with Pydantic model
-                return QuestionAnalysis(
-                    key_components=analysis_dict.get('key_components', []),
-                    scope_boundaries=analysis_dict.get('scope_boundaries', []),
-                    success_criteria=analysis_dict.get('success_criteria', []),
-                    conflicting_viewpoints=analysis_dict.get(
-                        'conflicting_viewpoints', [])
-                )
-
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"Error parsing analysis JSON response: {str(e)}\nResponse: {content}")
-                return QuestionAnalysis(
-                    key_components=[],
-                    scope_boundaries=[],
-                    success_criteria=[],
-                    conflicting_viewpoints=[]
-                )
-
         except Exception as e:
             logger.error(f"Error in analyze_question_scope: {str(e)}")
             return QuestionAnalysis(
@@ -430,6 +499,41 @@ class AIService:
             logger.error(f"Error in analyze_question_scope_stream: {str(e)}")
             raise
 
+    async def analyze_question_context_stream(self,
+                                              question: str,
+                                              analysis: str,
+                                              context_summary: str,
+                                              model: Optional[str] = None
+                                              ) -> AsyncGenerator[str, None]:
+        """
+        Stream a section updating an existing analysis with current events context.
+
+        Args:
+            question: The analyzed question
+            analysis: The analysis written without context
+            context_summary: Current events context gathered for the question
+            model: Optional specific model to use
+
+        Yields:
+            Raw text chunks from the LLM response
+        """
+        try:
+            messages = [
+                {"role": "user", "content": (
+                    f"Question: {question}\n\nExisting analysis:\n{analysis}\n{context_summary}")}
+            ]
+
+            async for chunk in self.provider.create_chat_completion_stream(
+                messages=messages,
+                system=ANALYSIS_CONTEXT_ADDENDUM_PROMPT,
+                model=model
+            ):
+                yield chunk
+
+        except Exception as e:
+            logger.error(f"Error in analyze_question_context_stream: {str(e)}")
+            raise
+
     async def expand_query(self, question: str) -> List[str]:
         """
         Expand a question into multiple search queries.
@@ -474,6 +578,173 @@ class AIService:
             logger.error(f"Error in expand_query_stream: {str(e)}")
             yield "Error: Failed to expand query. Please try again.\n"
 
+    async def pack_sources(self,
+                           question: str,
+                           source_content: List[URLContent],
+                           model: Optional[str] = None
+                           ) -> Tuple[str, ContextStats]:
+        """Convert sources to text passages and pack the most relevant into the model's token budget."""
+        budget = get_token_budget(model or self.provider.get_default_model())
+        # HTML parsing and ranking are CPU-bound, keep them off the event loop
+        formatted_sources, context_stats = await asyncio.to_thread(
+            context_packer.pack, question, source_content, budget)
+        logger.info(
+            f"Packed {context_stats.passages_used}/{context_stats.passages} passages from "
+            f"{context_stats.sources_used}/{context_stats.sources} sources: "
+            f"{context_stats.tokens_used} tokens used, {context_stats.tokens_dropped} dropped "
+            f"(budget {context_stats.token_budget})")
+        return formatted_sources, context_stats
+
+    async def generate_answer_from_sources(self,
+                                           question: str,
+                                           formatted_sources: str,
+                                           model: Optional[str] = None,
+                                           context_stats: Optional[ContextStats] = None
+                                           ) -> ResearchAnswer:
+        """
+        Generate a research answer from already formatted source text.
+
+        Args:
+            question: The research question
+            formatted_sources: Source text for the prompt, e.g. from pack_sources
+            model: Optional specific model to use
+            context_stats: Optional packing statistics to attach to the answer
+
+        Returns:
+            ResearchAnswer: Final synthesized answer with sources and confidence
+        """
+        messages = [
+            {"role": "user", "content": RESEARCH_ANSWER_PROMPT.format(
+                question=question,
+                source_content=formatted_sources
+            )}
+        ]
+
+        content = await self.provider.create_chat_completion(
+            messages=messages,
+            system=RESEARCH_ANSWER_PROMPT,
+            model=model
+        )
+        return self.parse_research_answer(content, context_stats)
+
+    async def generate_answer_from_sources_stream(self,
+                                                  question: str,
+                                                  formatted_sources: str,
+                                                  model: Optional[str] = None
+                                                  ) -> AsyncGenerator[str, None]:
+        """
+        Stream a research answer from already formatted source text.
+
+        Yields:
+            Raw text chunks from the LLM response
+        """
+        messages = [
+            {"role": "user", "content": RESEARCH_ANSWER_PROMPT.format(
+                question=question,
+                source_content=formatted_sources
+            )}
+        ]
+
+        async for chunk in self.provider.create_chat_completion_stream(
+            messages=messages,
+            system=RESEARCH_ANSWER_PROMPT,
+            model=model
+        ):
+            yield chunk
+
+    def parse_research_answer(self,
+                              content: str,
+                              context_stats: Optional[ContextStats] = None
+                              ) -> ResearchAnswer:
+        """
+        Parse the JSON research answer returned by the LLM.
+
+        Args:
+            content: Raw LLM response
+            context_stats: Optional packing statistics to attach to the answer
+
+        Returns:
+            ResearchAnswer: The parsed answer
+
+        Raises:
+            ValueError: If the response cannot be parsed
+        """
+        try:
+            # Tolerates code fences and truncation, e.g. a cut-off sources_used array
+            result = parse_json(content)
+        except ValueError as e:
+            logger.error(f"JSON parsing error: {str(e)}")
+            logger.error(f"Response text: {content}")
+            raise
+
+        if not isinstance(result, dict):
+            raise ValueError("Research answer response is not a JSON object")
+
+        # Validate required fields
+        if not isinstance(result.get('answer'), str):
+            raise ValueError(
+                "Missing or invalid 'answer' field in response")
+
+        # Ensure sources is a list and contains valid URLs
+        sources = result.get('sources_used', [])
+        if not isinstance(sources, list):
+            sources = []
+        # Filter out any truncated or invalid URLs
+        sources = [s for s in sources if isinstance(
+            s, str) and s.startswith('http')]
+
+        # Ensure confidence score is valid
+        try:
+            confidence = float(result.get('confidence_score', 0.0))
+            # Clamp between 0 and 100
+            confidence = max(0.0, min(100.0, confidence))
+        except (TypeError, ValueError):
+            confidence = 0.0
+
+        return ResearchAnswer(
+            answer=result['answer'],
+            sources_used=sources,
+            confidence_score=confidence,
+            context_stats=context_stats
+        )
+
+    async def extract_source_notes(self,
+                                   question: str,
+                                   url: str,
+                                   title: str,
+                                   source_text: str,
+                                   model: Optional[str] = None
+                                   ) -> str:
+        """
+        Extract notes relevant to the question from a single source or chunk.
+
+        Args:
+            question: The research question
+            url: Source URL
+            title: Source title
+            source_text: Plain text of the source or chunk
+            model: Optional specific model to use, defaults to the fast model
+
+        Returns:
+            str: Markdown notes, or an empty string if nothing was relevant
+        """
+        messages = [
+            {"role": "user", "content": EXTRACT_SOURCE_NOTES_PROMPT.format(
+                question=question,
+                url=url,
+                title=title,
+                source_text=source_text
+            )}
+        ]
+
+        content = await self.provider.create_chat_completion(
+            messages=messages,
+            model=model or FAST_MODEL,
+            max_tokens=1000
+        )
+        notes = content.strip()
+        return "" if notes.startswith(NO_RELEVANT_INFORMATION) else notes
+
     async def get_research_answer(self,
                                   question: str,
                                   source_content: List[URLContent],
@@ -491,92 +762,12 @@ class AIService:
             ResearchAnswer: Final synthesized answer with sources and confidence
         """
         try:
-            # Format source content for the prompt
-            formatted_sources = "\n\n".join([
-                f"Source ({content.url}):\nTitle: {content.title}\n{content.text}"
-                for content in source_content
-                if not content.error  # Skip sources with errors
-            ])
+            # Pack the most relevant passages of each source into the token budget
+            formatted_sources, context_stats = await self.pack_sources(
+                question, source_content, model)
 
-            messages = [
-                {"role": "user", "content": RESEARCH_ANSWER_PROMPT.format(
-                    question=question,
-                    source_content=formatted_sources
-                )}
-            ]
-
-            content = await self.provider.create_chat_completion(
-                messages=messages,
-                system=RESEARCH_ANSWER_PROMPT,
-                model=model
-            )
-
-            # Parse JSON response
-            response_text = content.strip()
-
-            # Remove any markdown code block markers
-            if '```' in response_text:
-                # Extract content between first and last ```
-                parts = response_text.split('```')
-                if len(parts) >= 3:
-                    response_text = parts[1]
-                    if response_text.startswith('json'):
-                        response_text = response_text[4:]
-                    response_text = response_text.strip()
-
-            # Clean up any remaining whitespace or newlines
-            response_text = response_text.strip()
-
-            try:
-                # Try to fix common JSON issues
-                if response_text.endswith(','):
-                    response_text = response_text[:-1]
-                if '"sources_used": [' in response_text and not ']' in response_text.split('"sources_used": [')[1]:
-                    response_text = response_text.split('"sources_used": [')[
-                        0] + '"sources_used": []}'
-
-                import json
-                result = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parsing error: {str(e)}")
-                logger.error(f"Response text: {response_text}")
-
-                # Try to salvage the answer if possible
-                answer_match = '"answer": "(.+?)",' in response_text
-                if answer_match:
-                    return ResearchAnswer(
-                        answer=answer_match.group(1),
-                        sources_used=[],
-                        confidence_score=0.0
-                    )
-                raise
-
-            # Validate required fields
-            if not isinstance(result.get('answer'), str):
-                raise ValueError(
-                    "Missing or invalid 'answer' field in response")
-
-            # Ensure sources is a list and contains valid URLs
-            sources = result.get('sources_used', [])
-            if not isinstance(sources, list):
-                sources = []
-            # Filter out any truncated or invalid URLs
-            sources = [s for s in sources if isinstance(
-                s, str) and s.startswith('http')]
-
-            # Ensure confidence score is valid
-            try:
-                confidence = float(result.get('confidence_score', 0.0))
-                # Clamp between 0 and 100
-                confidence = max(0.0, min(100.0, confidence))
-            except (TypeError, ValueError):
-                confidence = 0.0
-
-            return ResearchAnswer(
-                answer=result['answer'],
-                sources_used=sources,
-                confidence_score=confidence
-            )
+            return await self.generate_answer_from_sources(
+                question, formatted_sources, model, context_stats)
 
         except Exception as e:
             logger.error(f"Error generating research answer: {str(e)}")
@@ -605,25 +796,12 @@ class AIService:
             Raw text chunks from the LLM response
         """
         try:
-            # Format source content for the prompt
-            formatted_sources = "\n\n".join([
-                f"Source ({content.url}):\nTitle: {content.title}\n{content.text}"
-                for content in source_content
-                if not content.error  # Skip sources with errors
-            ])
-
-            messages = [
-                {"role": "user", "content": RESEARCH_ANSWER_PROMPT.format(
-                    question=question,
-                    source_content=formatted_sources
-                )}
-            ]
+            # Pack the most relevant passages of each source into the token budget
+            formatted_sources, context_stats = await self.pack_sources(
+                question, source_content, model)
 
-            async for chunk in self.provider.create_chat_completion_stream(
-                messages=messages,
-                system=RESEARCH_ANSWER_PROMPT,
-                model=model
-            ):
+            async for chunk in self.generate_answer_from_sources_stream(
+                    question, formatted_sources, model):
                 yield chunk
 
         except Exception as e:
@@ -635,7 +813,10 @@ class AIService:
     async def close(self):
         """Cleanup method to close the provider session"""
         await self.provider.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
 
+    @traced("ai.score_results")
     async def score_results(self,
                             query: str,
                             results: List[Dict[str, str]],
@@ -652,105 +833,57 @@ class AIService:
                 f"URL: {result['url']}\n{result['content']}"
                 for result in results
             ])
-            logger.debug(f"Formatted results for scoring:\n{results_text}")
+            logger.debug("Formatted results for scoring:\n%s", results_text)
 
             prompt = f"{SCORE_RESULTS_PROMPT}\n\nQuery: {query}\n\nResults to score:\n{results_text}"
-            logger.debug(f"Full prompt:\n{prompt}")
+            logger.debug("Full prompt:\n%s", prompt)
 
             # Get scores from AI
             logger.info("Requesting scores from AI provider...")
-            response = await self.provider.generate(
-                prompt=prompt,
+            scores = await structured_output.generate(
+                self.provider,
+                List[RelevanceScore],
+                [{"role": "user", "content": prompt}],
                 model=model,
-                max_tokens=1000
+                max_tokens=1000,
+                name="relevance_scores"
             )
-            logger.debug(f"Raw AI response:\n{response}")
+            logger.debug("Parsed scores: %s", scores)
 
-            try:
-                # Clean the response string
-                response_text = response.strip()
-                if response_text.startswith('```json'):
-                    logger.debug(
-                        "Detected JSON code block, extracting content")
-                    response_text = response_text.split('```')[1].strip()
-                elif response_text.startswith('```'):
-                    logger.debug("Detected code block, extracting content")
-                    response_text = response_text.split('```')[1].strip()
-
-                logger.debug(f"Cleaned response text:\n{response_text}")
-
-                # Parse the JSON response
-                import json
-                scores = json.loads(response_text)
-                logger.debug(f"Parsed JSON scores: {scores}")
-
-                if not isinstance(scores, list):
-                    logger.error(
-                        f"AI response is not a list. Type: {type(scores)}")
-                    raise ValueError("Invalid response format")
-
-                # Validate and clean up scores
-                validated_scores = []
-                result_urls = {result['url'] for result in results}
-                logger.debug(f"Valid URLs: {result_urls}")
-
-                for score in scores:
-                    logger.debug(f"Processing score entry: {score}")
-                    if not isinstance(score, dict):
-                        logger.warning(
-                            f"Skipping non-dict score entry: {score}")
-                        continue
-
-                    if 'url' not in score or 'score' not in score:
-                        logger.warning(
-                            f"Skipping score entry missing required fields: {score}")
-                        continue
-
-                    if score['url'] not in result_urls:
-                        logger.warning(
-                            f"Skipping score for unknown URL: {score['url']}")
-                        continue
-
-                    try:
-                        # Ensure score is a number and within bounds
-                        original_score = score['score']
-                        score['score'] = max(
-                            0, min(100, float(score['score'])))
-                        if score['score'] != original_score:
-                            logger.info(
-                                f"Adjusted score for {score['url']} from {original_score} to {score['score']}")
-                        validated_scores.append(score)
-                        logger.debug(f"Validated score entry: {score}")
-                    except (TypeError, ValueError):
-                        logger.error(
-                            f"Invalid score value for URL {score['url']}: {score.get('score')}")
-                        continue
-
-                # Ensure we have scores for all results
-                if len(validated_scores) < len(results):
+            # Validate and clean up scores
+            validated_scores = []
+            result_urls = {result['url'] for result in results}
+            logger.debug("Valid URLs: %s", result_urls)
+
+            for score in scores:
+                if score.url not in result_urls:
+                    logger.warning(
+                        f"Skipping score for unknown URL: {score.url}")
+                    continue
+
+                # Ensure score is within bounds
+                clamped_score = max(0, min(100, score.score))
+                if clamped_score != score.score:
+                    logger.info(
+                        f"Adjusted score for {score.url} from {score.score} to {clamped_score}")
+                validated_scores.append({'url': score.url, 'score': clamped_score})
+
+            # Ensure we have scores for all results
+            if len(validated_scores) < len(results):
+                logger.warning(
+                    f"Missing scores for some URLs. Found {len(validated_scores)} of {len(results)}")
+                missing_urls = result_urls - \
+                    {score['url'] for score in validated_scores}
+                for url in missing_urls:
+                    default_score = {'url': url, 'score': 50.0}
+                    validated_scores.append(default_score)
                     logger.warning(
-                        f"Missing scores for some URLs. Found {len(validated_scores)} of {len(results)}")
-                    missing_urls = result_urls - \
-                        {score['url'] for score in validated_scores}
-                    for url in missing_urls:
-                        default_score = {'url': url, 'score': 50.0}
-                        validated_scores.append(default_score)
-                        logger.warning(
-                            f"Added default score for missing URL: {url}")
-
-                logger.info(
-                    f"Successfully scored {len(validated_scores)} results")
-                logger.debug(f"Final validated scores: {validated_scores}")
-                return validated_scores
-
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"Error parsing score results JSON: {str(e)}\nResponse: {response}")
-                default_scores = [{'url': result['url'],
-                                   'score': 50.0} for result in results]
-                logger.info(
-                    f"Returning default scores for {len(default_scores)} results")
-                return default_scores
+                        f"Added default score for missing URL: {url}")
+
+            logger.info(
+                f"Successfully scored {len(validated_scores)} results")
+            logger.debug("Final validated scores: %s", validated_scores)
+            return validated_scores
 
         except Exception as e:
             logger.error(f"Error in score_results: {str(e)}", exc_info=True)
@@ -760,6 +893,68 @@ class AIService:
                 f"Returning default scores for {len(default_scores)} results")
             return default_scores
 
+    @traced("ai.score_results_batch")
+    async def score_results_batch(self,
+                                  groups: List[Tuple[str, List[Dict[str, str]]]],
+                                  model: Optional[str] = None
+                                  ) -> List[List[Dict[str, float]]]:
+        """
+        Score the results of several queries in a single request.
+
+        Args:
+            groups (List[Tuple[str, List[Dict[str, str]]]]): (query, results) pairs,
+                each result having 'url' and 'content'
+            model (str, optional): Model to use
+
+        Returns:
+            List[List[Dict[str, float]]]: Scores for each group, in the same order and
+            format as score_results
+        """
+        total_results = sum(len(results) for _, results in groups)
+        logger.info(f"Scoring {total_results} results for {len(groups)} queries in one batch")
+
+        scores: Dict[Tuple[int, str], float] = {}
+        try:
+            sections = []
+            for query_number, (query, results) in enumerate(groups, start=1):
+                results_text = "\n\n".join([
+                    f"URL: {result['url']}\n{result['content']}"
+                    for result in results
+                ])
+                sections.append(f"Query {query_number}: {query}\n\nResults to score:\n{results_text}")
+            prompt = f"{SCORE_BATCH_RESULTS_PROMPT}\n\n" + "\n\n---\n\n".join(sections)
+
+            entries = await structured_output.generate(
+                self.provider,
+                List[BatchRelevanceScore],
+                [{"role": "user", "content": prompt}],
+                model=model,
+                # Roughly 30 tokens per score entry, with the single-query limit as a floor
+                max_tokens=min(4096, max(1000, 30 * total_results)),
+                name="batch_relevance_scores"
+            )
+
+            for entry in entries:
+                scores[(entry.query, entry.url)] = max(0, min(100, entry.score))
+
+        except Exception as e:
+            logger.error(f"Error in score_results_batch: {str(e)}", exc_info=True)
+
+        # Results the model skipped (or all of them, on error) get the default score
+        batch_scores = []
+        for query_number, (_, results) in enumerate(groups, start=1):
+            batch_scores.append([
+                {'url': result['url'],
+                 'score': scores.get((query_number, result['url']), 50.0)}
+                for result in results
+            ])
+        missing = sum(
+            1 for query_number, (_, results) in enumerate(groups, start=1)
+            for result in results if (query_number, result['url']) not in scores)
+        if missing:
+            logger.warning(f"Using default scores for {missing} of {total_results} results")
+        return batch_scores
+
     async def check_current_events_context(self, question: str, model: Optional[str] = None) -> Dict:
         """
         Analyze whether a question requires current events context to be properly understood and answered.
@@ -776,34 +971,14 @@ class AIService:
                 {"role": "user", "content": f"Question: {question}"}
             ]
 
-            content = await self.provider.create_chat_completion(
-                messages=messages,
+            result = await structured_output.generate(
+                self.provider,
+                CurrentEventsCheck,
+                messages,
                 system=CURRENT_EVENTS_CHECK_PROMPT,
                 model=FAST_MODEL
             )
-
-            try:
-                # Clean the response string
-                response_text = content.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text.split('```')[1].strip()
-                elif response_text.startswith('```'):
-                    response_text = response_text.split('```')[1].strip()
-
-                # Parse JSON response
-                import json
-                return json.loads(response_text)
-
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"Error parsing current events check JSON response: {str(e)}\nResponse: {content}")
-                return {
-                    "requires_current_context": False,
-                    "reasoning": "Error analyzing current events context",
-                    "timeframe": "",
-                    "key_events": [],
-                    "search_queries": []
-                }
+            return result.model_dump()
 
         except Exception as e:
             logger.error(f"Error in check_current_events_context: {str(e)}")
@@ -881,56 +1056,15 @@ Answer to Evaluate: {answer}
                 {"role": "user", "content": analysis_text}
             ]
 
-            content = await self.provider.create_chat_completion(
-                messages=messages,
+            result = await structured_output.generate(
+                self.provider,
+                ResearchEvaluation,
+                messages,
                 system=EVALUATE_ANSWER_PROMPT,
-                model=model or FAST_MODEL
+                model=model or FAST_MODEL,
+                normalize=_normalize_evaluation
             )
-
-            try:
-                # Clean the response string
-                response_text = content.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text.split('```')[1].strip()
-                elif response_text.startswith('```'):
-                    response_text = response_text.split('```')[1].strip()
-
-                # Parse JSON response
-                import json
-                result = json.loads(response_text)
-
-                # Ensure all required fields are present with valid values
-                result['completeness_score'] = max(
-                    0.0, min(100.0, float(result.get('completeness_score', 0.0))))
-                result['accuracy_score'] = max(
-                    0.0, min(100.0, float(result.get('accuracy_score', 0.0))))
-                result['relevance_score'] = max(
-                    0.0, min(100.0, float(result.get('relevance_score', 0.0))))
-                result['overall_score'] = max(
-                    0.0, min(100.0, float(result.get('overall_score', 0.0))))
-                result['missing_aspects'] = result.get('missing_aspects', [])
-                result['improvement_suggestions'] = result.get(
-                    'improvement_suggestions', [])
-                result['conflicting_aspects'] = result.get(
-                    'conflicting_aspects', [])
-
-                return result
-
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"Error parsing evaluation JSON response: {str(e)}\nResponse: {content}")
-                return {
-                    "completeness_score": 0.0,
-                    "accuracy_score": 0.0,
-                    "relevance_score": 0.0,
-                    "overall_score": 0.0,
-                    "missing_aspects": ["Error evaluating answer"],
-                    "improvement_suggestions": ["Please try again"],
-                    "conflicting_aspects": [{
-                        "aspect": "Evaluation Error",
-                        "conflict": f"An error occurred during evaluation: {str(e)}"
-                    }]
-                }
+            return result.model_dump()
 
         except Exception as e:
             logger.error(f"Error in evaluate_answer: {str(e)}")
@@ -963,55 +1097,14 @@ Answer to Evaluate: {answer}
                 {"role": "user", "content": f"Question: {question}"}
             ]
 
-            content = await self.provider.create_chat_completion(
-                messages=messages,
+            result = await structured_output.generate(
+                self.provider,
+                QuestionImprovement,
+                messages,
                 system=IMPROVE_QUESTION_PROMPT,
                 model=model or FAST_MODEL
             )
-
-            try:
-                # Clean the response string
-                response_text = content.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text.split('```')[1].strip()
-                elif response_text.startswith('```'):
-                    response_text = response_text.split('```')[1].strip()
-
-                # Parse JSON response
-                import json
-                result = json.loads(response_text)
-
-                # Validate the response has all required fields
-                required_fields = ['original_question', 'analysis',
-                                   'improved_question', 'improvement_explanation']
-                if not all(field in result for field in required_fields):
-                    raise ValueError("Missing required fields in response")
-
-                # Validate analysis subfields
-                analysis_fields = ['clarity_issues', 'scope_issues', 'precision_issues',
-                                   'implicit_assumptions', 'missing_context', 'structural_improvements']
-                if not all(field in result['analysis'] for field in analysis_fields):
-                    raise ValueError(
-                        "Missing required analysis fields in response")
-
-                return result
-
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"Error parsing improve question JSON response: {str(e)}\nResponse: {content}")
-                return {
-                    "original_question": question,
-                    "analysis": {
-                        "clarity_issues": ["Error analyzing question"],
-                        "scope_issues": [],
-                        "precision_issues": [],
-                        "implicit_assumptions": [],
-                        "missing_context": [],
-                        "structural_improvements": []
-                    },
-                    "improved_question": question,
-                    "improvement_explanation": "An error occurred during analysis"
-                }
+            return result.model_dump()
 
         except Exception as e:
             logger.error(f"Error in improve_question: {str(e)}")
@@ -1046,59 +1139,16 @@ Answer to Evaluate: {answer}
                 {"role": "user", "content": f"Extract knowledge graph elements from this text:\n\n{document}"}
             ]
 
-            content = await self.provider.create_chat_completion(
-                messages=messages,
+            result = await structured_output.generate(
+                self.provider,
+                KnowledgeGraphElements,
+                messages,
                 system=EXTRACT_KNOWLEDGE_GRAPH_PROMPT,
-                model=model or FAST_MODEL
+                model=model or FAST_MODEL,
+                normalize=_normalize_knowledge_graph
             )
-
-            try:
-                # Clean the response string
-                response_text = content.strip()
-                logger.debug(f"Raw AI response: {response_text}")
-
-                if response_text.startswith('```json'):
-                    response_text = response_text.split('```')[1].strip()
-                    logger.debug("Removed JSON code block markers")
-                elif response_text.startswith('```'):
-                    response_text = response_text.split('```')[1].strip()
-                    logger.debug("Removed code block markers")
-
-                # Parse JSON response and validate with Pydantic
-                import json
-                try:
-                    raw_result = json.loads(response_text)
-                    logger.debug(f"Parsed JSON result: {raw_result}")
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse JSON: {str(e)}\nResponse text: {response_text}")
-                    raise
-                
-                # Log the extracted elements before validation
-                logger.info(f"Extracted {len(raw_result.get('nodes', []))} nodes and {len(raw_result.get('relationships', []))} relationships")
-                
-                # Convert raw dictionaries to Pydantic models for validation
-                try:
-                    nodes = [KnowledgeGraphNode(**node) for node in raw_result.get('nodes', [])]
-                    logger.debug(f"Successfully validated {len(nodes)} nodes")
-                except Exception as e:
-                    logger.error(f"Node validation error: {str(e)}")
-                    raise
-
-                try:
-                    relationships = [KnowledgeGraphRelationship(**rel) for rel in raw_result.get('relationships', [])]
-                    logger.debug(f"Successfully validated {len(relationships)} relationships")
-                except Exception as e:
-                    logger.error(f"Relationship validation error: {str(e)}")
-                    raise
-                
-                # Create and validate the final result
-                result = KnowledgeGraphElements(nodes=nodes, relationships=relationships)
-                logger.info(f"Successfully created knowledge graph with {len(result.nodes)} nodes and {len(result.relationships)} relationships")
-                return result
-
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing knowledge graph JSON response: {str(e)}\nResponse: {content}")
-                return KnowledgeGraphElements(nodes=[], relationships=[])
+            logger.info(f"Successfully created knowledge graph with {len(result.nodes)} nodes and {len(result.relationships)} relationships")
+            return result
 
         except Exception as e:
             logger.error(f"Error in extract_knowledge_graph_elements: {str(e)}")
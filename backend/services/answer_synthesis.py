@@ -0,0 +1,246 @@
+import asyncio
+import html
+import json
+import logging
+from dataclasses import dataclass
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+from config.settings import settings
+from schemas import ResearchAnswer, URLContent
+from services.ai_service import ai_service
+from services.context_packer import estimate_tokens, html_to_text, split_passages
+
+logger = logging.getLogger(__name__)
+
+SYNTHESIS_MODES = ("single", "map_reduce", "auto")
+
+NO_NOTES_MESSAGE = "No usable notes could be extracted from the sources. Please try again."
+
+
+@dataclass
+class SourceChunk:
+    """A source, or part of a large source, extracted by one map call"""
+    url: str
+    title: str
+    index: int
+    count: int
+    text: str
+
+
+def _event(event_type: str, data) -> str:
+    return json.dumps({"type": event_type, "data": data}) + "\n"
+
+
+def split_source_chunks(source_content: List[URLContent], chunk_tokens: int) -> List[SourceChunk]:
+    """
+    Convert sources to text and split any larger than chunk_tokens into chunks.
+
+    Sources with fetch errors or no text are skipped.
+    """
+    chunks: List[SourceChunk] = []
+    for content in source_content:
+        if content.error:
+            continue
+        groups: List[List[str]] = []
+        group_tokens = 0
+        for passage in split_passages(html_to_text(content.text), settings.CONTEXT_PASSAGE_TOKENS):
+            tokens = estimate_tokens(passage)
+            if not groups or group_tokens + tokens > chunk_tokens:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(passage)
+            group_tokens += tokens
+        groups = [group for group in groups if any(p.strip() for p in group)]
+        for index, group in enumerate(groups):
+            chunks.append(SourceChunk(
+                content.url, content.title, index, len(groups), "\n\n".join(group)))
+    return chunks
+
+
+def notes_to_sources(notes: List[Tuple[SourceChunk, str]]) -> List[URLContent]:
+    """Combine per-chunk notes into one URLContent per source, in chunk order."""
+    by_url: Dict[str, List[Tuple[SourceChunk, str]]] = {}
+    for chunk, text in notes:
+        by_url.setdefault(chunk.url, []).append((chunk, text))
+
+    sources = []
+    for url, entries in by_url.items():
+        entries.sort(key=lambda entry: entry[0].index)
+        # Notes are plain text; escape them so the packer's HTML conversion keeps them intact
+        lines = [line for _, text in entries for line in text.splitlines() if line.strip()]
+        sources.append(URLContent(
+            url=url,
+            title=entries[0][0].title,
+            text="".join(f"<p>{html.escape(line)}</p>" for line in lines),
+            content_type='html'
+        ))
+    return sources
+
+
+class AnswerSynthesizer:
+    """
+    Generates research answers in a single call or by map-reduce.
+
+    In map-reduce mode every source (or chunk of a large source) is first
+    reduced to notes by a concurrent, bounded set of extraction calls. A
+    final call then synthesizes the answer from the combined notes, which
+    keeps large source sets within the model's context.
+    """
+
+    def __init__(self,
+                 map_concurrency: int = settings.SYNTHESIS_MAP_CONCURRENCY,
+                 chunk_tokens: int = settings.SYNTHESIS_MAP_CHUNK_TOKENS,
+                 map_reduce_min_sources: int = settings.SYNTHESIS_MAP_REDUCE_MIN_SOURCES):
+        self.map_concurrency = map_concurrency
+        self.chunk_tokens = chunk_tokens
+        self.map_reduce_min_sources = map_reduce_min_sources
+
+    def resolve_mode(self, mode: Optional[str], source_content: List[URLContent]) -> str:
+        """Resolve 'auto' (or no mode) to 'single' or 'map_reduce' based on the number of sources."""
+        mode = mode or "single"
+        if mode not in SYNTHESIS_MODES:
+            raise ValueError(f"Unsupported synthesis mode: {mode}")
+        if mode == "auto":
+            sources = sum(1 for content in source_content if not content.error)
+            return "map_reduce" if sources >= self.map_reduce_min_sources else "single"
+        return mode
+
+    async def _map(self,
+                   question: str,
+                   chunks: List[SourceChunk],
+                   model: Optional[str] = None
+                   ) -> AsyncGenerator[Tuple[SourceChunk, Optional[str], Optional[Exception]], None]:
+        """Run extraction calls under the concurrency limit, yielding results as they complete."""
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def extract(chunk: SourceChunk):
+            async with semaphore:
+                try:
+                    notes = await ai_service.extract_source_notes(
+                        question, chunk.url, chunk.title, chunk.text, model)
+                    return chunk, notes, None
+                except Exception as e:
+                    logger.error(f"Error extracting notes from {chunk.url}: {str(e)}")
+                    return chunk, None, e
+
+        tasks = [asyncio.create_task(extract(chunk)) for chunk in chunks]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _prepare(self, question: str, source_content: List[URLContent]) -> List[SourceChunk]:
+        chunks = await asyncio.to_thread(split_source_chunks, source_content, self.chunk_tokens)
+        logger.info(
+            f"Map-reduce synthesis over {len(chunks)} chunks from {len(source_content)} sources")
+        return chunks
+
+    async def answer(self,
+                     question: str,
+                     source_content: List[URLContent],
+                     mode: Optional[str] = None,
+                     model: Optional[str] = None
+                     ) -> ResearchAnswer:
+        """
+        Generate a research answer.
+
+        Args:
+            question (str): The research question
+            source_content (List[URLContent]): Fetched sources
+            mode (str, optional): 'single', 'map_reduce' or 'auto'; defaults to 'single'
+            model (str, optional): Model for the final answer
+
+        Returns:
+            ResearchAnswer: The synthesized answer
+        """
+        if self.resolve_mode(mode, source_content) == "single":
+            return await ai_service.get_research_answer(question, source_content, model)
+
+        try:
+            chunks = await self._prepare(question, source_content)
+            notes = [(chunk, text) async for chunk, text, _ in self._map(question, chunks) if text]
+            if not notes:
+                # Synthesizing from zero sources would return an ungrounded answer
+                logger.warning(f"Map-reduce synthesis produced no notes from {len(chunks)} chunks")
+                return ResearchAnswer(answer=NO_NOTES_MESSAGE, sources_used=[], confidence_score=0.0)
+            return await ai_service.get_research_answer(
+                question, notes_to_sources(notes), model)
+        except Exception as e:
+            logger.error(f"Error in map-reduce synthesis: {str(e)}")
+            return ResearchAnswer(
+                answer="Error generating answer. Please try again.",
+                sources_used=[],
+                confidence_score=0.0
+            )
+
+    async def answer_stream(self,
+                            question: str,
+                            source_content: List[URLContent],
+                            mode: Optional[str] = None,
+                            model: Optional[str] = None
+                            ) -> AsyncGenerator[str, None]:
+        """
+        Stream a research answer as NDJSON events.
+
+        Event types:
+        - map_started: number of sources and chunks (map-reduce only)
+        - map_result / map_error: notes extracted from each chunk as it completes
+        - answer_delta: raw text chunks of the final answer
+        - answer: the parsed ResearchAnswer
+        - error: a message if synthesis failed or no source yielded notes
+
+        Yields:
+            str: One JSON event per line
+        """
+        try:
+            mode = self.resolve_mode(mode, source_content)
+            sources = source_content
+            if mode == "map_reduce":
+                chunks = await self._prepare(question, source_content)
+                yield _event("map_started", {
+                    "sources": len({chunk.url for chunk in chunks}),
+                    "chunks": len(chunks)
+                })
+                notes = []
+                async for chunk, text, error in self._map(question, chunks):
+                    if error is not None:
+                        yield _event("map_error", {
+                            "url": chunk.url, "chunk": chunk.index, "error": str(error)})
+                        continue
+                    if text:
+                        notes.append((chunk, text))
+                    yield _event("map_result", {
+                        "url": chunk.url,
+                        "title": chunk.title,
+                        "chunk": chunk.index,
+                        "chunks": chunk.count,
+                        "notes": text
+                    })
+                if not notes:
+                    logger.warning(
+                        f"Map-reduce synthesis produced no notes from {len(chunks)} chunks")
+                    yield _event("error", NO_NOTES_MESSAGE)
+                    return
+                sources = notes_to_sources(notes)
+
+            formatted_sources, context_stats = await ai_service.pack_sources(
+                question, sources, model)
+            response = []
+            async for chunk in ai_service.generate_answer_from_sources_stream(
+                    question, formatted_sources, model):
+                response.append(chunk)
+                yield _event("answer_delta", chunk)
+
+            answer = ai_service.parse_research_answer("".join(response), context_stats)
+            yield _event("answer", answer.model_dump())
+
+        except Exception as e:
+            logger.error(f"Error streaming research answer: {str(e)}")
+            yield _event("error", "Error generating answer. Please try again.")
+
+
+# Create a singleton instance
+answer_synthesizer = AnswerSynthesizer()
+
+__all__ = ['answer_synthesizer', 'SYNTHESIS_MODES']
@@ -1,20 +1,22 @@
+from dataclasses import replace
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends, Security
 from fastapi.security import HTTPBearer
 from fastapi.security import HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from models import User
 from schemas import UserCreate, Token
 from config.settings import settings
-from database import get_db
+from database import get_session_factory
+from services.user_cache import user_cache, UserPrincipal
+from services.password_service import password_service, PasswordServiceBusy
 import logging
 import time
 import traceback
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = settings.JWT_SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
@@ -22,9 +24,14 @@ logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
-# def verify_password(plain_password: str, hashed_password: str) -> bool:
-#     logger.debug("Verifying password")
-#     return pwd_context.verify(plain_password, hashed_password)
+
+def _password_service_busy(e: PasswordServiceBusy) -> HTTPException:
+    logger.warning(f"Rejecting authentication request: {str(e)}")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -35,21 +42,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    logger.debug(f"Token payload: {to_encode}")
+    logger.debug("Token payload: %s", to_encode)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     logger.info("Access token created successfully")
     return encoded_jwt
 
 
 def get_password_hash(password: str) -> str:
+    """Hash a password synchronously; async handlers use password_service.hash"""
     logger.debug("Hashing password")
-    return pwd_context.hash(password)
+    return password_service.hash_sync(password)
+
 
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """Look up a user by email"""
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
-async def create_user(db: Session, user: UserCreate):
+
+async def create_user(db: AsyncSession, user: UserCreate):
     logger.info(f"Attempting to create user with email: {user.email}")
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await get_user_by_email(db, user.email)
     if db_user:
         logger.warning(f"User with email {user.email} already exists")
         raise HTTPException(
@@ -60,21 +74,24 @@ async def create_user(db: Session, user: UserCreate):
     try:
         # Create new user
         logger.debug("Hashing password for new user")
-        hashed_password = get_password_hash(user.password)
+        try:
+            hashed_password = await password_service.hash(user.password)
+        except PasswordServiceBusy as e:
+            raise _password_service_busy(e)
         db_user = User(email=user.email, password=hashed_password)
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         logger.info(f"Successfully created user with email: {user.email}")
         return db_user
     except Exception as e:
         logger.error(f"Error creating user: {str(e)}")
         logger.error(traceback.format_exc())
-        db.rollback()
+        await db.rollback()
         raise
 
 
-async def login_user(db: Session, email: str, password: str) -> Token:
+async def login_user(db: AsyncSession, email: str, password: str) -> Token:
     """
     Authenticate user and return JWT token
     """
@@ -82,11 +99,11 @@ async def login_user(db: Session, email: str, password: str) -> Token:
     try:
         # Query user
         logger.debug("Querying database for user")
-        user = db.query(User).filter(User.email == email).first()
+        user = await get_user_by_email(db, email)
 
         # Log user query result
         if user:
-            logger.debug(f"Found user with ID: {user.user_id}")
+            logger.debug("Found user with ID: %s", user.user_id)
         else:
             logger.warning(f"No user found with email: {email}")
             raise HTTPException(
@@ -96,16 +113,26 @@ async def login_user(db: Session, email: str, password: str) -> Token:
 
         # Verify password
         logger.debug("Verifying password")
-        if not pwd_context.verify(password, user.password):
+        try:
+            verified, new_hash = await password_service.verify_and_update(password, user.password)
+        except PasswordServiceBusy as e:
+            raise _password_service_busy(e)
+        if not verified:
             logger.warning(f"Invalid password attempt for user: {email}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
 
+        # Upgrade hashes created with a different bcrypt cost
+        if new_hash is not None:
+            logger.info(f"Rehashing password for user: {email}")
+            user.password = new_hash
+            await db.commit()
+
         # Extract username from email
         username = email.split('@')[0]
-        logger.debug(f"Generated username: {username}")
+        logger.debug("Generated username: %s", username)
 
         # Create token
         logger.debug("Creating access token")
@@ -114,7 +141,7 @@ async def login_user(db: Session, email: str, password: str) -> Token:
             "user_id": user.user_id,
             "username": username
         }
-        logger.debug(f"Token data: {token_data}")
+        logger.debug("Token data: %s", token_data)
 
         access_token = create_access_token(data=token_data)
         logger.info(f"Successfully logged in user: {email}")
@@ -138,23 +165,26 @@ async def login_user(db: Session, email: str, password: str) -> Token:
 # called as Depends(auth_service.validate_token) in routers
 # retrieves credentials from request header
 # decodes token using jwt and extracts payload with email and username
-# retrieves user record from database based on email
-# returns user object
+# retrieves the user from the principal cache, or the database on a miss
+# returns user principal
 
 
 async def validate_token(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db)
-) -> User:
+    session_factory: async_sessionmaker = Depends(get_session_factory)
+) -> UserPrincipal:
     """
     Validate JWT token and return user
 
+    The user is looked up in the principal cache first; a database session
+    is only opened on a cache miss.
+
     Args:
         credentials: HTTP Authorization credentials containing the JWT token
-        db: Database session
+        session_factory: Opens the session used on a cache miss
 
     Returns:
-        User: Authenticated user object
+        UserPrincipal: Authenticated user
 
     Raises:
         HTTPException: If token is invalid or user not found
@@ -167,7 +197,7 @@ async def validate_token(
 
         logger.debug("Decoding JWT token")
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        logger.debug(f"Token payload: {payload}")
+        logger.debug("Token payload: %s", payload)
 
         exp_timestamp = payload.get('exp')
         time_until_expiry = exp_timestamp - int(time.time())
@@ -184,27 +214,26 @@ async def validate_token(
                 detail="Invalid token payload"
             )
 
-        # Get database session
-        if not isinstance(db, Session):
-            logger.error(f"Invalid database session type: {type(db)}")
-            raise HTTPException(
-                status_code=500,
-                detail="Database configuration error"
-            )
+        cached, principal = user_cache.get(email)
+        if not cached:
+            logger.debug("Querying user from database")
+            generation = user_cache.generation
+            async with session_factory() as db:
+                user = await get_user_by_email(db, email)
+            principal = UserPrincipal(user.user_id, user.email) if user is not None else None
+            user_cache.set(email, principal, exp_timestamp, generation)
 
-        logger.debug("Querying user from database")
-        user = db.query(User).filter(User.email == email).first()
-        if user is None:
+        if principal is None:
             logger.error(f"No user found for email: {email}")
             raise HTTPException(
                 status_code=401,
                 detail="User not found"
             )
 
-        # Add username to user object for convenience
-        user.username = username
+        # Add username to the principal for convenience
+        principal = replace(principal, username=username)
         logger.info(f"Successfully validated token for user: {email}")
-        return user
+        return principal
 
     except JWTError as e:
         logger.error("############## JWT validation error ##############")
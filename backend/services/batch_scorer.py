@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from config.settings import settings
+from schemas import SearchResult
+from services.ai_service import ai_service
+from services.llm.admission import llm_priority, Priority
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ScoreRequest:
+    query: str
+    results: List[SearchResult]
+    future: asyncio.Future
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+class BatchScorer:
+    """
+    Micro-batches relevance scoring across queries.
+
+    Scoring requests arriving within a short window are combined into a
+    single LLM request. A batch is sent as soon as the window closes or
+    the batch reaches max_batch_results, so the first results still
+    stream quickly.
+    """
+
+    def __init__(self,
+                 window: float = settings.SCORING_BATCH_WINDOW,
+                 max_batch_results: int = settings.SCORING_MAX_BATCH_RESULTS):
+        self.window = window
+        self.max_batch_results = max_batch_results
+        self._pending: List[_ScoreRequest] = []
+        self._pending_results = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Batches being scored; the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Statistics
+        self._batches = 0
+        self._requests = 0
+        self._results = 0
+        self._max_batch_requests = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._wait_total = 0.0
+
+    async def score(self, query: str, results: List[SearchResult]) -> List[SearchResult]:
+        """
+        Score results against the query that found them, batched with other callers.
+
+        Args:
+            query (str): The search query
+            results (List[SearchResult]): Results to score
+
+        Returns:
+            List[SearchResult]: Scored copies of the results, sorted by relevance
+        """
+        if not results:
+            return []
+
+        loop = asyncio.get_running_loop()
+        request = _ScoreRequest(query, results, loop.create_future())
+        self._pending.append(request)
+        self._pending_results += len(results)
+
+        if self._pending_results >= self.max_batch_results:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await request.future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending, self._pending_results = self._pending, [], 0
+        if batch:
+            task = asyncio.create_task(self._score_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score_batch(self, batch: List[_ScoreRequest]) -> None:
+        start_time = time.perf_counter()
+        groups = [
+            (request.query, [
+                {
+                    'url': result.link,
+                    'content': f"Title: {result.title}\nSnippet: {result.snippet}"
+                }
+                for result in request.results
+            ])
+            for request in batch
+        ]
+
+        try:
+            # Scoring yields to interactive LLM calls when providers are saturated
+            with llm_priority(Priority.BACKGROUND):
+                if len(groups) == 1:
+                    all_scores = [await ai_service.score_results(*groups[0])]
+                else:
+                    all_scores = await ai_service.score_results_batch(groups)
+        except asyncio.CancelledError:
+            for request in batch:
+                request.future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Error scoring batch: {str(e)}")
+            all_scores = [[] for _ in batch]
+
+        latency = time.perf_counter() - start_time
+        result_count = sum(len(request.results) for request in batch)
+        self._record(batch, result_count, start_time, latency)
+        logger.info(
+            f"Scored batch of {len(batch)} queries ({result_count} results) in {latency:.2f}s")
+
+        for request, scores in zip(batch, all_scores):
+            if request.future.done():
+                continue
+            score_map = {score['url']: score['score'] for score in scores}
+            scored_results = []
+            for result in request.results:
+                result_copy = result.copy()
+                result_copy.relevance_score = score_map.get(result.link, 50.0)
+                scored_results.append(result_copy)
+            scored_results.sort(key=lambda x: x.relevance_score, reverse=True)
+            request.future.set_result(scored_results)
+
+    async def shutdown(self) -> None:
+        """Cancel batches waiting for their window or being scored. Called at application shutdown."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for request in self._pending:
+            request.future.cancel()
+        self._pending, self._pending_results = [], 0
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _record(self, batch: List[_ScoreRequest], result_count: int,
+                start_time: float, latency: float) -> None:
+        self._batches += 1
+        self._requests += len(batch)
+        self._results += result_count
+        self._max_batch_requests = max(self._max_batch_requests, len(batch))
+        self._latency_total += latency
+        self._latency_max = max(self._latency_max, latency)
+        self._wait_total += sum(start_time - request.submitted_at for request in batch)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get batching statistics.
+
+        Returns:
+            Dict[str, float]: Batch counts, average/max batch size and scoring latency
+        """
+        batches = self._batches or 1
+        requests = self._requests or 1
+        return {
+            "batches": self._batches,
+            "requests": self._requests,
+            "results": self._results,
+            "avg_batch_requests": self._requests / batches,
+            "max_batch_requests": self._max_batch_requests,
+            "avg_batch_results": self._results / batches,
+            "avg_latency_ms": self._latency_total / batches * 1000,
+            "max_latency_ms": self._latency_max * 1000,
+            "avg_window_wait_ms": self._wait_total / requests * 1000,
+        }
+
+
+# Create a singleton instance
+batch_scorer = BatchScorer()
+
+__all__ = ['batch_scorer']
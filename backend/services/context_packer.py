@@ -0,0 +1,195 @@
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+import lxml.etree
+import lxml.html
+from config.settings import settings
+from schemas import ContextStats, URLContent
+from services.pre_ranker import PreRanker
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for English text; avoids a tokenizer round trip per passage
+CHARS_PER_TOKEN = 4
+
+BLOCK_TAGS = frozenset([
+    'p', 'br', 'div', 'li', 'tr', 'blockquote', 'pre', 'hr', 'table', 'ul', 'ol',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article', 'main',
+])
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+WHITESPACE = re.compile(r"[ \t\r\f\v]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _inline(text: str) -> str:
+    return text.replace("\n", " ")
+
+
+def html_to_text(html: str) -> str:
+    """
+    Convert sanitized HTML to compact plain text.
+
+    Block elements become line breaks and runs of whitespace are collapsed.
+    """
+    if not html or not html.strip() or html == "None":
+        return ""
+    try:
+        root = lxml.html.fragment_fromstring(html, create_parent='div')
+    except (lxml.etree.ParserError, ValueError):
+        return WHITESPACE.sub(" ", html).strip()
+
+    # Source newlines are plain whitespace; only block elements break lines
+    parts: List[str] = []
+    for event, element in lxml.etree.iterwalk(root, events=("start", "end")):
+        if not isinstance(element.tag, str):
+            if event == "end" and element.tail:
+                parts.append(_inline(element.tail))
+            continue
+        if event == "start":
+            if element.tag in BLOCK_TAGS:
+                parts.append("\n")
+            if element.text:
+                parts.append(_inline(element.text))
+        else:
+            if element.tag in BLOCK_TAGS:
+                parts.append("\n")
+            if element.tail and element is not root:
+                parts.append(_inline(element.tail))
+
+    lines = (WHITESPACE.sub(" ", line).strip() for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def split_passages(text: str, target_tokens: int) -> List[str]:
+    """
+    Split text into passages of about target_tokens.
+
+    Consecutive short lines are merged; lines longer than the target are
+    split at sentence boundaries.
+    """
+    pieces: List[str] = []
+    for line in text.split("\n"):
+        if estimate_tokens(line) <= target_tokens:
+            pieces.append(line)
+        else:
+            pieces.extend(SENTENCE_BOUNDARY.split(line))
+
+    passages: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > target_tokens:
+            passages.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+def get_token_budget(model: str) -> int:
+    """Token budget for source content when answering with the given model."""
+    return settings.CONTEXT_TOKEN_BUDGETS.get(model, settings.CONTEXT_TOKEN_BUDGET_DEFAULT)
+
+
+@dataclass
+class _Passage:
+    source: int
+    position: int
+    text: str
+    tokens: int
+    score: float = 0.0
+
+
+class ContextPacker:
+    """
+    Packs source content into a token budget for answer generation.
+
+    Sources are converted from HTML to text and split into passages, which
+    are ranked against the question with the local pre-ranker. The best
+    passage of every source is taken first so each source is represented,
+    then the remaining budget is filled by score. Selected passages are
+    emitted per source in their original order.
+    """
+
+    def __init__(self, passage_tokens: int = settings.CONTEXT_PASSAGE_TOKENS):
+        self.passage_tokens = passage_tokens
+        self.ranker = PreRanker(mode="local")
+
+    def pack(self,
+             question: str,
+             source_content: List[URLContent],
+             budget: int
+             ) -> Tuple[str, ContextStats]:
+        """
+        Build the source section of an answer prompt.
+
+        Args:
+            question (str): The research question
+            source_content (List[URLContent]): Fetched sources; sources with errors are skipped
+            budget (int): Maximum estimated tokens of passage text
+
+        Returns:
+            Tuple[str, ContextStats]: The formatted sources and packing statistics
+        """
+        sources = [content for content in source_content if not content.error]
+        passages: List[_Passage] = []
+        for index, content in enumerate(sources):
+            text = html_to_text(content.text)
+            for position, passage in enumerate(split_passages(text, self.passage_tokens)):
+                passages.append(_Passage(index, position, passage, estimate_tokens(passage)))
+
+        if passages:
+            scores = self.ranker.score(question, [p.text for p in passages])
+            for passage, score in zip(passages, scores):
+                passage.score = float(score)
+
+        by_score = sorted(passages, key=lambda p: p.score, reverse=True)
+        best_per_source: Dict[int, _Passage] = {}
+        for passage in by_score:
+            best_per_source.setdefault(passage.source, passage)
+        ordered = list(best_per_source.values()) + [
+            p for p in by_score if best_per_source[p.source] is not p]
+
+        selected: List[_Passage] = []
+        used_tokens = 0
+        for passage in ordered:
+            # Skip passages that don't fit; a later, shorter one may
+            if used_tokens + passage.tokens <= budget:
+                selected.append(passage)
+                used_tokens += passage.tokens
+
+        selected.sort(key=lambda p: (p.source, p.position))
+        sections = []
+        for index, content in enumerate(sources):
+            texts = [p.text for p in selected if p.source == index]
+            if texts:
+                sections.append(
+                    f"Source ({content.url}):\nTitle: {content.title}\n" + "\n\n".join(texts))
+
+        total_tokens = sum(p.tokens for p in passages)
+        stats = ContextStats(
+            sources=len(sources),
+            sources_used=len(sections),
+            passages=len(passages),
+            passages_used=len(selected),
+            token_budget=budget,
+            tokens_total=total_tokens,
+            tokens_used=used_tokens,
+            tokens_dropped=total_tokens - used_tokens,
+        )
+        return "\n\n".join(sections), stats
+
+
+# Create a singleton instance
+context_packer = ContextPacker()
+
+__all__ = ['context_packer', 'get_token_budget', 'html_to_text']
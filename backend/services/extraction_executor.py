@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from config.settings import settings
+from html_extraction import extract_html_content, warm_up
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_MODES = ("process", "thread", "inline")
+
+
+class ExtractionExecutor:
+    """
+    Runs CPU-bound HTML parsing and sanitization off the event loop.
+
+    The backing executor is selected by mode:
+    - process: a process pool sized to the available cores (default)
+    - thread: a thread pool, useful where processes are unavailable
+    - inline: run on the event loop, as before (debugging / tests)
+    """
+
+    def __init__(self,
+                 mode: str = settings.EXTRACTION_EXECUTOR,
+                 max_workers: Optional[int] = settings.EXTRACTION_WORKERS):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unsupported extraction executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+
+        # Statistics
+        self._queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._parse_seconds_total = 0.0
+        self._parse_seconds_max = 0.0
+        self._wait_seconds_total = 0.0
+
+    def _create_executor(self) -> Optional[Executor]:
+        if self.mode == "process":
+            logger.info(
+                f"Starting extraction process pool with {self.max_workers} workers")
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(
+                    settings.EXTRACTION_START_METHOD)
+            )
+        if self.mode == "thread":
+            logger.info(
+                f"Starting extraction thread pool with {self.max_workers} workers")
+            return ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="html-extraction"
+            )
+        return None
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self._executor is None and self.mode != "inline":
+            self._executor = self._create_executor()
+        return self._executor
+
+    async def startup(self) -> None:
+        """Create the pool and warm up every worker. Called at application startup."""
+        executor = self._get_executor()
+        if executor is None:
+            return
+
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # One warm-up task per worker so each process pays its import cost now
+        await asyncio.gather(*[
+            loop.run_in_executor(executor, warm_up)
+            for _ in range(self.max_workers)
+        ])
+        logger.info(
+            f"Extraction executor warmed up in {time.perf_counter() - start_time:.2f}s")
+
+    async def extract(self, html: str, engine: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Extract the title and sanitized main content of an HTML page.
+
+        Args:
+            html (str): Raw HTML of the page
+            engine (str, optional): Extraction engine name, defaults to settings.HTML_EXTRACTION_ENGINE
+
+        Returns:
+            Tuple[str, str]: The page title and sanitized HTML
+        """
+        engine = engine or settings.HTML_EXTRACTION_ENGINE
+        submitted_at = time.perf_counter()
+        self._queued += 1
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                title, cleaned_html, parse_seconds = extract_html_content(
+                    html, engine)
+            else:
+                loop = asyncio.get_running_loop()
+                title, cleaned_html, parse_seconds = await loop.run_in_executor(
+                    executor, extract_html_content, html, engine)
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._queued -= 1
+
+        self._completed += 1
+        self._parse_seconds_total += parse_seconds
+        self._parse_seconds_max = max(self._parse_seconds_max, parse_seconds)
+        self._wait_seconds_total += max(
+            0.0, time.perf_counter() - submitted_at - parse_seconds)
+        logger.debug(
+            f"Extracted {len(html)} bytes of HTML with {engine} in {parse_seconds * 1000:.1f}ms")
+        return title, cleaned_html
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get executor statistics.
+
+        Returns:
+            Dict[str, float]: Queue depth, completed/failed counts and parse timings
+        """
+        completed = self._completed or 1
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "queue_depth": self._queued,
+            "completed": self._completed,
+            "failed": self._failed,
+            "avg_parse_ms": self._parse_seconds_total / completed * 1000,
+            "max_parse_ms": self._parse_seconds_max * 1000,
+            "avg_queue_wait_ms": self._wait_seconds_total / completed * 1000,
+        }
+
+    async def shutdown(self) -> None:
+        """Stop the pool. Called at application shutdown."""
+        if self._executor is not None:
+            logger.info("Shutting down extraction executor")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Create a singleton instance
+extraction_executor = ExtractionExecutor()
+
+__all__ = ['extraction_executor']
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar, Union
+from urllib.parse import urlparse
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+MAX_TRACKED_DOMAINS = 1024
+
+
+class FetchDeadlineExceeded(Exception):
+    """Raised for URLs that were not fetched before the batch deadline"""
+    pass
+
+
+class TokenBucket:
+    """Simple token bucket used to space out requests to a single domain"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and consume it."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FetchScheduler:
+    """
+    Schedules outbound page fetches with a global concurrency cap,
+    per-domain politeness and an optional deadline per batch.
+    """
+
+    def __init__(self,
+                 max_concurrency: int = settings.FETCH_MAX_CONCURRENCY,
+                 per_domain_rate: float = settings.FETCH_PER_DOMAIN_RATE,
+                 per_domain_burst: float = settings.FETCH_PER_DOMAIN_BURST,
+                 batch_deadline: float = settings.FETCH_BATCH_DEADLINE):
+        self.max_concurrency = max_concurrency
+        self.per_domain_rate = per_domain_rate
+        self.per_domain_burst = per_domain_burst
+        self.batch_deadline = batch_deadline
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket_for(self, url: str) -> TokenBucket:
+        domain = (urlparse(str(url)).hostname or '').lower()
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            bucket = TokenBucket(self.per_domain_rate, self.per_domain_burst)
+            self._buckets[domain] = bucket
+            # Forget the least recently used domains
+            while len(self._buckets) > MAX_TRACKED_DOMAINS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(domain)
+        return bucket
+
+    async def run(self, url: str, fetch: Callable[[str], Awaitable[T]]) -> T:
+        """
+        Fetch a single URL once both its domain and the global limit allow it.
+
+        Args:
+            url (str): The URL to fetch
+            fetch (Callable): Coroutine function performing the actual fetch
+
+        Returns:
+            The result of fetch(url)
+        """
+        await self._bucket_for(url).acquire()
+        async with self._semaphore:
+            return await fetch(url)
+
+    async def run_batch(self,
+                        urls: List[str],
+                        fetch: Callable[[str], Awaitable[T]],
+                        priorities: Optional[Dict[str, float]] = None,
+                        deadline: Optional[float] = None
+                        ) -> List[Union[T, BaseException]]:
+        """
+        Fetch a batch of URLs, highest priority first.
+
+        Args:
+            urls (List[str]): URLs to fetch
+            fetch (Callable): Coroutine function performing the actual fetch
+            priorities (Dict[str, float], optional): Priority per URL (e.g. relevance score)
+            deadline (float, optional): Seconds allowed for the whole batch
+
+        Returns:
+            List aligned with urls holding each result, or the exception raised for it.
+            URLs not completed before the deadline get a FetchDeadlineExceeded.
+        """
+        if not urls:
+            return []
+
+        priorities = priorities or {}
+        deadline = deadline or self.batch_deadline
+
+        # Tasks queue on the semaphore in creation order, so create them by priority
+        order = sorted(range(len(urls)),
+                       key=lambda i: priorities.get(urls[i], 0.0), reverse=True)
+        tasks: Dict[int, asyncio.Task] = {
+            i: asyncio.create_task(self.run(urls[i], fetch)) for i in order
+        }
+
+        done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        if pending:
+            logger.warning(
+                f"Fetch batch deadline of {deadline}s reached with {len(pending)} of {len(urls)} URLs pending")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        results: List[Union[T, BaseException]] = []
+        for i in range(len(urls)):
+            task = tasks[i]
+            if task in pending:
+                results.append(FetchDeadlineExceeded(
+                    f"Fetch deadline of {deadline}s exceeded"))
+            elif task.exception() is not None:
+                results.append(task.exception())
+            else:
+                results.append(task.result())
+        return results
+
+
+# Create a singleton instance
+fetch_scheduler = FetchScheduler()
+
+__all__ = ['fetch_scheduler', 'FetchDeadlineExceeded']
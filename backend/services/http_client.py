@@ -0,0 +1,128 @@
+import aiohttp
+import asyncio
+import httpx
+import logging
+import ssl
+import certifi
+from typing import Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClientPool:
+    """
+    Application-lifetime pool of outbound HTTP connections.
+
+    A single aiohttp ClientSession is shared by every outbound search call and a
+    single httpx AsyncClient by every page fetch, so that the CA bundle is parsed
+    once and TCP/TLS connections are kept alive and reused between requests
+    instead of being rebuilt per call.
+    """
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._fetch_client: Optional[httpx.AsyncClient] = None
+        self._lock = asyncio.Lock()
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        # Create SSL context with verified certificates once for the whole app
+        ssl_context = ssl.create_default_context(cafile=certifi.where())
+
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit=settings.HTTP_POOL_LIMIT,
+            limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT
+        )
+        timeout = aiohttp.ClientTimeout(total=settings.HTTP_REQUEST_TIMEOUT)
+
+        logger.info(
+            f"Creating shared HTTP session (limit={settings.HTTP_POOL_LIMIT}, "
+            f"limit_per_host={settings.HTTP_POOL_LIMIT_PER_HOST}, "
+            f"dns_ttl={settings.HTTP_DNS_CACHE_TTL}s)")
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    def _create_fetch_client(self) -> httpx.AsyncClient:
+        http2 = settings.FETCH_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning(
+                    "FETCH_HTTP2 is enabled but the 'h2' package is not installed; falling back to HTTP/1.1")
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=settings.FETCH_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.FETCH_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.FETCH_KEEPALIVE_EXPIRY
+        )
+        timeout = httpx.Timeout(
+            settings.FETCH_TIMEOUT, connect=settings.FETCH_CONNECT_TIMEOUT)
+
+        logger.info(
+            f"Creating shared fetch client (http2={http2}, "
+            f"max_connections={settings.FETCH_MAX_CONNECTIONS}, "
+            f"max_keepalive={settings.FETCH_MAX_KEEPALIVE_CONNECTIONS})")
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=timeout,
+            verify=certifi.where(),
+            follow_redirects=True
+        )
+
+    async def startup(self) -> None:
+        """Create the shared clients. Called once at application startup."""
+        await self.get_session()
+        await self.get_fetch_client()
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the shared session, creating it lazily if startup has not run
+        (e.g. when services are used from scripts or tests).
+
+        Returns:
+            aiohttp.ClientSession: The shared client session
+        """
+        if self._session is None or self._session.closed:
+            async with self._lock:
+                if self._session is None or self._session.closed:
+                    self._session = self._create_session()
+        return self._session
+
+    async def get_fetch_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared page fetch client, creating it lazily if needed.
+
+        Connections are pooled per origin, so repeated fetches to the same domain
+        reuse sockets (and are multiplexed over one connection with HTTP/2).
+
+        Returns:
+            httpx.AsyncClient: The shared fetch client
+        """
+        if self._fetch_client is None or self._fetch_client.is_closed:
+            async with self._lock:
+                if self._fetch_client is None or self._fetch_client.is_closed:
+                    self._fetch_client = self._create_fetch_client()
+        return self._fetch_client
+
+    async def close(self) -> None:
+        """Close the shared clients and release pooled connections."""
+        if self._session is not None and not self._session.closed:
+            logger.info("Closing shared HTTP session")
+            await self._session.close()
+        self._session = None
+
+        if self._fetch_client is not None and not self._fetch_client.is_closed:
+            logger.info("Closing shared fetch client")
+            await self._fetch_client.aclose()
+        self._fetch_client = None
+
+
+# Create a singleton instance
+http_client_pool = HTTPClientPool()
+
+__all__ = ['http_client_pool']
@@ -0,0 +1,326 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for prompts, matching the context packer's heuristic
+CHARS_PER_TOKEN = 4
+# Output tokens reserved per request before actual usage is known
+RESERVED_OUTPUT_TOKENS = 1024
+
+OVERLOAD_STATUS_CODES = (429, 529)
+RETRYABLE_STATUS_CODES = (408, 409, 500, 502, 503, 504) + OVERLOAD_STATUS_CODES
+
+
+class Priority(IntEnum):
+    """Admission priority classes; lower values are admitted first"""
+    INTERACTIVE = 0  # Streaming responses a user is waiting on
+    NORMAL = 1
+    BACKGROUND = 2  # Fan-out work such as relevance scoring
+
+
+_request_priority: ContextVar[Optional[Priority]] = ContextVar("llm_request_priority", default=None)
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """Run LLM calls made within the block (and tasks it creates) at the given priority."""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def current_priority(default: Priority = Priority.NORMAL) -> Priority:
+    """The priority set by the innermost llm_priority block, or the default."""
+    priority = _request_priority.get()
+    return default if priority is None else priority
+
+
+def estimate_request_tokens(messages: List[Dict[str, str]],
+                            system: Optional[str] = None,
+                            max_tokens: Optional[int] = None) -> int:
+    """Estimate the tokens a request will consume, for reserving TPM budget up front."""
+    chars = len(system or "") + sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // CHARS_PER_TOKEN + min(max_tokens or RESERVED_OUTPUT_TOKENS, RESERVED_OUTPUT_TOKENS)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def is_overloaded(error: Exception) -> bool:
+    """Whether an error is a rate limit (429) or overload (529) response."""
+    return _status_code(error) in OVERLOAD_STATUS_CODES
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed request may succeed if retried."""
+    if _status_code(error) in RETRYABLE_STATUS_CODES:
+        return True
+    # SDK connection and timeout errors carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Ticket:
+    """An admitted request; report actual usage so the TPM budget is reconciled"""
+
+    def __init__(self, limiter: Optional["ModelLimiter"], reserved_tokens: int):
+        self.limiter = limiter
+        self.reserved_tokens = reserved_tokens
+        self.used_tokens: Optional[int] = None
+
+    def record_usage(self, input_tokens: int, output_tokens: int) -> None:
+        self.used_tokens = (input_tokens or 0) + (output_tokens or 0)
+
+
+class ModelLimiter:
+    """
+    Admission control for a single model.
+
+    Requests wait in a priority queue and are admitted while fewer than
+    `limit` are in flight and the tokens-per-minute bucket is not in debt.
+    The limit adapts AIMD-style: it grows by one per `limit` successful
+    requests and is multiplied by `decrease_factor` on 429/529 responses.
+    """
+
+    def __init__(self,
+                 model: str,
+                 max_concurrency: int,
+                 min_concurrency: int,
+                 tokens_per_minute: int,
+                 decrease_factor: float):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease_factor = decrease_factor
+        self.limit = float(max_concurrency)
+        self.active = 0
+
+        # Token bucket; the level may go negative when a request exceeds its reservation
+        self.capacity = float(tokens_per_minute)
+        self.refill_rate = tokens_per_minute / 60.0
+        self.level = self.capacity
+        self._refilled_at = time.monotonic()
+
+        self._waiters: List[Tuple[int, int, asyncio.Future, int]] = []
+        self._sequence = itertools.count()
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+
+        # Statistics
+        self.admitted = 0
+        self.overloads = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._refilled_at) * self.refill_rate)
+        self._refilled_at = now
+
+    async def acquire(self, reserved_tokens: int, priority: Priority) -> Ticket:
+        """Wait until the request is admitted."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future, reserved_tokens))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller was cancelled; give the slot and tokens back
+                self.active -= 1
+                self.level += reserved_tokens
+                self._dispatch()
+            raise
+        return Ticket(self, reserved_tokens)
+
+    def release(self, ticket: Ticket, overloaded: bool = False, rejected: bool = False) -> None:
+        """
+        Release an admitted request's slot and reconcile its token usage.
+
+        Args:
+            ticket (Ticket): The admission ticket
+            overloaded (bool): The provider answered 429/529; shrink the concurrency limit
+            rejected (bool): The request failed before consuming tokens; refund its reservation
+        """
+        self.active -= 1
+        if rejected:
+            self.level += ticket.reserved_tokens
+        elif ticket.used_tokens is not None:
+            self.level += ticket.reserved_tokens - ticket.used_tokens
+        if overloaded:
+            self.overloads += 1
+            self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+            logger.warning(
+                f"{self.model} overloaded, concurrency limit reduced to {int(self.limit)}")
+        elif ticket.used_tokens is not None:
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        self._refill()
+        while self._waiters and self.active < int(self.limit) and self.level >= 0:
+            _, _, future, reserved_tokens = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.active += 1
+            self.admitted += 1
+            self.level -= reserved_tokens
+            future.set_result(None)
+
+        # Blocked only by the token budget: try again once the bucket has refilled
+        if (self._waiters and self.active < int(self.limit) and self.level < 0
+                and self._retry_handle is None):
+            delay = -self.level / self.refill_rate if self.refill_rate else 1.0
+            self._retry_handle = asyncio.get_running_loop().call_later(
+                delay, self._retry_dispatch)
+
+    def _retry_dispatch(self) -> None:
+        self._retry_handle = None
+        self._dispatch()
+
+    def stats(self) -> Dict[str, float]:
+        self._refill()
+        return {
+            "limit": int(self.limit),
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "tokens_available": int(self.level),
+            "admitted": self.admitted,
+            "overloads": self.overloads,
+        }
+
+
+class AdmissionController:
+    """
+    Client-side admission control shared by all LLM providers.
+
+    Each model gets a ModelLimiter combining a priority queue, an adaptive
+    concurrency limit and a tokens-per-minute budget. Rate limit, overload,
+    server and connection errors are retried with exponential backoff,
+    honouring Retry-After when the provider sends it.
+    """
+
+    def __init__(self,
+                 enabled: bool = settings.LLM_ADMISSION_ENABLED,
+                 max_retries: int = settings.LLM_MAX_RETRIES,
+                 retry_base_delay: float = settings.LLM_RETRY_BASE_DELAY):
+        self.enabled = enabled
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        """Get or create the limiter for a model."""
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = ModelLimiter(
+                model,
+                max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                min_concurrency=settings.LLM_MIN_CONCURRENCY,
+                tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE.get(
+                    model, settings.LLM_TOKENS_PER_MINUTE_DEFAULT),
+                decrease_factor=settings.LLM_AIMD_DECREASE
+            )
+            self._limiters[model] = limiter
+        return limiter
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        # Full jitter so retrying requests don't synchronize
+        return random.uniform(0, self.retry_base_delay * (2 ** attempt))
+
+    @asynccontextmanager
+    async def request(self,
+                      model: str,
+                      estimated_tokens: int,
+                      send: Callable[[], Awaitable[Any]],
+                      priority: Optional[Priority] = None
+                      ) -> AsyncIterator[Tuple[Ticket, Any]]:
+        """
+        Admit and send a request, retrying retryable failures.
+
+        The request holds its slot until the block exits, so streaming
+        responses can be consumed inside it.
+
+        Args:
+            model (str): Model the request is sent to
+            estimated_tokens (int): Tokens to reserve from the TPM budget
+            send (Callable): Coroutine function sending the request
+            priority (Priority, optional): Overrides the priority from llm_priority
+
+        Yields:
+            Tuple[Ticket, Any]: The admission ticket and the response
+        """
+        if not self.enabled:
+            yield Ticket(None, estimated_tokens), await send()
+            return
+
+        limiter = self.limiter(model)
+        priority = current_priority() if priority is None else priority
+        attempt = 0
+        while True:
+            ticket = await limiter.acquire(estimated_tokens, priority)
+            try:
+                response = await send()
+            except Exception as e:
+                limiter.release(ticket, overloaded=is_overloaded(e), rejected=True)
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                logger.warning(
+                    f"LLM request to {model} failed ({str(e)}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # e.g. the caller was cancelled while the request was in flight
+                limiter.release(ticket, rejected=True)
+                raise
+            break
+
+        try:
+            yield ticket, response
+        except Exception as e:
+            # e.g. an overloaded error event part way through a stream
+            limiter.release(ticket, overloaded=is_overloaded(e))
+            raise
+        except BaseException:
+            limiter.release(ticket)
+            raise
+        else:
+            limiter.release(ticket)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get per-model admission statistics.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Limit, in-flight, queued, token budget and overload counts per model
+        """
+        return {model: limiter.stats() for model, limiter in self._limiters.items()}
+
+
+# Create a singleton instance
+admission_controller = AdmissionController()
+
+__all__ = ['admission_controller', 'Priority', 'llm_priority', 'estimate_request_tokens']
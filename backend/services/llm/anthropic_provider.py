@@ -1,8 +1,11 @@
 import anthropic
+import json
 import logging
 from typing import List, Dict, Optional, Any, AsyncGenerator
 from config.settings import settings
 from .base import LLMProvider
+from services.metrics import llm_metrics
+from .admission import admission_controller, estimate_request_tokens, current_priority, Priority
 import aiohttp
 import ssl
 import certifi
@@ -14,8 +17,10 @@ logger = logging.getLogger(__name__)
 
 class AnthropicProvider(LLMProvider):
     def __init__(self):
+        # Retries are handled by the admission controller so 429/529s adapt its limits
         self.client = anthropic.AsyncAnthropic(
-            api_key=settings.ANTHROPIC_API_KEY)
+            api_key=settings.ANTHROPIC_API_KEY,
+            max_retries=0)
 
     def get_default_model(self) -> str:
         return "claude-3-5-sonnet-20241022"
@@ -30,11 +35,19 @@ class AnthropicProvider(LLMProvider):
             model = model or self.get_default_model()
             max_tokens = max_tokens or DEFAULT_MAX_TOKENS
 
-            message = await self.client.messages.create(
-                model=model,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            messages = [{"role": "user", "content": prompt}]
+            with llm_metrics.track(self._provider_name(), model, "generate"):
+                async with admission_controller.request(
+                    model,
+                    estimate_request_tokens(messages, max_tokens=max_tokens),
+                    lambda: self.client.messages.create(
+                        model=model,
+                        max_tokens=max_tokens,
+                        messages=messages
+                    )
+                ) as (ticket, message):
+                    ticket.record_usage(
+                        message.usage.input_tokens, message.usage.output_tokens)
 
             # Log request statistics
             self._log_request_stats(
@@ -61,27 +74,15 @@ class AnthropicProvider(LLMProvider):
             model = model or self.get_default_model()
             max_tokens = max_tokens or DEFAULT_MAX_TOKENS
 
-            stream = await self.client.messages.create(
-                model=model,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}],
-                stream=True
-            )
-
-            # For streaming, we can't get exact token counts during the stream
-            # We'll log a simplified version at the end
-            async for message in stream:
-                if message.type == "content_block_delta":
-                    yield message.delta.text
+            params = {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "stream": True
+            }
 
-            # Log request statistics with estimated tokens
-            self._log_request_stats(
-                method="generate_stream",
-                model=model,
-                start_time=start_time,
-                input_tokens=0,  # Token counts not available in stream
-                output_tokens=0
-            )
+            async for text in self._stream(params, "generate_stream", start_time):
+                yield text
 
         except Exception as e:
             logger.error(
@@ -97,37 +98,83 @@ class AnthropicProvider(LLMProvider):
     ) -> str:
         try:
             start_time = time.time()
-            model = model or self.get_default_model()
-            max_tokens = max_tokens or DEFAULT_MAX_TOKENS
-
-            # Build request parameters with required fields
-            params = {
-                "model": model,
-                "messages": messages,
-                "max_tokens": max_tokens
-            }
-
-            # Add optional system parameter if provided
-            if system is not None:
-                params["system"] = system
-
-            message = await self.client.messages.create(**params)
-
-            # Log request statistics
-            self._log_request_stats(
-                method="chat_completion",
-                model=model,
-                start_time=start_time,
-                input_tokens=message.usage.input_tokens,
-                output_tokens=message.usage.output_tokens
-            )
-
+            params = self._chat_params(messages, model, max_tokens, system)
+            message = await self._complete(params, "chat_completion", start_time)
             return message.content[0].text
         except Exception as e:
             logger.error(
                 f"Error creating Anthropic chat completion with model {model}: {str(e)}")
             raise
 
+    async def create_structured_completion(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        name: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None
+    ) -> str:
+        try:
+            start_time = time.time()
+            params = self._chat_params(messages, model, max_tokens, system)
+            # Forcing a single tool makes the model return its input as validated-shape JSON
+            params["tools"] = [{
+                "name": name,
+                "description": f"Record the {name} result.",
+                "input_schema": schema
+            }]
+            params["tool_choice"] = {"type": "tool", "name": name}
+            message = await self._complete(params, "structured_completion", start_time)
+
+            for block in message.content:
+                if block.type == "tool_use":
+                    return json.dumps(block.input)
+            return "".join(block.text for block in message.content if block.type == "text")
+        except Exception as e:
+            logger.error(
+                f"Error creating Anthropic structured completion with model {model}: {str(e)}")
+            raise
+
+    def _chat_params(self,
+                     messages: List[Dict[str, str]],
+                     model: Optional[str],
+                     max_tokens: Optional[int],
+                     system: Optional[str]
+                     ) -> Dict[str, Any]:
+        # Build request parameters with required fields
+        params = {
+            "model": model or self.get_default_model(),
+            "messages": messages,
+            "max_tokens": max_tokens or DEFAULT_MAX_TOKENS
+        }
+
+        # Add optional system parameter if provided
+        if system is not None:
+            params["system"] = system
+        return params
+
+    async def _complete(self, params: Dict[str, Any], method: str, start_time: float):
+        """Send a non-streaming request through admission control and log its usage."""
+        with llm_metrics.track(self._provider_name(), params["model"], method):
+            async with admission_controller.request(
+                params["model"],
+                estimate_request_tokens(params["messages"], params.get("system"), params["max_tokens"]),
+                lambda: self.client.messages.create(**params)
+            ) as (ticket, message):
+                ticket.record_usage(
+                    message.usage.input_tokens, message.usage.output_tokens)
+
+        # Log request statistics
+        self._log_request_stats(
+            method=method,
+            model=params["model"],
+            start_time=start_time,
+            input_tokens=message.usage.input_tokens,
+            output_tokens=message.usage.output_tokens
+        )
+        return message
+
     async def create_chat_completion_stream(
         self,
         messages: List[Dict[str, str]],
@@ -153,27 +200,47 @@ class AnthropicProvider(LLMProvider):
             if system is not None:
                 params["system"] = system
 
-            stream = await self.client.messages.create(**params)
-
-            # For streaming, we can't get exact token counts during the stream
-            # We'll log a simplified version at the end
-            async for message in stream:
-                if message.type == "content_block_delta":
-                    yield message.delta.text
-
-            # Log request statistics with estimated tokens
-            self._log_request_stats(
-                method="chat_completion_stream",
-                model=model,
-                start_time=start_time,
-                input_tokens=0,  # Token counts not available in stream
-                output_tokens=0
-            )
+            async for text in self._stream(params, "chat_completion_stream", start_time):
+                yield text
 
         except Exception as e:
             logger.error(
                 f"Error creating streaming Anthropic chat completion with model {model}: {str(e)}")
             raise
 
+    async def _stream(self,
+                      params: Dict[str, Any],
+                      method: str,
+                      start_time: float
+                      ) -> AsyncGenerator[str, None]:
+        """Send a streaming request through admission control and yield its text deltas."""
+        input_tokens = 0
+        output_tokens = 0
+        with llm_metrics.track(self._provider_name(), params["model"], method):
+            async with admission_controller.request(
+                params["model"],
+                estimate_request_tokens(params["messages"], params.get("system"), params["max_tokens"]),
+                lambda: self.client.messages.create(**params),
+                # Streams are read by a waiting user unless the caller says otherwise
+                priority=current_priority(default=Priority.INTERACTIVE)
+            ) as (ticket, stream):
+                async for message in stream:
+                    if message.type == "message_start":
+                        input_tokens = message.message.usage.input_tokens
+                    elif message.type == "message_delta":
+                        # Cumulative output token count for the message
+                        output_tokens = message.usage.output_tokens
+                    elif message.type == "content_block_delta":
+                        yield message.delta.text
+                ticket.record_usage(input_tokens, output_tokens)
+
+        self._log_request_stats(
+            method=method,
+            model=params["model"],
+            start_time=start_time,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens
+        )
+
     async def close(self):
         await self.client.close()
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from typing import List, Dict, Optional, Any, AsyncGenerator
 import time
 import logging
+from services.tracing import tracer
+from services.metrics import llm_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -56,11 +58,62 @@ class LLMProvider(ABC):
         """Create a streaming chat completion with the given messages"""
         raise NotImplementedError
 
+    async def create_structured_completion(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        name: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None
+    ) -> str:
+        """
+        Create a chat completion whose response is JSON matching the given object schema.
+
+        Providers with tool-use or JSON mode override this; by default the
+        prompt alone is relied on to produce JSON.
+        """
+        return await self.create_chat_completion(
+            messages, model=model, max_tokens=max_tokens, system=system)
+
+    async def discard_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None,
+        **kwargs: Any
+    ) -> None:
+        """
+        Forget a chat completion the caller found unusable.
+
+        Takes the same arguments as create_chat_completion. Providers that
+        memoize responses override this so the next identical request goes
+        upstream again; by default there is nothing to forget.
+        """
+        pass
+
+    async def discard_structured_completion(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        name: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None
+    ) -> None:
+        """Forget a structured completion the caller found unusable"""
+        pass
+
     @abstractmethod
     async def close(self):
         """Cleanup resources"""
         pass
 
+    def _provider_name(self) -> str:
+        """Provider label for metrics, e.g. 'anthropic'"""
+        return type(self).__name__.replace("Provider", "").lower()
+
     def _log_request_stats(self,
                            method: str,
                            model: str,
@@ -73,3 +126,8 @@ class LLMProvider(ABC):
             f"Duration: {duration:.2f}s, Input Tokens: {input_tokens}, "
             f"Output Tokens: {output_tokens}, Total Tokens: {input_tokens + output_tokens}"
         )
+        provider = self._provider_name()
+        llm_tokens.inc((provider, model, "input"), input_tokens)
+        llm_tokens.inc((provider, model, "output"), output_tokens)
+        tracer.record_span(f"llm.{method}", start_time, model=model,
+                           input_tokens=input_tokens, output_tokens=output_tokens)
@@ -0,0 +1,430 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any, AsyncGenerator, Tuple
+from config.settings import settings
+from .base import LLMProvider
+
+logger = logging.getLogger(__name__)
+
+REPLAY_CHUNK_CHARS = 64  # Size of the chunks a cached completion is replayed in
+
+DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    cache_key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    response TEXT NOT NULL
+)
+"""
+
+
+def make_cache_key(provider: str,
+                   model: str,
+                   system: Optional[str],
+                   messages: List[Dict[str, str]],
+                   max_tokens: Optional[int],
+                   **kwargs: Any) -> str:
+    """
+    Hash the parameters that determine an LLM response.
+
+    Args:
+        provider (str): Provider name
+        model (str): Resolved model name
+        system (str, optional): System prompt
+        messages (List[Dict[str, str]]): Chat messages
+        max_tokens (int, optional): Token limit
+        **kwargs: Any extra request parameters
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = json.dumps(
+        [provider, model, system, messages, max_tokens, kwargs],
+        sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCacheBackend(ABC):
+    """Base class for LLM response cache storage"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None if missing or expired"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, response: str) -> None:
+        """Store a response, evicting the least recently used entries if full"""
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove a single response if present"""
+        pass
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Remove all cached responses"""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def close(self) -> None:
+        """Release any resources held by the backend"""
+        pass
+
+
+class MemoryResponseCache(ResponseCacheBackend):
+    """In-process LRU cache"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        # key -> (stored_at, response)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, response = entry
+        if time.time() - stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    async def set(self, key: str, response: str) -> None:
+        self._entries[key] = (time.time(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskResponseCache(ResponseCacheBackend):
+    """SQLite-backed LRU cache that survives restarts"""
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(DISK_SCHEMA)
+            self._db.commit()
+            self._count = self._db.execute(
+                "SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        return self._db
+
+    async def get(self, key: str) -> Optional[str]:
+        def _read() -> Optional[str]:
+            with self._lock:
+                db = self._connect()
+                row = db.execute(
+                    "SELECT stored_at, response FROM llm_responses WHERE cache_key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if time.time() - row[0] >= self.ttl:
+                    db.execute("DELETE FROM llm_responses WHERE cache_key = ?", (key,))
+                    db.commit()
+                    self._count -= 1
+                    return None
+                db.execute(
+                    "UPDATE llm_responses SET last_access = ? WHERE cache_key = ?",
+                    (time.time(), key))
+                db.commit()
+                return row[1]
+
+        return await asyncio.to_thread(_read)
+
+    async def set(self, key: str, response: str) -> None:
+        def _write() -> None:
+            with self._lock:
+                db = self._connect()
+                now = time.time()
+                exists = db.execute(
+                    "SELECT 1 FROM llm_responses WHERE cache_key = ?", (key,)).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_responses "
+                    "(cache_key, stored_at, last_access, response) VALUES (?, ?, ?, ?)",
+                    (key, now, now, response))
+                if not exists:
+                    self._count += 1
+                if self._count > self.max_entries:
+                    excess = self._count - self.max_entries
+                    db.execute(
+                        "DELETE FROM llm_responses WHERE cache_key IN ("
+                        "SELECT cache_key FROM llm_responses ORDER BY last_access LIMIT ?)",
+                        (excess,))
+                    self._count -= excess
+                db.commit()
+
+        await asyncio.to_thread(_write)
+
+    async def delete(self, key: str) -> None:
+        def _delete() -> None:
+            with self._lock:
+                db = self._connect()
+                deleted = db.execute(
+                    "DELETE FROM llm_responses WHERE cache_key = ?", (key,)).rowcount
+                db.commit()
+                self._count -= deleted
+
+        await asyncio.to_thread(_delete)
+
+    async def clear(self) -> None:
+        def _clear() -> None:
+            with self._lock:
+                db = self._connect()
+                db.execute("DELETE FROM llm_responses")
+                db.commit()
+                self._count = 0
+
+        await asyncio.to_thread(_clear)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def create_response_cache(backend: str = settings.LLM_CACHE_BACKEND) -> ResponseCacheBackend:
+    """
+    Create the response cache backend configured in settings.
+
+    Args:
+        backend (str): 'memory' or 'disk'
+
+    Returns:
+        ResponseCacheBackend: The cache backend
+    """
+    if backend == "memory":
+        return MemoryResponseCache(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL)
+    if backend == "disk":
+        return DiskResponseCache(
+            settings.LLM_CACHE_PATH, settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL)
+    raise ValueError(f"Unsupported LLM cache backend: {backend}")
+
+
+class CachingProvider(LLMProvider):
+    """
+    Wraps an LLMProvider and memoizes its completions.
+
+    Responses are keyed on (provider, model, system, messages, max_tokens).
+    Streaming calls replay cached completions as a stream, and a streamed
+    completion is only cached once it has been received in full. Callers
+    that reject a completion (e.g. failed validation) discard it so it is
+    not replayed.
+    """
+
+    def __init__(self, provider: LLMProvider, cache: ResponseCacheBackend):
+        self.provider = provider
+        self.cache = cache
+        self.name = type(provider).__name__
+        self._hits = 0
+        self._misses = 0
+
+    def get_default_model(self) -> str:
+        return self.provider.get_default_model()
+
+    def _key(self,
+             messages: List[Dict[str, str]],
+             model: Optional[str],
+             max_tokens: Optional[int],
+             system: Optional[str],
+             **kwargs: Any) -> str:
+        return make_cache_key(
+            self.name, model or self.get_default_model(), system, messages, max_tokens, **kwargs)
+
+    async def _lookup(self, key: str) -> Optional[str]:
+        try:
+            response = await self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {str(e)}")
+            response = None
+        if response is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+            logger.debug(f"LLM cache hit for {key[:12]}")
+        return response
+
+    async def _store(self, key: str, response: str) -> None:
+        try:
+            await self.cache.set(key, response)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {str(e)}")
+
+    async def _discard(self, key: str) -> None:
+        try:
+            await self.cache.delete(key)
+        except Exception as e:
+            logger.warning(f"LLM cache delete failed: {str(e)}")
+
+    async def _replay(self, response: str) -> AsyncGenerator[str, None]:
+        for start in range(0, len(response), REPLAY_CHUNK_CHARS):
+            yield response[start:start + REPLAY_CHUNK_CHARS]
+
+    async def _stream_through(self,
+                              key: str,
+                              stream: AsyncGenerator[str, None]
+                              ) -> AsyncGenerator[str, None]:
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        # Reached only when the stream completed; errors and early closes are not cached
+        await self._store(key, "".join(chunks))
+
+    async def generate(self,
+                       prompt: str,
+                       model: Optional[str] = None,
+                       max_tokens: Optional[int] = None
+                       ) -> str:
+        key = self._key([{"role": "user", "content": prompt}], model, max_tokens, None)
+        response = await self._lookup(key)
+        if response is None:
+            response = await self.provider.generate(prompt, model=model, max_tokens=max_tokens)
+            await self._store(key, response)
+        return response
+
+    async def generate_stream(self,
+                              prompt: str,
+                              model: Optional[str] = None,
+                              max_tokens: Optional[int] = None
+                              ) -> AsyncGenerator[str, None]:
+        key = self._key([{"role": "user", "content": prompt}], model, max_tokens, None)
+        response = await self._lookup(key)
+        if response is not None:
+            stream = self._replay(response)
+        else:
+            stream = self._stream_through(key, self.provider.generate_stream(
+                prompt, model=model, max_tokens=max_tokens))
+        async for chunk in stream:
+            yield chunk
+
+    async def create_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None,
+        **kwargs: Any
+    ) -> str:
+        key = self._key(messages, model, max_tokens, system, **kwargs)
+        response = await self._lookup(key)
+        if response is None:
+            response = await self.provider.create_chat_completion(
+                messages, model=model, max_tokens=max_tokens, system=system, **kwargs)
+            await self._store(key, response)
+        return response
+
+    async def create_structured_completion(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        name: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None
+    ) -> str:
+        key = self._key(messages, model, max_tokens, system, structured=name, schema=schema)
+        response = await self._lookup(key)
+        if response is None:
+            response = await self.provider.create_structured_completion(
+                messages, schema, name, model=model, max_tokens=max_tokens, system=system)
+            await self._store(key, response)
+        return response
+
+    async def discard_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None,
+        **kwargs: Any
+    ) -> None:
+        await self._discard(self._key(messages, model, max_tokens, system, **kwargs))
+
+    async def discard_structured_completion(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        name: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None
+    ) -> None:
+        await self._discard(
+            self._key(messages, model, max_tokens, system, structured=name, schema=schema))
+
+    async def create_chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None,
+        **kwargs: Any
+    ) -> AsyncGenerator[str, None]:
+        key = self._key(messages, model, max_tokens, system, **kwargs)
+        response = await self._lookup(key)
+        if response is not None:
+            stream = self._replay(response)
+        else:
+            stream = self._stream_through(key, self.provider.create_chat_completion_stream(
+                messages, model=model, max_tokens=max_tokens, system=system, **kwargs))
+        async for chunk in stream:
+            yield chunk
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict[str, float]: Hits, misses, hit ratio and entry count
+        """
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+            "entries": len(self.cache),
+        }
+
+    async def close(self):
+        await self.provider.close()
@@ -1,59 +1,175 @@
 from openai import AsyncOpenAI
+import json
 import logging
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Any, AsyncGenerator
 from config.settings import settings
 from .base import LLMProvider
+from services.metrics import llm_metrics
+from .admission import admission_controller, estimate_request_tokens, current_priority, Priority
 
 logger = logging.getLogger(__name__)
 
 class OpenAIProvider(LLMProvider):
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        
+        # Retries are handled by the admission controller so 429s adapt its limits
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+
     def get_default_model(self) -> str:
         return "gpt-4-turbo-preview"
 
-    async def generate(self, 
-        prompt: str, 
+    async def generate(self,
+        prompt: str,
         model: Optional[str] = None,
         max_tokens: Optional[int] = None
     ) -> str:
         try:
+            start_time = time.time()
             model = model or self.get_default_model()
-            response = await self.client.completions.create(
-                model=model,
-                prompt=prompt,
-                max_tokens=max_tokens
-            )
+            with llm_metrics.track(self._provider_name(), model, "generate"):
+                async with admission_controller.request(
+                    model,
+                    estimate_request_tokens([{"role": "user", "content": prompt}], max_tokens=max_tokens),
+                    lambda: self.client.completions.create(
+                        model=model,
+                        prompt=prompt,
+                        max_tokens=max_tokens
+                    )
+                ) as (ticket, response):
+                    self._record_usage(ticket, response.usage, "generate", model, start_time)
             return response.choices[0].text.strip()
         except Exception as e:
             logger.error(f"Error generating OpenAI response with model {model}: {str(e)}")
             raise
 
-    async def create_chat_completion(self, 
-        messages: List[Dict[str, str]], 
+    async def generate_stream(self,
+        prompt: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncGenerator[str, None]:
+        try:
+            async for text in self.create_chat_completion_stream(
+                [{"role": "user", "content": prompt}], model=model, max_tokens=max_tokens
+            ):
+                yield text
+        except Exception as e:
+            logger.error(f"Error generating streaming OpenAI response with model {model}: {str(e)}")
+            raise
+
+    async def create_chat_completion(self,
+        messages: List[Dict[str, str]],
         model: Optional[str] = None,
         max_tokens: Optional[int] = None,
         system: Optional[str] = None
     ) -> str:
         try:
-            model = model or self.get_default_model()
-            
-            # Add system message if provided
-            chat_messages = []
-            if system:
-                chat_messages.append({"role": "system", "content": system})
-            chat_messages.extend(messages)
-            
-            response = await self.client.chat.completions.create(
-                model=model,
-                messages=chat_messages,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
+            return await self._chat_completion(
+                messages, model, max_tokens, system, "chat_completion")
         except Exception as e:
             logger.error(f"Error creating OpenAI chat completion with model {model}: {str(e)}")
             raise
 
+    async def create_structured_completion(self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any],
+        name: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None
+    ) -> str:
+        try:
+            # JSON mode guarantees a syntactically valid object; the schema describes its shape
+            schema_instruction = f"Respond with a JSON object matching this JSON schema: {json.dumps(schema)}"
+            system = f"{system}\n\n{schema_instruction}" if system else schema_instruction
+            return await self._chat_completion(
+                messages, model, max_tokens, system, "structured_completion",
+                response_format={"type": "json_object"})
+        except Exception as e:
+            logger.error(f"Error creating OpenAI structured completion with model {model}: {str(e)}")
+            raise
+
+    async def _chat_completion(self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        max_tokens: Optional[int],
+        system: Optional[str],
+        method: str,
+        **params: Any
+    ) -> str:
+        start_time = time.time()
+        model = model or self.get_default_model()
+        chat_messages = self._chat_messages(messages, system)
+
+        with llm_metrics.track(self._provider_name(), model, method):
+            async with admission_controller.request(
+                model,
+                estimate_request_tokens(chat_messages, max_tokens=max_tokens),
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=chat_messages,
+                    max_tokens=max_tokens,
+                    **params
+                )
+            ) as (ticket, response):
+                self._record_usage(ticket, response.usage, method, model, start_time)
+        return response.choices[0].message.content
+
+    async def create_chat_completion_stream(self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        system: Optional[str] = None,
+        **kwargs: Any
+    ) -> AsyncGenerator[str, None]:
+        try:
+            start_time = time.time()
+            model = model or self.get_default_model()
+            chat_messages = self._chat_messages(messages, system)
+
+            with llm_metrics.track(self._provider_name(), model, "chat_completion_stream"):
+                async with admission_controller.request(
+                    model,
+                    estimate_request_tokens(chat_messages, max_tokens=max_tokens),
+                    lambda: self.client.chat.completions.create(
+                        model=model,
+                        messages=chat_messages,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        # Adds a final chunk carrying token usage
+                        stream_options={"include_usage": True}
+                    ),
+                    priority=current_priority(default=Priority.INTERACTIVE)
+                ) as (ticket, stream):
+                    usage = None
+                    async for chunk in stream:
+                        if chunk.usage is not None:
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                    self._record_usage(ticket, usage, "chat_completion_stream", model, start_time)
+        except Exception as e:
+            logger.error(f"Error creating streaming OpenAI chat completion with model {model}: {str(e)}")
+            raise
+
+    def _chat_messages(self, messages: List[Dict[str, str]], system: Optional[str]) -> List[Dict[str, str]]:
+        # Add system message if provided
+        chat_messages = []
+        if system:
+            chat_messages.append({"role": "system", "content": system})
+        chat_messages.extend(messages)
+        return chat_messages
+
+    def _record_usage(self, ticket, usage, method: str, model: str, start_time: float):
+        input_tokens = usage.prompt_tokens if usage else 0
+        output_tokens = usage.completion_tokens if usage else 0
+        ticket.record_usage(input_tokens, output_tokens)
+        self._log_request_stats(
+            method=method,
+            model=model,
+            start_time=start_time,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens
+        )
+
     async def close(self):
-        await self.client.close() 
\ No newline at end of file
+        await self.client.close()
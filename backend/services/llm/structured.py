@@ -0,0 +1,384 @@
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+from pydantic import TypeAdapter, ValidationError
+from config.settings import settings
+from .base import LLMProvider
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSERS = {"{": "}", "[": "]"}
+# Nesting depth down to which take_members() reports completed members
+MEMBER_DEPTH = 2
+# Key wrapping non-object outputs, since tool inputs must be JSON objects
+WRAPPED_RESULT_KEY = "result"
+
+REPAIR_PROMPT = """The following output was supposed to be JSON matching this JSON schema, but it could not be used.
+
+Schema:
+{schema}
+
+Error:
+{error}
+
+Output:
+{output}
+
+Return ONLY the corrected JSON. Keep all of the original content that fits the schema. Do not include any explanatory text or markdown formatting."""
+
+
+class StructuredOutputError(ValueError):
+    """Raised when an LLM response cannot be parsed and validated, even after repair"""
+
+
+class PartialJSONParser:
+    """
+    Incremental, truncation-tolerant JSON parser for LLM output.
+
+    Text is fed in chunks and scanned once. Leading prose and markdown code
+    fences are skipped, and text after the top-level value is ignored. While
+    the value is incomplete, value() closes any open string, array and
+    object, and falls back to the last complete member if the tail cannot
+    be completed (e.g. a truncated key or literal).
+
+    Members of the top-level value and of its children are also parsed
+    once, as they complete, so a stream can be consumed member by member
+    with take_members() instead of re-parsing the whole value.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        # (index, closers): text[start:index] + closers is valid JSON
+        self._cuts: List[Tuple[int, str]] = []
+        # Per open container: where its current member starts and how many came before
+        self._member_starts: List[int] = []
+        self._member_counts: List[int] = []
+        # Keys of the open members enclosing the current container
+        self._member_keys: List[Any] = []
+        self._members: List[Tuple[Tuple[Any, ...], Any]] = []
+
+    @property
+    def complete(self) -> bool:
+        """Whether the top-level value has been closed."""
+        return self._end is not None
+
+    def feed(self, chunk: str) -> None:
+        """Append a chunk of text and scan it."""
+        if self._end is not None:
+            return
+        self._text += chunk
+        text = self._text
+        pos = self._pos
+        if self._start is None:
+            starts = [i for i in (text.find("{", pos), text.find("[", pos)) if i >= 0]
+            if not starts:
+                self._pos = len(text)
+                return
+            pos = self._start = min(starts)
+
+        stack = self._stack
+        while pos < len(text):
+            char = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in CLOSERS:
+                if 0 < len(stack) < MEMBER_DEPTH:
+                    self._member_keys.append(self._open_member_key(pos))
+                stack.append(char)
+                self._member_starts.append(pos + 1)
+                self._member_counts.append(0)
+                self._cuts.append((pos + 1, self._closers()))
+            elif char in "}]":
+                if stack:
+                    self._member_done(pos)
+                    stack.pop()
+                    self._member_starts.pop()
+                    self._member_counts.pop()
+                    if 0 < len(stack) < MEMBER_DEPTH:
+                        self._member_keys.pop()
+                if not stack:
+                    self._end = pos + 1
+                    break
+                self._cuts.append((pos + 1, self._closers()))
+            elif char == ",":
+                if stack:
+                    self._member_done(pos)
+                    self._member_starts[-1] = pos + 1
+                    self._member_counts[-1] += 1
+                self._cuts.append((pos, self._closers()))
+            pos += 1
+        self._pos = pos
+
+    def _open_member_key(self, pos: int) -> Any:
+        # Key of the current member of the innermost container, whose value starts at pos
+        if self._stack[-1] == "[":
+            return self._member_counts[-1]
+        key = self._text[self._member_starts[-1]:pos].strip()
+        try:
+            return json.loads(key[:-1].strip() if key.endswith(":") else key)
+        except json.JSONDecodeError:
+            return None
+
+    def _member_done(self, end: int) -> None:
+        # Parse the member of the innermost container that ends at end
+        if len(self._stack) > MEMBER_DEPTH:
+            return
+        text = self._text[self._member_starts[-1]:end]
+        if not text.strip():
+            # An empty container or a trailing comma
+            return
+        try:
+            if self._stack[-1] == "{":
+                member = json.loads("{" + text + "}")
+                if len(member) != 1:
+                    return
+                key, value = next(iter(member.items()))
+            else:
+                key, value = self._member_counts[-1], json.loads(text)
+        except json.JSONDecodeError:
+            return
+        self._members.append((tuple(self._member_keys) + (key,), value))
+
+    def take_members(self) -> List[Tuple[Tuple[Any, ...], Any]]:
+        """
+        Get the members completed since the last call.
+
+        Returns:
+            List[Tuple[Tuple[Any, ...], Any]]: The path and value of each completed
+            member of the top-level value, and of its object and array members.
+            Paths are made of member names and array indexes, e.g. ('queries',)
+            and ('queries', 0). Members that aren't valid JSON are skipped.
+        """
+        members, self._members = self._members, []
+        return members
+
+    def _closers(self) -> str:
+        return "".join(CLOSERS[opener] for opener in reversed(self._stack))
+
+    def value(self) -> Any:
+        """
+        Get the value parsed so far.
+
+        Returns:
+            Any: The parsed value, with incomplete parts closed or dropped
+
+        Raises:
+            ValueError: If no JSON value has started or nothing can be recovered
+        """
+        if self._start is None:
+            raise ValueError("No JSON object or array found")
+        if self._end is not None:
+            try:
+                return json.loads(self._text[self._start:self._end])
+            except json.JSONDecodeError:
+                # e.g. unquoted keys; recover what we can below
+                pass
+
+        if self._end is None:
+            tail = self._text[self._start:]
+            if self._in_string:
+                if self._escape:
+                    tail = tail[:-1]
+                tail += '"'
+            try:
+                return json.loads(tail.rstrip().rstrip(",") + self._closers())
+            except json.JSONDecodeError:
+                pass
+
+        for index, closers in reversed(self._cuts):
+            try:
+                return json.loads(self._text[self._start:index] + closers)
+            except json.JSONDecodeError:
+                continue
+        raise ValueError("Could not recover a JSON value from the response")
+
+
+def parse_json(text: str) -> Any:
+    """
+    Parse JSON from an LLM response, tolerating code fences, surrounding text and truncation.
+
+    Raises:
+        ValueError: If no JSON value can be recovered
+    """
+    parser = PartialJSONParser()
+    parser.feed(text)
+    return parser.value()
+
+
+class StructuredOutput:
+    """
+    Generates LLM output validated into a Pydantic schema.
+
+    Providers that support it are asked for tool-use / JSON mode output.
+    Responses are parsed tolerantly and validated; if that fails, only a
+    short repair request containing the bad output and the validation
+    error is retried, never the original (often large) generation.
+    """
+
+    def __init__(self,
+                 native: bool = settings.STRUCTURED_OUTPUT_NATIVE,
+                 repair_attempts: int = settings.STRUCTURED_OUTPUT_REPAIR_ATTEMPTS):
+        self.native = native
+        self.repair_attempts = repair_attempts
+        self._adapters: Dict[Any, Tuple[TypeAdapter, Dict[str, Any], bool]] = {}
+
+        # Statistics
+        self._requests = 0
+        self._first_pass = 0
+        self._repairs = 0
+        self._repaired = 0
+        self._failures = 0
+
+    def _adapter(self, output_type: Any) -> Tuple[TypeAdapter, Dict[str, Any], bool]:
+        """Get the type adapter, tool input schema and whether the output is wrapped."""
+        cached = self._adapters.get(output_type)
+        if cached is None:
+            adapter = TypeAdapter(output_type)
+            schema = adapter.json_schema()
+            wrapped = schema.get("type") != "object"
+            if wrapped:
+                defs = schema.pop("$defs", None)
+                schema = {
+                    "type": "object",
+                    "properties": {WRAPPED_RESULT_KEY: schema},
+                    "required": [WRAPPED_RESULT_KEY],
+                }
+                if defs:
+                    schema["$defs"] = defs
+            cached = self._adapters[output_type] = (adapter, schema, wrapped)
+        return cached
+
+    def validate(self,
+                 output_type: Type[T],
+                 text: str,
+                 normalize: Optional[Callable[[Any], Any]] = None) -> T:
+        """
+        Parse and validate a response.
+
+        Args:
+            output_type: Pydantic model or type to validate into
+            text: Raw LLM response
+            normalize: Optional function applied to the parsed data before validation
+
+        Raises:
+            ValueError: If the response cannot be parsed or validated
+        """
+        adapter, _, wrapped = self._adapter(output_type)
+        data = parse_json(text)
+        if wrapped and isinstance(data, dict) and set(data) == {WRAPPED_RESULT_KEY}:
+            data = data[WRAPPED_RESULT_KEY]
+        if normalize is not None:
+            data = normalize(data)
+        return adapter.validate_python(data)
+
+    async def generate(self,
+                       provider: LLMProvider,
+                       output_type: Type[T],
+                       messages: List[Dict[str, str]],
+                       system: Optional[str] = None,
+                       model: Optional[str] = None,
+                       max_tokens: Optional[int] = None,
+                       name: Optional[str] = None,
+                       normalize: Optional[Callable[[Any], Any]] = None
+                       ) -> T:
+        """
+        Generate a response validated into output_type.
+
+        Args:
+            provider: Provider to send requests to
+            output_type: Pydantic model or type to validate into
+            messages: Chat messages
+            system: Optional system prompt
+            model: Optional specific model to use, also used for repairs
+            max_tokens: Optional token limit
+            name: Tool name for native structured output; defaults to the type's name
+            normalize: Optional function applied to the parsed data before validation
+
+        Returns:
+            The validated output
+
+        Raises:
+            StructuredOutputError: If no valid output was produced
+        """
+        _, schema, _ = self._adapter(output_type)
+        name = name or getattr(output_type, "__name__", "result")
+        self._requests += 1
+
+        if self.native:
+            text = await provider.create_structured_completion(
+                messages, schema, name, model=model, max_tokens=max_tokens, system=system)
+        else:
+            text = await provider.create_chat_completion(
+                messages, model=model, max_tokens=max_tokens, system=system)
+
+        try:
+            result = self.validate(output_type, text, normalize)
+            self._first_pass += 1
+            return result
+        except (ValueError, ValidationError) as e:
+            error = e
+            logger.warning(f"Invalid {name} output, repairing: {str(e)}")
+
+        # Invalid responses must not be replayed from the provider's cache
+        if self.native:
+            await provider.discard_structured_completion(
+                messages, schema, name, model=model, max_tokens=max_tokens, system=system)
+        else:
+            await provider.discard_chat_completion(
+                messages, model=model, max_tokens=max_tokens, system=system)
+
+        for attempt in range(self.repair_attempts):
+            self._repairs += 1
+            repair_messages = [{"role": "user", "content": REPAIR_PROMPT.format(
+                schema=json.dumps(schema), error=str(error), output=text)}]
+            try:
+                text = await provider.create_chat_completion(
+                    repair_messages, model=model, max_tokens=max_tokens)
+                result = self.validate(output_type, text, normalize)
+                self._repaired += 1
+                logger.info(f"Repaired {name} output after {attempt + 1} attempt(s)")
+                return result
+            except (ValueError, ValidationError) as e:
+                error = e
+                logger.warning(f"Repair attempt {attempt + 1} for {name} failed: {str(e)}")
+                await provider.discard_chat_completion(
+                    repair_messages, model=model, max_tokens=max_tokens)
+
+        self._failures += 1
+        raise StructuredOutputError(f"Invalid {name} output: {str(error)}")
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get structured output statistics.
+
+        Returns:
+            Dict[str, float]: Request, repair and failure counts
+        """
+        return {
+            "requests": self._requests,
+            "valid_first_pass": self._first_pass,
+            "repairs": self._repairs,
+            "repaired": self._repaired,
+            "failures": self._failures,
+        }
+
+
+# Create a singleton instance
+structured_output = StructuredOutput()
+
+__all__ = ['structured_output', 'parse_json', 'PartialJSONParser', 'StructuredOutputError']
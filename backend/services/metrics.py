@@ -0,0 +1,303 @@
+import asyncio
+import bisect
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers fast cache hits through long LLM generations
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base for metrics whose values are sharded by thread.
+
+    Each thread only ever writes to its own shard, so recording a value
+    needs no lock; scrapes sum the shards. Copying a dict is atomic under
+    the GIL, so a scrape never sees a shard mid-resize.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards: Dict[int, dict] = {}
+
+    def _shard(self) -> dict:
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(threading.get_ident(), {})
+        return shard
+
+    def _totals(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for shard in list(self._shards.values()):
+            for labels, value in shard.copy().items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        return [(self.name, labels, value) for labels, value in sorted(self._totals().items())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            names = self.labelnames
+            if len(labels) > len(names):
+                names = names + ("le",)
+            lines.append(f"{name}{_format_labels(names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. requests or tokens"""
+
+    type = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._totals().get(labels, 0)
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. requests in flight"""
+
+    type = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, e.g. request latency"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        shard = self._shard()
+        # [count per bucket..., sum]; only this thread writes it
+        state = shard.get(labels)
+        if state is None:
+            state = shard[labels] = [0] * (len(self.buckets) + 1)
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _totals(self) -> Dict[Labels, List[float]]:
+        totals: Dict[Labels, List[float]] = {}
+        for shard in list(self._shards.values()):
+            for labels, state in shard.copy().items():
+                total = totals.setdefault(labels, [0] * (len(self.buckets) + 1))
+                for i, value in enumerate(list(state)):
+                    total[i] += value
+        return totals
+
+    def count(self, labels: Labels = ()) -> int:
+        return sum(self._totals().get(labels, [0])[:-1])
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        samples = []
+        for labels, state in sorted(self._totals().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", labels + (_format_value(bound),), cumulative))
+            samples.append((f"{self.name}_sum", labels, state[-1]))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class _CallbackGauge(_Metric):
+    """A gauge read from a function at scrape time, e.g. a cache's hit ratio"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 callback: Callable[[], Dict[Labels, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _totals(self) -> Dict[Labels, float]:
+        try:
+            return self.callback()
+        except Exception as e:
+            logger.warning(f"Could not collect metric {self.name}: {str(e)}")
+            return {}
+
+
+class _CallbackCounter(_CallbackGauge):
+    """A counter read from a function at scrape time, e.g. a cache's hit count"""
+
+    type = "counter"
+
+
+class _Tracking:
+    """Times a block, counting it as in flight and counting its errors by type"""
+
+    __slots__ = ("metrics", "labels", "start_time")
+
+    def __init__(self, metrics: "OperationMetrics", labels: Labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def __enter__(self) -> "_Tracking":
+        self.metrics.in_flight.inc(self.labels)
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.metrics.duration.observe(time.perf_counter() - self.start_time, self.labels)
+        self.metrics.in_flight.dec(self.labels)
+        # A generator closed by its consumer, or a cancelled task, has not failed
+        if exc_type is not None and exc_type not in (GeneratorExit, asyncio.CancelledError):
+            self.metrics.errors.inc(self.labels + (exc_type.__name__,))
+
+
+class OperationMetrics:
+    """Latency histogram, in-flight gauge and error counter for one kind of operation"""
+
+    def __init__(self, registry: "MetricsRegistry", prefix: str, description: str,
+                 labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.duration = registry.histogram(
+            f"{prefix}_duration_seconds", f"Duration of {description} in seconds",
+            labelnames, buckets)
+        self.in_flight = registry.gauge(
+            f"{prefix}_in_flight", f"{description[0].upper()}{description[1:]} in progress", labelnames)
+        self.errors = registry.counter(
+            f"{prefix}_errors_total", f"Failed {description} by exception type",
+            tuple(labelnames) + ("error_type",))
+
+    def track(self, *labels: str) -> _Tracking:
+        """Use as a context manager around one operation."""
+        return _Tracking(self, labels)
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                       callback: Callable[[], Dict[Labels, float]]) -> None:
+        """Register a gauge whose values are read from callback() at scrape time."""
+        self._metrics[name] = _CallbackGauge(name, documentation, labelnames, callback)
+
+    def counter_callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                         callback: Callable[[], Dict[Labels, float]]) -> None:
+        """Register a counter whose values are read from callback() at scrape time."""
+        self._metrics[name] = _CallbackCounter(name, documentation, labelnames, callback)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Create a singleton instance
+registry = MetricsRegistry()
+
+llm_metrics = OperationMetrics(registry, "llm_request", "LLM requests", ("provider", "model", "method"))
+llm_tokens = registry.counter(
+    "llm_tokens_total", "LLM tokens by direction (input or output)", ("provider", "model", "direction"))
+search_metrics = OperationMetrics(registry, "search_request", "web searches")
+fetch_metrics = OperationMetrics(registry, "fetch_request", "URL content fetches")
+neo4j_metrics = OperationMetrics(registry, "neo4j_query", "Neo4j queries")
+
+
+# cache name -> (stats, hit keys, miss keys)
+_caches: Dict[str, Tuple[Callable[[], Dict[str, float]], Tuple[str, ...], Tuple[str, ...]]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], Dict[str, float]],
+                   hit_keys: Sequence[str] = ("hits",), miss_keys: Sequence[str] = ("misses",)) -> None:
+    """
+    Export a cache's hit/miss counts and hit ratio from its stats() at scrape time.
+
+    Args:
+        name: Value of the 'cache' label
+        stats: The cache's stats() method
+        hit_keys: stats() keys summed as hits
+        miss_keys: stats() keys summed as misses
+    """
+    _caches[name] = (stats, tuple(hit_keys), tuple(miss_keys))
+
+
+def _cache_values(kind: str) -> Dict[Labels, float]:
+    values: Dict[Labels, float] = {}
+    for name, (stats, hit_keys, miss_keys) in _caches.items():
+        current = stats()
+        hits = sum(current.get(key, 0) for key in hit_keys)
+        misses = sum(current.get(key, 0) for key in miss_keys)
+        if kind == "hits":
+            values[(name,)] = hits
+        elif kind == "misses":
+            values[(name,)] = misses
+        else:
+            values[(name,)] = hits / (hits + misses) if hits + misses else 0.0
+    return values
+
+
+registry.counter_callback("cache_hits_total", "Cache hits since startup", ("cache",),
+                          lambda: _cache_values("hits"))
+registry.counter_callback("cache_misses_total", "Cache misses since startup", ("cache",),
+                          lambda: _cache_values("misses"))
+registry.gauge_callback("cache_hit_ratio", "Cache hits as a fraction of lookups", ("cache",),
+                        lambda: _cache_values("ratio"))
+
+__all__ = ['registry', 'llm_metrics', 'llm_tokens', 'search_metrics', 'fetch_metrics',
+           'neo4j_metrics', 'register_cache', 'CONTENT_TYPE']
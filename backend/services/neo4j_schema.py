@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Set
+from config.settings import settings
+from services.neo4j_service import neo4j_service, escape_identifier, Neo4jService
+
+logger = logging.getLogger(__name__)
+
+# Labels written by the research pipeline rather than knowledge graph extraction
+RESEARCH_LABELS = frozenset(["ResearchQuestion", "SearchResult"])
+
+# (name, label, property) of the indexes backing research history queries
+BASE_INDEXES = [
+    ("research_question_timestamp", "ResearchQuestion", "timestamp"),
+    ("search_result_url", "SearchResult", "url"),
+]
+
+
+def constraint_name(label: str) -> str:
+    """
+    Name of the id uniqueness constraint for a knowledge graph label.
+
+    Labels are case sensitive and may contain any character, so a hash of
+    the exact label keeps e.g. 'Tech Corp' and 'Tech_Corp' from sharing a name.
+    """
+    digest = hashlib.sha1(label.encode("utf-8")).hexdigest()[:8]
+    return f"kg_{re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')}_{digest}_id_unique"
+
+
+def _is_schema_error(error: Exception) -> bool:
+    """Whether Neo4j rejected a schema statement itself, rather than failing transiently."""
+    return ".Schema." in (getattr(error, "code", None) or "")
+
+
+def index_statement(name: str, label: str, prop: str) -> str:
+    return (f"CREATE INDEX {escape_identifier(name)} IF NOT EXISTS "
+            f"FOR (n:{escape_identifier(label)}) ON (n.{escape_identifier(prop)})")
+
+
+def constraint_statement(label: str) -> str:
+    return (f"CREATE CONSTRAINT {escape_identifier(constraint_name(label))} IF NOT EXISTS "
+            f"FOR (n:{escape_identifier(label)}) REQUIRE n.id IS UNIQUE")
+
+
+class Neo4jSchemaManager:
+    """
+    Creates and verifies the Neo4j indexes and constraints the app relies on.
+
+    Knowledge graph labels come from LLM extraction, so their id uniqueness
+    constraints (which also index MERGE by label and id) are created as new
+    labels are first stored, and for all existing labels at startup.
+    """
+
+    def __init__(self, service: Neo4jService):
+        self.service = service
+        self._ensured: Set[str] = set()
+        self._failed: Set[str] = set()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self, statement: str) -> None:
+        logger.debug(f"Running schema statement: {statement}")
+        await self.service.execute_query(statement)
+
+    async def ensure_base_indexes(self) -> None:
+        """Create the research history indexes if they don't exist."""
+        for name, label, prop in BASE_INDEXES:
+            await self._run(index_statement(name, label, prop))
+
+    async def ensure_label_constraints(self, labels: Iterable[str]) -> None:
+        """
+        Create id uniqueness constraints for labels not seen before.
+
+        Labels whose constraint Neo4j rejects (e.g. existing duplicate ids)
+        are logged and not retried, since the data can be written without the
+        constraint. Other failures, such as a lost connection, are retried the
+        next time the label is stored.
+        """
+        labels = {label for label in labels if label not in RESEARCH_LABELS}
+        if labels <= self._ensured | self._failed:
+            return
+        async with self._lock:
+            for label in sorted(labels - self._ensured - self._failed):
+                try:
+                    await self._run(constraint_statement(label))
+                    self._ensured.add(label)
+                    logger.info(f"Ensured id uniqueness constraint for label {label}")
+                except Exception as e:
+                    if _is_schema_error(e):
+                        self._failed.add(label)
+                    logger.warning(f"Could not create id constraint for label {label}: {str(e)}")
+
+    async def existing_labels(self) -> List[str]:
+        """Knowledge graph labels currently present in the database."""
+        records = await self.service.execute_query("CALL db.labels() YIELD label RETURN label")
+        return [record["label"] for record in records if record["label"] not in RESEARCH_LABELS]
+
+    async def migrate(self) -> None:
+        """Create the base indexes and constraints for every existing knowledge graph label."""
+        await self.ensure_base_indexes()
+        await self.ensure_label_constraints(await self.existing_labels())
+        logger.info(f"Neo4j schema migrated ({len(self._ensured)} label constraints)")
+
+    async def verify(self) -> Dict[str, List[str]]:
+        """
+        Compare the database schema with what the app expects.
+
+        Returns:
+            Dict[str, List[str]]: Missing indexes, labels missing an id constraint,
+            and indexes that are not online
+        """
+        constraints = await self.service.execute_query(
+            "SHOW CONSTRAINTS YIELD labelsOrTypes, properties, type "
+            "RETURN labelsOrTypes, properties, type")
+        indexes = await self.service.execute_query(
+            "SHOW INDEXES YIELD name, labelsOrTypes, properties, state "
+            "RETURN name, labelsOrTypes, properties, state")
+
+        unique_id_labels = {
+            label
+            for record in constraints
+            if "UNIQUE" in (record.get("type") or "") and record.get("properties") == ["id"]
+            for label in record.get("labelsOrTypes") or []
+        }
+        indexed = {
+            (label, tuple(record.get("properties") or []))
+            for record in indexes
+            for label in record.get("labelsOrTypes") or []
+        }
+        return {
+            "missing_indexes": [
+                f"{label}.{prop}" for _, label, prop in BASE_INDEXES
+                if (label, (prop,)) not in indexed
+            ],
+            "missing_constraints": sorted(
+                label for label in await self.existing_labels() if label not in unique_id_labels),
+            "not_online": sorted(
+                record["name"] for record in indexes if record.get("state") not in (None, "ONLINE")),
+        }
+
+    async def _migrate_in_background(self) -> None:
+        try:
+            await self.migrate()
+        except Exception as e:
+            logger.warning(f"Neo4j schema migration at startup failed: {str(e)}")
+
+    def start(self) -> None:
+        """Migrate the schema in the background so an unavailable Neo4j doesn't delay startup."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._migrate_in_background())
+
+    async def stop(self) -> None:
+        """Cancel a migration still running at shutdown."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+# Create a singleton instance
+neo4j_schema = Neo4jSchemaManager(neo4j_service)
+
+__all__ = ['neo4j_schema', 'constraint_statement', 'index_statement']
+
+
+async def _main(command: str) -> int:
+    try:
+        if command == "migrate":
+            await neo4j_schema.migrate()
+            return 0
+        report = await neo4j_schema.verify()
+        print(json.dumps(report, indent=2))
+        return 1 if any(report.values()) else 0
+    finally:
+        await neo4j_service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage Neo4j indexes and constraints")
+    parser.add_argument("command", choices=["migrate", "verify"],
+                        help="'migrate' creates missing indexes and constraints; "
+                             "'verify' reports what is missing and exits non-zero if anything is")
+    args = parser.parse_args()
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    sys.exit(asyncio.run(_main(args.command)))
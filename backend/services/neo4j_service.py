@@ -1,13 +1,97 @@
-from neo4j import AsyncGraphDatabase, AsyncDriver
-from typing import List, Dict, Any, Optional
+from neo4j import AsyncGraphDatabase, AsyncDriver, AsyncManagedTransaction
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+import time
 from config.settings import settings
+from services.metrics import neo4j_metrics
 import json
 from schemas import KnowledgeGraphElements, KnowledgeGraphNode, KnowledgeGraphRelationship
 
 logger = logging.getLogger(__name__)
 
 
+def escape_identifier(name: str) -> str:
+    """Quote a label or relationship type for use in Cypher, escaping backticks."""
+    return "`" + name.replace("`", "``") + "`"
+
+
+@dataclass
+class WriteBatch:
+    """One parameterized UNWIND statement and the rows it writes"""
+    kind: str  # 'nodes' or 'relationships'
+    key: str  # Label, or relationship type with endpoint labels
+    query: str
+    rows: List[Dict[str, Any]]
+
+
+def _chunks(rows: List[Dict[str, Any]], size: int) -> List[List[Dict[str, Any]]]:
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+
+def _node_pattern(variable: str, label: Optional[str], id_field: str) -> str:
+    # Unknown endpoints (nodes stored by an earlier document) fall back to an unlabeled match
+    label_part = f":{escape_identifier(label)}" if label else ""
+    return f"({variable}{label_part} {{id: row.{id_field}}})"
+
+
+def build_write_batches(elements: KnowledgeGraphElements,
+                        batch_size: int = settings.NEO4J_WRITE_BATCH_SIZE) -> List[WriteBatch]:
+    """
+    Group knowledge graph elements into batched UNWIND writes.
+
+    Nodes are grouped by label and relationships by type and endpoint labels,
+    so every statement matches nodes by label and id. Node batches come first
+    so relationships can match nodes created in the same transaction.
+
+    Args:
+        elements (KnowledgeGraphElements): Elements to store
+        batch_size (int): Maximum rows per statement
+
+    Returns:
+        List[WriteBatch]: Statements in execution order
+    """
+    nodes_by_label: Dict[str, List[Dict[str, Any]]] = {}
+    labels: Dict[str, str] = {}
+    for node in elements.nodes:
+        nodes_by_label.setdefault(node.label, []).append(
+            {"id": node.id, "properties": node.properties})
+        labels[node.id] = node.label
+
+    rels_by_key: Dict[Tuple[str, Optional[str], Optional[str]], List[Dict[str, Any]]] = {}
+    for rel in elements.relationships:
+        key = (rel.type, labels.get(rel.source), labels.get(rel.target))
+        rels_by_key.setdefault(key, []).append(
+            {"source": rel.source, "target": rel.target, "properties": rel.properties})
+
+    batches: List[WriteBatch] = []
+    for label, rows in nodes_by_label.items():
+        query = (
+            "UNWIND $rows AS row "
+            f"MERGE (n:{escape_identifier(label)} {{id: row.id}}) "
+            "SET n += row.properties"
+        )
+        for chunk in _chunks(rows, batch_size):
+            batches.append(WriteBatch("nodes", label, query, chunk))
+
+    for (rel_type, source_label, target_label), rows in rels_by_key.items():
+        if source_label is None or target_label is None:
+            logger.warning(
+                f"Relationship type {rel_type} references nodes outside this document; "
+                "matching them without a label")
+        query = (
+            "UNWIND $rows AS row "
+            f"MATCH {_node_pattern('source', source_label, 'source')} "
+            f"MATCH {_node_pattern('target', target_label, 'target')} "
+            f"MERGE (source)-[r:{escape_identifier(rel_type)}]->(target) "
+            "SET r += row.properties"
+        )
+        key = f"({source_label or ''})-[{rel_type}]->({target_label or ''})"
+        for chunk in _chunks(rows, batch_size):
+            batches.append(WriteBatch("relationships", key, query, chunk))
+    return batches
+
+
 class Neo4jService:
     def __init__(self):
         self.driver: Optional[AsyncDriver] = None
@@ -65,10 +149,11 @@ class Neo4jService:
             await self.connect()
 
         try:
-            async with self.driver.session(database=settings.NEO4J_DATABASE) as session:
-                result = await session.run(query, parameters or {})
-                records = await result.data()
-                return records
+            with neo4j_metrics.track():
+                async with self.driver.session(database=settings.NEO4J_DATABASE) as session:
+                    result = await session.run(query, parameters or {})
+                    records = await result.data()
+                    return records
         except Exception as e:
             logger.error(f"Error executing Neo4j query: {str(e)}")
             raise
@@ -160,8 +245,19 @@ class Neo4jService:
             logger.error(f"Error retrieving research history: {str(e)}")
             raise
 
-    async def store_knowledge_graph_elements(self, elements: KnowledgeGraphElements) -> None:
-        """Store knowledge graph elements in Neo4j."""
+    async def store_knowledge_graph_elements(self, elements: KnowledgeGraphElements) -> List[Dict[str, Any]]:
+        """
+        Store knowledge graph elements in Neo4j.
+
+        Elements are written with batched UNWIND statements in a single
+        transaction, which is retried as a whole on transient errors.
+
+        Args:
+            elements (KnowledgeGraphElements): Nodes and relationships to store
+
+        Returns:
+            List[Dict[str, Any]]: Per-batch kind, key, row count and duration in ms
+        """
         if not self.driver:
             logger.error("No Neo4j connection available")
             raise RuntimeError("Neo4j connection not established")
@@ -169,37 +265,36 @@ class Neo4jService:
         try:
             logger.info(
                 f"Storing {len(elements.nodes)} nodes and {len(elements.relationships)} relationships")
+            # Schema changes can't share the write transaction, so new labels' constraints come first
+            from services.neo4j_schema import neo4j_schema
+            await neo4j_schema.ensure_label_constraints({node.label for node in elements.nodes})
+            batches = build_write_batches(elements)
+
+            async def write(tx: AsyncManagedTransaction) -> List[Dict[str, Any]]:
+                timings = []
+                for batch in batches:
+                    start_time = time.perf_counter()
+                    result = await tx.run(batch.query, rows=batch.rows)
+                    await result.consume()
+                    timings.append({
+                        "kind": batch.kind,
+                        "key": batch.key,
+                        "rows": len(batch.rows),
+                        "duration_ms": (time.perf_counter() - start_time) * 1000,
+                    })
+                return timings
+
+            start_time = time.perf_counter()
+            async with self.driver.session(database=settings.NEO4J_DATABASE) as session:
+                timings = await session.execute_write(write)
 
-            async with self.driver.session() as session:
-                # Store nodes
-                for node in elements.nodes:
-                    logger.debug(
-                        f"Creating node: ID={node.id}, Label={node.label}, Properties={node.properties}")
-                    query = (
-                        f"MERGE (n:{node.label} {{id: $id}}) "
-                        "SET n += $properties"
-                    )
-                    await session.run(query, {"id": node.id, "properties": node.properties})
-
-                # Store relationships
-                for rel in elements.relationships:
-                    logger.debug(
-                        f"Creating relationship: {rel.source}-[{rel.type}]->{rel.target}")
-                    query = (
-                        "MATCH (source {id: $source_id}), (target {id: $target_id}) "
-                        f"MERGE (source)-[r:{rel.type}]->(target) "
-                        "SET r += $properties"
-                    )
-                    await session.run(
-                        query,
-                        {
-                            "source_id": rel.source,
-                            "target_id": rel.target,
-                            "properties": rel.properties
-                        }
-                    )
-
-            logger.info("Successfully stored all knowledge graph elements")
+            for timing in timings:
+                logger.debug(
+                    f"Wrote {timing['rows']} {timing['kind']} ({timing['key']}) in {timing['duration_ms']:.1f}ms")
+            logger.info(
+                f"Stored knowledge graph elements in {len(timings)} batches "
+                f"in {(time.perf_counter() - start_time) * 1000:.1f}ms")
+            return timings
 
         except Exception as e:
             logger.error(
@@ -0,0 +1,471 @@
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from config.settings import settings
+from schemas import URLContent
+
+logger = logging.getLogger(__name__)
+
+# Index record: sha256 digest, fetched_at, last_access, stored bytes
+INDEX_RECORD = struct.Struct("<32sddQ")
+INDEX_FILENAME = "index.bin"
+INDEX_GROWTH = 256  # Records added each time the index file grows
+EMPTY_DIGEST = b"\x00" * 32
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+@dataclass
+class CacheEntry:
+    """Index entry for a cached page"""
+    digest: bytes
+    slot: int
+    fetched_at: float
+    last_access: float
+    size: int
+
+
+@dataclass
+class CachedPage:
+    """Raw page body and the validators needed to revalidate it"""
+    html: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+@dataclass
+class PageValidators:
+    """ETag and Last-Modified of a cached page, for conditional requests"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so equivalent spellings share one cache entry.
+
+    Lowercases the scheme and host, drops default ports and fragments,
+    and sorts query parameters.
+    """
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class PageCache:
+    """
+    Persistent, content-addressed cache of fetched pages.
+
+    Raw HTML is stored gzip-compressed and separately from the extracted
+    URLContent, which is keyed by extraction engine and extractor version, so
+    changing the extractor re-extracts from disk instead of re-downloading.
+    A fixed-record index file is memory-mapped for fast lookups at startup
+    and drives TTL checks and size-bounded LRU eviction.
+
+    Files are written to a temporary name and renamed into place, and writes
+    to one page are serialized, so readers never see a partly written file.
+    Caching is best-effort: write failures are logged and the page is served
+    uncached. The index is only safe for a single process; run one worker
+    per cache directory, since workers sharing one would overwrite each
+    other's records and free slots.
+    """
+
+    def __init__(self,
+                 directory: str = settings.PAGE_CACHE_DIR,
+                 ttl: float = settings.PAGE_CACHE_TTL,
+                 max_bytes: int = settings.PAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: Dict[bytes, CacheEntry] = {}
+        self._free_slots: List[int] = []
+        self._index_file = None
+        self._index: Optional[mmap.mmap] = None
+        self._capacity = 0
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._revalidations = 0
+        # digest -> (lock, holders and waiters); serializes writes to one page
+        self._locks: Dict[bytes, Tuple[asyncio.Lock, int]] = {}
+
+    # Index management
+
+    def open(self) -> None:
+        """Load the memory-mapped index. Called at startup, or lazily on first use."""
+        if self._index is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, INDEX_FILENAME)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(b"\x00" * INDEX_RECORD.size * INDEX_GROWTH)
+
+        self._index_file = open(path, "r+b")
+        self._index = mmap.mmap(self._index_file.fileno(), 0)
+        self._capacity = len(self._index) // INDEX_RECORD.size
+
+        for slot in range(self._capacity):
+            digest, fetched_at, last_access, size = INDEX_RECORD.unpack_from(
+                self._index, slot * INDEX_RECORD.size)
+            if digest == EMPTY_DIGEST:
+                self._free_slots.append(slot)
+                continue
+            self._entries[digest] = CacheEntry(
+                digest, slot, fetched_at, last_access, size)
+            self._total_bytes += size
+        # Pop from the end so low slots are reused first
+        self._free_slots.reverse()
+
+        logger.info(
+            f"Page cache opened at {self.directory} with {len(self._entries)} entries "
+            f"({self._total_bytes / (1024 * 1024):.1f}MB)")
+
+    def close(self) -> None:
+        """Flush and unmap the index."""
+        if self._index is not None:
+            self._index.flush()
+            self._index.close()
+            self._index_file.close()
+        self._index = None
+        self._index_file = None
+        self._entries = {}
+        self._free_slots = []
+        self._total_bytes = 0
+
+    def _grow_index(self) -> None:
+        self._index.flush()
+        self._index.close()
+        self._index_file.seek(0, os.SEEK_END)
+        self._index_file.write(b"\x00" * INDEX_RECORD.size * INDEX_GROWTH)
+        self._index_file.flush()
+        self._index = mmap.mmap(self._index_file.fileno(), 0)
+        new_capacity = len(self._index) // INDEX_RECORD.size
+        self._free_slots.extend(reversed(range(self._capacity, new_capacity)))
+        self._capacity = new_capacity
+
+    def _write_record(self, entry: CacheEntry) -> None:
+        INDEX_RECORD.pack_into(
+            self._index, entry.slot * INDEX_RECORD.size,
+            entry.digest, entry.fetched_at, entry.last_access, entry.size)
+
+    def _clear_record(self, entry: CacheEntry) -> None:
+        INDEX_RECORD.pack_into(
+            self._index, entry.slot * INDEX_RECORD.size, EMPTY_DIGEST, 0.0, 0.0, 0)
+        self._free_slots.append(entry.slot)
+
+    # Paths
+
+    def _digest(self, url: str) -> bytes:
+        return hashlib.sha256(normalize_url(url).encode("utf-8")).digest()
+
+    def _entry_dir(self, digest: bytes) -> str:
+        key = digest.hex()
+        return os.path.join(self.directory, key[:2], key)
+
+    def _raw_path(self, digest: bytes) -> str:
+        return os.path.join(self._entry_dir(digest), "raw.html.gz")
+
+    def _meta_path(self, digest: bytes) -> str:
+        return os.path.join(self._entry_dir(digest), "meta.json")
+
+    def _extracted_path(self, digest: bytes, engine: str, version: int) -> str:
+        return os.path.join(self._entry_dir(digest), f"extracted.{engine}.v{version}.json")
+
+    @contextlib.asynccontextmanager
+    async def _writing(self, digest: bytes) -> AsyncIterator[None]:
+        lock, users = self._locks.get(digest, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[digest] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[digest]
+            if users == 1:
+                del self._locks[digest]
+            else:
+                self._locks[digest] = (lock, users - 1)
+
+    # Lookups
+
+    def lookup(self, url: str, record_stats: bool = True) -> Optional[CacheEntry]:
+        """
+        Look up a URL in the index.
+
+        Args:
+            url (str): The URL to look up
+            record_stats (bool): Whether to count the lookup as a hit, stale entry or miss
+
+        Returns:
+            Optional[CacheEntry]: The index entry, fresh or stale, or None if the page is not cached
+        """
+        self.open()
+        entry = self._entries.get(self._digest(url))
+        if entry is None:
+            if record_stats:
+                self._misses += 1
+            return None
+        if record_stats:
+            # Stale entries still cost a request to revalidate, so they are not hits
+            if self.is_fresh(entry):
+                self._hits += 1
+            else:
+                self._stale += 1
+        entry.last_access = time.time()
+        self._write_record(entry)
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Whether an entry is within its TTL and can be used without revalidation."""
+        return time.time() - entry.fetched_at < self.ttl
+
+    async def get_validators(self, entry: CacheEntry) -> Optional[PageValidators]:
+        """
+        Read the validators for a cached entry without decompressing its body.
+
+        Returns:
+            Optional[PageValidators]: The validators, or None if the entry's files are missing
+        """
+        def _read() -> Optional[PageValidators]:
+            try:
+                with open(self._meta_path(entry.digest), encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            return PageValidators(meta.get("etag"), meta.get("last_modified"))
+
+        validators = await asyncio.to_thread(_read)
+        if validators is None:
+            logger.warning(
+                f"Page cache files missing for {entry.digest.hex()}, dropping entry")
+            await self._remove(entry)
+        return validators
+
+    async def get_raw(self, entry: CacheEntry) -> Optional[CachedPage]:
+        """
+        Read the raw page body and validators for a cached entry.
+
+        Returns:
+            Optional[CachedPage]: The cached page, or None if the files are missing
+        """
+        def _read() -> Optional[CachedPage]:
+            try:
+                with gzip.open(self._raw_path(entry.digest), "rt", encoding="utf-8") as f:
+                    html = f.read()
+                with open(self._meta_path(entry.digest), encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, EOFError, ValueError):
+                # EOFError: a truncated gzip file
+                return None
+            return CachedPage(html, meta.get("etag"), meta.get("last_modified"))
+
+        page = await asyncio.to_thread(_read)
+        if page is None:
+            logger.warning(
+                f"Page cache files missing for {entry.digest.hex()}, dropping entry")
+            await self._remove(entry)
+        return page
+
+    async def get_extracted(self, entry: CacheEntry, engine: str, version: int) -> Optional[URLContent]:
+        """
+        Read a previously extracted URLContent for an entry.
+
+        Args:
+            entry (CacheEntry): The index entry
+            engine (str): Extraction engine name
+            version (int): Extractor version
+
+        Returns:
+            Optional[URLContent]: The extracted content, or None if not extracted yet
+        """
+        def _read() -> Optional[URLContent]:
+            try:
+                with open(self._extracted_path(entry.digest, engine, version), encoding="utf-8") as f:
+                    return URLContent.model_validate_json(f.read())
+            except (OSError, ValueError):
+                return None
+
+        return await asyncio.to_thread(_read)
+
+    # Writes
+
+    async def put_raw(self,
+                      url: str,
+                      html: str,
+                      etag: Optional[str] = None,
+                      last_modified: Optional[str] = None
+                      ) -> Optional[CacheEntry]:
+        """
+        Store a freshly downloaded page, replacing any previous version and its extractions.
+
+        Returns:
+            Optional[CacheEntry]: The index entry for the stored page, or None if it could not be stored
+        """
+        digest = self._digest(url)
+        entry_dir = self._entry_dir(digest)
+
+        def _write() -> int:
+            os.makedirs(entry_dir, exist_ok=True)
+            # Remove stale extractions of the previous version of the page
+            for name in os.listdir(entry_dir):
+                if name.startswith("extracted."):
+                    os.remove(os.path.join(entry_dir, name))
+
+            def write_raw(f):
+                with gzip.open(f, "wt", encoding="utf-8", compresslevel=6) as gz:
+                    gz.write(html)
+            _write_atomic(self._raw_path(digest), write_raw)
+            _write_atomic(self._meta_path(digest), lambda f: f.write(json.dumps(
+                {"url": normalize_url(url), "etag": etag, "last_modified": last_modified}
+            ).encode("utf-8")))
+            return _directory_size(entry_dir)
+
+        try:
+            self.open()
+            async with self._writing(digest):
+                size = await asyncio.to_thread(_write)
+                now = time.time()
+
+                entry = self._entries.get(digest)
+                if entry is None:
+                    if not self._free_slots:
+                        self._grow_index()
+                    entry = CacheEntry(digest, self._free_slots.pop(), now, now, 0)
+                    self._entries[digest] = entry
+                self._total_bytes += size - entry.size
+                entry.fetched_at = now
+                entry.last_access = now
+                entry.size = size
+                self._write_record(entry)
+        except OSError as e:
+            logger.warning(f"Could not store page {url} in the cache: {str(e)}")
+            return None
+
+        try:
+            await self._evict()
+        except OSError as e:
+            logger.warning(f"Page cache eviction failed: {str(e)}")
+        return entry
+
+    async def put_extracted(self, entry: CacheEntry, engine: str, version: int, content: URLContent) -> None:
+        """Store the extracted URLContent for an entry."""
+        path = self._extracted_path(entry.digest, engine, version)
+        data = content.model_dump_json().encode("utf-8")
+
+        def _write() -> None:
+            _write_atomic(path, lambda f: f.write(data))
+
+        async with self._writing(entry.digest):
+            if self._entries.get(entry.digest) is not entry:
+                # Evicted meanwhile
+                return
+            try:
+                await asyncio.to_thread(_write)
+            except OSError as e:
+                logger.warning(f"Could not store extracted page content: {str(e)}")
+                return
+            entry.size += len(data)
+            self._total_bytes += len(data)
+            self._write_record(entry)
+
+    def mark_revalidated(self, entry: CacheEntry) -> None:
+        """Restart an entry's TTL after the origin confirmed it is unchanged (304)."""
+        self._revalidations += 1
+        entry.fetched_at = time.time()
+        self._write_record(entry)
+
+    # Eviction
+
+    async def _remove(self, entry: CacheEntry) -> None:
+        async with self._writing(entry.digest):
+            if self._entries.get(entry.digest) is not entry:
+                return
+            del self._entries[entry.digest]
+            self._total_bytes -= entry.size
+            self._clear_record(entry)
+            entry_dir = self._entry_dir(entry.digest)
+
+            def _delete() -> None:
+                if os.path.isdir(entry_dir):
+                    for name in os.listdir(entry_dir):
+                        os.remove(os.path.join(entry_dir, name))
+                    os.rmdir(entry_dir)
+
+            try:
+                await asyncio.to_thread(_delete)
+            except OSError as e:
+                # e.g. a file added meanwhile; the index no longer refers to it
+                logger.warning(f"Could not delete page cache files in {entry_dir}: {str(e)}")
+
+    async def _evict(self) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Evict least recently used entries down to 90% of the bound
+        target = self.max_bytes * 0.9
+        victims = sorted(self._entries.values(), key=lambda e: e.last_access)
+        evicted = 0
+        for entry in victims:
+            if self._total_bytes <= target:
+                break
+            await self._remove(entry)
+            evicted += 1
+        logger.info(
+            f"Page cache evicted {evicted} entries, now {self._total_bytes / (1024 * 1024):.1f}MB")
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict[str, float]: Entry count, stored bytes, fresh hits, stale entries,
+            misses and revalidations
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self._hits,
+            "stale": self._stale,
+            "misses": self._misses,
+            "revalidations": self._revalidations,
+        }
+
+
+def _write_atomic(path: str, write: Callable) -> None:
+    # Readers see the old file or the new one, never a partly written one
+    directory, name = os.path.split(path)
+    temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+def _directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+# Create a singleton instance
+page_cache = PageCache()
+
+__all__ = ['page_cache', 'normalize_url']
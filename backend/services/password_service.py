@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from passlib.context import CryptContext
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordServiceBusy(RuntimeError):
+    """Raised when too many hash or verify calls are already queued"""
+
+
+class PasswordService:
+    """
+    Hashes and verifies bcrypt passwords off the event loop.
+
+    bcrypt spends 100-300ms of CPU per call by design, so calls run on a
+    small dedicated thread pool (bcrypt releases the GIL) instead of
+    stalling every other request. At most `max_pending` calls may be
+    running or queued; beyond that PasswordServiceBusy is raised so a
+    login burst is shed instead of building an unbounded backlog.
+
+    Hashes created with a different cost than `rounds` are transparently
+    rehashed when their owner next logs in.
+    """
+
+    def __init__(self,
+                 rounds: int = settings.BCRYPT_ROUNDS,
+                 max_workers: Optional[int] = settings.PASSWORD_HASH_WORKERS,
+                 max_pending: int = settings.PASSWORD_HASH_MAX_PENDING):
+        self.rounds = rounds
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+        # Statistics
+        self._hashes = 0
+        self._verifications = 0
+        self._rehashes = 0
+        self._rejected = 0
+        self._seconds_total = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            logger.info(f"Starting password hashing thread pool with {self.max_workers} workers")
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise PasswordServiceBusy(
+                f"{self._pending} password operations already pending")
+        self._pending += 1
+        start_time = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+            self._seconds_total += time.perf_counter() - start_time
+
+    def hash_sync(self, password: str) -> str:
+        """Hash a password on the calling thread, for scripts outside the event loop."""
+        return self.context.hash(password)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured cost."""
+        self._hashes += 1
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """Check a password against a stored hash."""
+        self._verifications += 1
+        return await self._run(self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password and rehash it if the stored hash uses a different cost.
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether the password matched, and a
+            replacement hash to store if one is needed
+        """
+        self._verifications += 1
+        verified, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        if new_hash is not None:
+            self._rehashes += 1
+        return verified, new_hash
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get password hashing statistics.
+
+        Returns:
+            Dict[str, float]: Pool size, pending calls, call counts and average duration
+        """
+        calls = self._hashes + self._verifications
+        return {
+            "rounds": self.rounds,
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "hashes": self._hashes,
+            "verifications": self._verifications,
+            "rehashes": self._rehashes,
+            "rejected": self._rejected,
+            "avg_ms": self._seconds_total / calls * 1000 if calls else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        """Stop the pool. Called at application shutdown."""
+        if self._executor is not None:
+            logger.info("Shutting down password hashing thread pool")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Create a singleton instance
+password_service = PasswordService()
+
+__all__ = ['password_service', 'PasswordServiceBusy']
+
+
+async def _measure_lag(stop: asyncio.Event, lags: list) -> None:
+    # How late a 10ms sleep wakes up shows how long the loop was blocked
+    while not stop.is_set():
+        start_time = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start_time - 0.01)
+
+
+async def _benchmark(service: PasswordService, logins: int, concurrency: int, inline: bool) -> Dict[str, float]:
+    hashed = service.hash_sync("benchmark-password")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            if inline:
+                service.context.verify_and_update("benchmark-password", hashed)
+            else:
+                await service.verify_and_update("benchmark-password", hashed)
+
+    stop = asyncio.Event()
+    lags: list = []
+    monitor = asyncio.create_task(_measure_lag(stop, lags))
+    await asyncio.sleep(0.05)
+    start_time = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(logins)])
+    elapsed = time.perf_counter() - start_time
+    stop.set()
+    await monitor
+    lags.sort()
+    return {
+        "logins_per_second": logins / elapsed,
+        "p99_loop_lag_ms": lags[int(len(lags) * 0.99) - 1] * 1000 if lags else 0.0,
+        "max_loop_lag_ms": lags[-1] * 1000 if lags else 0.0,
+    }
+
+
+async def _main(args) -> None:
+    service = PasswordService(rounds=args.rounds, max_workers=args.workers,
+                              max_pending=args.logins)
+    try:
+        for mode, inline in (("inline", True), ("executor", False)):
+            result = await _benchmark(service, args.logins, args.concurrency, inline)
+            print(f"{mode:>8}: {result['logins_per_second']:.1f} logins/s, "
+                  f"p99 loop lag {result['p99_loop_lag_ms']:.1f}ms, "
+                  f"max loop lag {result['max_loop_lag_ms']:.1f}ms")
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark login password verification on and off the event loop")
+    parser.add_argument("--logins", type=int, default=50, help="Logins to verify")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent logins")
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS, help="bcrypt cost")
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS,
+                        help="Thread pool size")
+    asyncio.run(_main(parser.parse_args()))
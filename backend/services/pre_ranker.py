@@ -0,0 +1,212 @@
+import logging
+import re
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+from config.settings import settings
+from schemas import SearchResult
+
+logger = logging.getLogger(__name__)
+
+SCORING_MODES = ("llm", "local", "hybrid")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how in is it its of on or that the
+this to was were what when where which who why will with
+""".split())
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Hashed feature vectors: word unigrams plus character trigrams
+HASH_DIMENSIONS = 4096
+
+LLMScorer = Callable[[str, List[SearchResult]], Awaitable[List[SearchResult]]]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def bm25_scores(query_tokens: List[str], documents: List[List[str]]) -> np.ndarray:
+    """
+    Score tokenized documents against a query with BM25, normalized to [0, 1).
+
+    Scores are divided by the largest score any document could reach for the
+    query, so they are comparable across queries and result sets.
+    """
+    terms = list(dict.fromkeys(query_tokens))
+    if not terms or not documents:
+        return np.zeros(len(documents))
+
+    term_index = {term: j for j, term in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)))
+    for i, document in enumerate(documents):
+        for token in document:
+            j = term_index.get(token)
+            if j is not None:
+                tf[i, j] += 1
+
+    lengths = np.array([len(document) for document in documents], dtype=float)
+    avg_length = lengths.mean() or 1.0
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+    scores = (tf * (BM25_K1 + 1) / (tf + norm[:, None])) @ idf
+    return scores / (idf.sum() * (BM25_K1 + 1))
+
+
+def _features(tokens: List[str]) -> List[str]:
+    features = list(tokens)
+    for token in tokens:
+        padded = f"#{token}#"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+def hashed_vectors(token_lists: List[List[str]]) -> np.ndarray:
+    """
+    Embed token lists as L2-normalized hashed feature vectors.
+
+    Character trigrams make the vectors tolerant of inflections and
+    spelling variants that exact BM25 term matching misses.
+    """
+    vectors = np.zeros((len(token_lists), HASH_DIMENSIONS))
+    for i, tokens in enumerate(token_lists):
+        buckets = [zlib.crc32(f.encode("utf-8")) % HASH_DIMENSIONS for f in _features(tokens)]
+        np.add.at(vectors[i], buckets, 1.0)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class PreRanker:
+    """
+    Local relevance ranking ahead of, or instead of, LLM scoring.
+
+    Scores title and snippet text with BM25 and hashed-vector cosine
+    similarity in a few milliseconds. Modes:
+    - llm: score everything with the LLM (no pre-ranking)
+    - local: use the local scores only
+    - hybrid: keep confident local scores and send only the ambiguous
+      middle band to the LLM
+
+    Raw local scores rarely exceed 70 even for exact matches, so returned
+    scores are calibrated onto the LLM's 0-100 rubric: the band edges map
+    to calibrated_low and calibrated_high, linearly in between.
+    """
+
+    def __init__(self,
+                 mode: str = settings.RELEVANCE_SCORING_MODE,
+                 band_low: float = settings.PRE_RANK_BAND_LOW,
+                 band_high: float = settings.PRE_RANK_BAND_HIGH,
+                 bm25_weight: float = settings.PRE_RANK_BM25_WEIGHT,
+                 calibrated_low: float = settings.PRE_RANK_CALIBRATED_LOW,
+                 calibrated_high: float = settings.PRE_RANK_CALIBRATED_HIGH):
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unsupported relevance scoring mode: {mode}")
+        self.mode = mode
+        self.band_low = band_low
+        self.band_high = band_high
+        self.bm25_weight = bm25_weight
+        self.calibrated_low = calibrated_low
+        self.calibrated_high = calibrated_high
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        Score texts against a query.
+
+        Args:
+            query (str): The search query
+            texts (List[str]): Texts to score
+
+        Returns:
+            np.ndarray: Scores from 0 to 100, one per text
+        """
+        query_tokens = tokenize(query)
+        documents = [tokenize(text) for text in texts]
+        if not documents:
+            return np.zeros(0)
+
+        lexical = bm25_scores(query_tokens, documents)
+        vectors = hashed_vectors([query_tokens] + documents)
+        semantic = np.clip(vectors[1:] @ vectors[0], 0.0, 1.0)
+        return 100.0 * (self.bm25_weight * lexical + (1 - self.bm25_weight) * semantic)
+
+    def calibrate(self, scores: np.ndarray) -> np.ndarray:
+        """
+        Map raw local scores onto the LLM's scoring scale.
+
+        Args:
+            scores (np.ndarray): Raw scores from score()
+
+        Returns:
+            np.ndarray: Calibrated scores from 0 to 100, in the same order
+        """
+        return np.interp(
+            scores,
+            [0.0, self.band_low, self.band_high, 100.0],
+            [0.0, self.calibrated_low, self.calibrated_high, 100.0])
+
+    async def rank(self,
+                   query: str,
+                   results: List[SearchResult],
+                   llm_score: LLMScorer,
+                   mode: Optional[str] = None
+                   ) -> List[SearchResult]:
+        """
+        Score and sort search results, using the LLM only where the mode requires it.
+
+        Args:
+            query (str): The search query
+            results (List[SearchResult]): Results to score
+            llm_score (LLMScorer): Coroutine scoring results with the LLM
+            mode (str, optional): 'llm', 'local' or 'hybrid'; defaults to the configured mode
+
+        Returns:
+            List[SearchResult]: Scored copies of the results, sorted by relevance
+        """
+        mode = mode or self.mode
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unsupported relevance scoring mode: {mode}")
+        if mode == "llm" or not results:
+            return await llm_score(query, results)
+
+        start_time = time.perf_counter()
+        local_scores = self.score(
+            query, [f"{result.title} {result.snippet}" for result in results])
+        scored_results = []
+        ambiguous: Dict[str, SearchResult] = {}
+        for result, local_score, calibrated_score in zip(
+                results, local_scores, self.calibrate(local_scores)):
+            result_copy = result.copy()
+            result_copy.relevance_score = round(float(calibrated_score), 1)
+            scored_results.append(result_copy)
+            # The band is defined on raw scores
+            if mode == "hybrid" and self.band_low <= local_score <= self.band_high:
+                ambiguous[result_copy.link] = result_copy
+        logger.info(
+            f"Pre-ranked {len(results)} results in {(time.perf_counter() - start_time) * 1000:.1f}ms, "
+            f"{len(ambiguous)} sent to LLM scoring")
+
+        if ambiguous:
+            llm_scores = {
+                result.link: result.relevance_score
+                for result in await llm_score(query, list(ambiguous.values()))
+            }
+            for result in scored_results:
+                if result.link in llm_scores:
+                    result.relevance_score = llm_scores[result.link]
+
+        scored_results.sort(key=lambda x: x.relevance_score, reverse=True)
+        return scored_results
+
+
+# Create a singleton instance
+pre_ranker = PreRanker()
+
+__all__ = ['pre_ranker', 'SCORING_MODES']
@@ -1,20 +1,30 @@
-from sqlalchemy.orm import Session
 import logging
 from typing import List, Dict, Optional
 from config.settings import settings
 from services.ai_service import ai_service
-from services.search_service import google_search, score_and_rank_results
+from services.search_service import google_search
+from services.batch_scorer import batch_scorer
+from services.pre_ranker import pre_ranker
+from services.tracing import traced
 from schemas import SearchResult, QuestionAnalysis, CurrentEventsCheck, ResearchEvaluation
 import json
 import asyncio
+import time
+from contextlib import aclosing
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_SPECULATION_STRATEGIES = ("merge", "restart")
+# Yielded by speculative analysis before it starts over with current events context;
+# clients should discard the analysis received so far
+ANALYSIS_RESTART_MARKER = "\n<!-- analysis-restart -->\n"
+
 
 class ResearchService:
     def __init__(self):
         self.search_wrapper = None
 
+    @traced("research.check_current_events_context_stream")
     async def check_current_events_context_stream(self, question: str):
         """
         Stream the current events context check process.
@@ -30,6 +40,7 @@ class ResearchService:
             logger.error(f"Error in streaming current events check: {str(e)}")
             yield "Error checking current events context. Please try again.\n"
 
+    @traced("research.check_current_events_context")
     async def check_current_events_context(self, question: str) -> CurrentEventsCheck:
         """
         Check if a question requires current events context.
@@ -49,6 +60,7 @@ class ResearchService:
                 search_queries=[]
             )
 
+    @traced("research.gather_current_events_context")
     async def gather_current_events_context(self, check_result: CurrentEventsCheck) -> List[SearchResult]:
         """
         Gather current events context using the search queries from the check result.
@@ -88,38 +100,141 @@ class ResearchService:
             logger.error(f"Error gathering current events context: {str(e)}")
             return []
 
-    async def analyze_question_stream(self, question: str):
+    async def _current_events_context_summary(self, question: str) -> Optional[str]:
+        """
+        Check whether a question needs current events context and gather it.
+
+        Returns:
+            Optional[str]: A context summary to append to the question, or None
+        """
+        check_result = await self.check_current_events_context(question)
+        if not check_result.requires_current_context:
+            return None
+
+        context_results = await self.gather_current_events_context(check_result)
+        return "\n\nCurrent Events Context:\n" + "\n".join([
+            f"- {result.title}: {result.snippet}"
+            # Use top 5 most relevant results
+            for result in context_results[:5]
+        ])
+
+    @traced("research.analyze_question_stream")
+    async def analyze_question_stream(self, question: str, speculative: Optional[bool] = None):
         """
         Stream the question analysis process.
+
+        In speculative mode the plain analysis starts streaming immediately
+        while the current events check and context search run alongside it.
+        If context turns out to be needed, the 'merge' strategy appends a
+        section updating the analysis with it, and the 'restart' strategy
+        abandons the plain analysis, yields ANALYSIS_RESTART_MARKER and
+        streams the context-aware analysis instead.
+
+        Args:
+            question (str): The question to analyze
+            speculative (bool, optional): Defaults to the ANALYSIS_SPECULATIVE setting
         """
+        if speculative is None:
+            speculative = settings.ANALYSIS_SPECULATIVE
+        start_time = time.perf_counter()
         try:
             logger.info(f"Analyzing question (streaming): {question}")
 
-            # First, check if we need current events context
-            check_result = await self.check_current_events_context(question)
-
-            if check_result.requires_current_context:
-                # If we need context, gather it first
-                context_results = await self.gather_current_events_context(check_result)
-
-                # Add context to the question
-                context_summary = "\n\nCurrent Events Context:\n" + "\n".join([
-                    f"- {result.title}: {result.snippet}"
-                    # Use top 5 most relevant results
-                    for result in context_results[:5]
-                ])
-                enhanced_question = question + context_summary
+            if speculative:
+                stream = self._analyze_question_speculative(question, start_time)
             else:
-                enhanced_question = question
-
-            # Now proceed with the regular analysis
-            async for chunk in ai_service.analyze_question_stream(enhanced_question):
-                yield chunk
+                stream = self._analyze_question_sequential(question, start_time)
+            # Close the pipeline promptly if the client disconnects
+            async with aclosing(stream):
+                async for chunk in stream:
+                    yield chunk
 
         except Exception as e:
             logger.error(f"Error in streaming analysis: {str(e)}")
             yield "Error analyzing question. Please try again.\n"
 
+    async def _analyze_question_sequential(self, question: str, start_time: float):
+        context_summary = await self._current_events_context_summary(question)
+        enhanced_question = question + (context_summary or "")
+
+        first_token = True
+        async for chunk in ai_service.analyze_question_stream(enhanced_question):
+            if first_token:
+                first_token = False
+                logger.info(
+                    f"Analysis time to first token: {time.perf_counter() - start_time:.2f}s (sequential)")
+            yield chunk
+
+    async def _analyze_question_speculative(self, question: str, start_time: float):
+        strategy = settings.ANALYSIS_SPECULATION_STRATEGY
+        if strategy not in ANALYSIS_SPECULATION_STRATEGIES:
+            raise ValueError(f"Unsupported speculation strategy: {strategy}")
+
+        context_task = asyncio.create_task(self._current_events_context_summary(question))
+        stream = ai_service.analyze_question_stream(question)
+        next_chunk = asyncio.ensure_future(anext(stream))
+        analysis: List[str] = []
+        context_summary: Optional[str] = None
+        context_checked = False
+        try:
+            while next_chunk is not None:
+                waiting = {next_chunk} if context_checked else {next_chunk, context_task}
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                if context_task in done and not context_checked:
+                    context_checked = True
+                    context_summary = context_task.result()
+                    if context_summary and strategy == "restart":
+                        # Abandon the plain analysis as soon as it is known to be stale
+                        next_chunk.cancel()
+                        break
+
+                if next_chunk in done:
+                    try:
+                        chunk = next_chunk.result()
+                    except StopAsyncIteration:
+                        next_chunk = None
+                        break
+                    if not analysis:
+                        logger.info(
+                            f"Analysis time to first token: {time.perf_counter() - start_time:.2f}s (speculative)")
+                    analysis.append(chunk)
+                    yield chunk
+                    next_chunk = asyncio.ensure_future(anext(stream))
+
+            if not context_checked:
+                context_summary = await context_task
+        finally:
+            context_task.cancel()
+            if next_chunk is not None:
+                next_chunk.cancel()
+                # The generator must be idle before it can be closed
+                await asyncio.gather(next_chunk, return_exceptions=True)
+            await stream.aclose()
+
+        if not context_summary:
+            logger.info("Speculative analysis needed no current events context")
+            return
+
+        if strategy == "restart":
+            logger.info(
+                f"Restarting analysis with current events context after {len(analysis)} chunks")
+            yield ANALYSIS_RESTART_MARKER
+            context_stream = ai_service.analyze_question_stream(question + context_summary)
+        else:
+            context_stream = ai_service.analyze_question_context_stream(
+                question, "".join(analysis), context_summary)
+            yield "\n\n"
+
+        first_token = True
+        async for chunk in context_stream:
+            if first_token:
+                first_token = False
+                logger.info(
+                    f"Analysis time to first context token: {time.perf_counter() - start_time:.2f}s ({strategy})")
+            yield chunk
+
+    @traced("research.expand_question_stream")
     async def expand_question_stream(self, question: str):
         """
         Stream the question expansion process with detailed analysis and explanation.
@@ -140,6 +255,7 @@ class ResearchService:
             logger.error(f"Error in streaming expansion: {str(e)}")
             yield "Error expanding question. Please try again.\n"
 
+    @traced("research.search_with_query")
     async def _search_with_query(self, query: str) -> Dict:
         """
         Wrapper around google_search that returns both results and original query.
@@ -165,7 +281,8 @@ class ResearchService:
                 'error': str(e)
             }
 
-    async def execute_queries_stream(self, queries: List[str]):
+    @traced("research.execute_queries_stream")
+    async def execute_queries_stream(self, queries: List[str], scoring_mode: Optional[str] = None):
         """
         Stream the search results for multiple queries.
         Results are streamed as JSON chunks in the same format as execute_queries.
@@ -173,6 +290,7 @@ class ResearchService:
 
         Args:
             queries (List[str]): List of search queries to execute
+            scoring_mode (str, optional): 'llm', 'local' or 'hybrid'; defaults to the server setting
 
         Yields:
             str: JSON chunks containing search results
@@ -182,48 +300,44 @@ class ResearchService:
 
             # Track unique results and their source queries
             seen_urls = {}  # url -> (result_dict, source_query)
-            pending_results = []  # List to collect results before scoring
+
+            @traced("research.search_and_score")
+            async def search_and_score(query: str) -> List[SearchResult]:
+                search_result = await self._search_with_query(query)
+
+                # Keep only results no earlier query has found
+                new_results = []
+                for result in search_result['results']:
+                    if result["link"] not in seen_urls:
+                        seen_urls[result["link"]] = (result, query)
+                        new_results.append(SearchResult(
+                            title=result["title"],
+                            link=result["link"],
+                            snippet=result["snippet"],
+                            displayLink=result["displayLink"],
+                            pagemap=result["pagemap"],
+                            relevance_score=0.0
+                        ))
+
+                # Score against the query that found them; results needing the
+                # LLM from queries finishing close together share one request
+                return await pre_ranker.rank(
+                    query, new_results, batch_scorer.score, scoring_mode)
 
             # Create tasks for parallel execution
-            tasks = [asyncio.create_task(
-                self._search_with_query(query)) for query in queries]
+            tasks = [asyncio.create_task(search_and_score(query))
+                     for query in queries]
 
-            # Execute queries concurrently
+            # Stream each query's results as soon as they are scored
             for completed in asyncio.as_completed(tasks):
                 try:
-                    search_result = await completed
-                    source_query = search_result['query']
-                    results = search_result['results']
-
-                    # Track new unique results with their source query
-                    for result in results:
-                        if result["link"] not in seen_urls:
-                            seen_urls[result["link"]] = (result, source_query)
-                            search_result = SearchResult(
-                                title=result["title"],
-                                link=result["link"],
-                                snippet=result["snippet"],
-                                displayLink=result["displayLink"],
-                                pagemap=result["pagemap"],
-                                relevance_score=0.0
-                            )
-                            pending_results.append(search_result)
-
-                    # Score and stream this batch of results
-                    if pending_results:
-                        # Score all results from this query
-                        scored_results = await score_and_rank_results(source_query, pending_results)
-                        scored_results.sort(
-                            key=lambda x: x.relevance_score, reverse=True)
-
+                    scored_results = await completed
+                    if scored_results:
                         # Stream results as JSON
                         results_json = [result.dict()
                                         for result in scored_results]
                         yield json.dumps(results_json) + "\n"
 
-                        # Clear pending results
-                        pending_results = []
-
                 except Exception as e:
                     logger.error(f"Error processing search results: {str(e)}")
                     continue
@@ -232,6 +346,7 @@ class ResearchService:
             logger.error(f"Error in streaming execution: {str(e)}")
             yield json.dumps({"error": str(e)}) + "\n"
 
+    @traced("research.evaluate_answer")
     async def evaluate_answer(self, question: str, analysis: QuestionAnalysis, answer: str) -> ResearchEvaluation:
         """
         Evaluate how well an answer addresses a research question.
@@ -275,14 +390,18 @@ class ResearchService:
 
     # DEPRECATED
 
-    async def execute_queries(self, db: Session, queries: List[str], user_id: int) -> List[SearchResult]:
+    @traced("research.execute_queries")
+    async def execute_queries(self,
+                              queries: List[str],
+                              user_id: int,
+                              scoring_mode: Optional[str] = None) -> List[SearchResult]:
         """
         Execute multiple search queries and return collated, deduplicated results.
 
         Args:
-            db (Session): Database session
             queries (List[str]): List of search queries to execute
             user_id (int): ID of the user performing the search
+            scoring_mode (str, optional): 'llm', 'local' or 'hybrid'; defaults to the server setting
 
         Returns:
             List[SearchResult]: List of unique search results from all queries, sorted by relevance
@@ -317,8 +436,11 @@ class ResearchService:
 
             # Score all unique results against all queries and keep highest score
             result_scores = {}
-            for query in queries:
-                scored_results = await score_and_rank_results(query, unique_results)
+            all_scored_results = await asyncio.gather(*[
+                pre_ranker.rank(query, unique_results, batch_scorer.score, scoring_mode)
+                for query in queries
+            ])
+            for scored_results in all_scored_results:
                 for result in scored_results:
                     if result.link not in result_scores or result.relevance_score > result_scores[result.link]:
                         result_scores[result.link] = result.relevance_score
@@ -336,6 +458,7 @@ class ResearchService:
             logger.error(f"Error executing queries: {str(e)}")
             return []
 
+    @traced("research.analyze_question")
     async def analyze_question(self, question: str) -> QuestionAnalysis:
         """
         Analyze a question to identify its core components, scope, and success criteria.
@@ -372,6 +495,7 @@ class ResearchService:
                 conflicting_viewpoints=[]
             )
 
+    @traced("research.expand_question")
     async def expand_question(self, question: str) -> List[str]:
         """
         Expand a question into multiple related queries using AI.
@@ -0,0 +1,228 @@
+import asyncio
+import copy
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_results (
+    cache_key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    results TEXT NOT NULL
+)
+"""
+
+
+def make_search_key(query: str, num: int, hl: str, safe: str, cx: str) -> str:
+    """
+    Build the cache key for a search request.
+
+    The query is case-folded and its whitespace collapsed, so trivially
+    different spellings of the same query share one entry. The search
+    engine ID is part of the key, since engines search different sites.
+    """
+    normalized_query = " ".join(query.split()).casefold()
+    return json.dumps([normalized_query, num, hl, safe, cx], ensure_ascii=False)
+
+
+class SearchCache:
+    """
+    TTL cache for search API results.
+
+    Keeps a memory-bounded LRU of recent results, optionally backed by a
+    SQLite file so results survive restarts. Concurrent requests for the
+    same key are coalesced into a single upstream call. Failed calls are
+    never cached.
+    """
+
+    def __init__(self,
+                 ttl: float = settings.SEARCH_CACHE_TTL,
+                 max_bytes: int = settings.SEARCH_CACHE_MAX_BYTES,
+                 sqlite_path: Optional[str] = settings.SEARCH_CACHE_SQLITE_PATH):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sqlite_path = sqlite_path
+        # key -> (stored_at, size, results)
+        self._entries: "OrderedDict[str, Tuple[float, int, List[Dict]]]" = OrderedDict()
+        self._total_bytes = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+        # Statistics
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    async def get_or_fetch(self,
+                           key: str,
+                           fetch: Callable[[], Awaitable[List[Dict]]]
+                           ) -> List[Dict]:
+        """
+        Return cached results for a key, or fetch and cache them.
+
+        Args:
+            key (str): Cache key from make_search_key
+            fetch (Callable): Coroutine function performing the upstream request.
+                Exceptions it raises propagate to every waiting caller and are not cached.
+
+        Returns:
+            List[Dict]: The search results
+        """
+        results = self._get_memory(key)
+        if results is not None:
+            self._hits += 1
+            return copy.deepcopy(results)
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self._coalesced += 1
+        # Shield so one cancelled caller doesn't cancel the shared request
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _load(self,
+                    key: str,
+                    fetch: Callable[[], Awaitable[List[Dict]]]
+                    ) -> List[Dict]:
+        stored = await self._get_disk(key) if self.sqlite_path else None
+        if stored is not None:
+            self._disk_hits += 1
+            stored_at, results = stored
+        else:
+            self._misses += 1
+            results = await fetch()
+            stored_at = time.time()
+            if self.sqlite_path:
+                await self._put_disk(key, stored_at, results)
+        self._put_memory(key, stored_at, results)
+        return results
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieve the exception so it isn't reported as unhandled when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    # Memory tier
+
+    def _get_memory(self, key: str) -> Optional[List[Dict]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, size, results = entry
+        if time.time() - stored_at >= self.ttl:
+            self._drop_memory(key)
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    def _put_memory(self, key: str, stored_at: float, results: List[Dict]) -> None:
+        size = len(key) + len(json.dumps(results))
+        if size > self.max_bytes:
+            return
+        self._drop_memory(key)
+        self._entries[key] = (stored_at, size, results)
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._drop_memory(oldest_key)
+
+    def _drop_memory(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    # SQLite tier
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            self._db.execute(SCHEMA)
+            self._db.commit()
+            logger.info(f"Search cache backed by {self.sqlite_path}")
+        return self._db
+
+    async def _get_disk(self, key: str) -> Optional[Tuple[float, List[Dict]]]:
+        def _read() -> Optional[Tuple[float, str]]:
+            with self._db_lock:
+                return self._connect().execute(
+                    "SELECT stored_at, results FROM search_results WHERE cache_key = ?",
+                    (key,)
+                ).fetchone()
+
+        try:
+            row = await asyncio.to_thread(_read)
+        except sqlite3.Error as e:
+            logger.warning(f"Search cache read failed: {str(e)}")
+            return None
+        if row is None or time.time() - row[0] >= self.ttl:
+            return None
+        return row[0], json.loads(row[1])
+
+    async def _put_disk(self, key: str, stored_at: float, results: List[Dict]) -> None:
+        data = json.dumps(results)
+
+        def _write() -> None:
+            with self._db_lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO search_results (cache_key, stored_at, results) "
+                    "VALUES (?, ?, ?)",
+                    (key, stored_at, data)
+                )
+                # Expired rows are pruned on write so the file stays bounded by the TTL
+                db.execute("DELETE FROM search_results WHERE stored_at < ?",
+                           (time.time() - self.ttl,))
+                db.commit()
+
+        try:
+            await asyncio.to_thread(_write)
+        except sqlite3.Error as e:
+            logger.warning(f"Search cache write failed: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop all in-memory entries."""
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def close(self) -> None:
+        """Close the SQLite connection, if open."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict[str, float]: Entry count, memory bytes, hits, disk hits, misses and coalesced requests
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self._hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+        }
+
+
+# Create a singleton instance
+search_cache = SearchCache()
+
+__all__ = ['search_cache', 'make_search_key']
@@ -1,15 +1,21 @@
-from sqlalchemy.orm import Session
 import logging
 from typing import List, Dict, Optional
+from functools import partial
 import aiohttp
 from config.settings import settings
 from schemas import SearchResult, URLContent
 from services.ai_service import ai_service
-import ssl
-import certifi
-from bs4 import BeautifulSoup
+from services.llm.admission import llm_priority, Priority
+from services.http_client import http_client_pool
+from services.fetch_scheduler import fetch_scheduler
+from services.extraction_executor import extraction_executor
+from html_extraction import EXTRACTOR_VERSION
+from services.page_cache import page_cache, CacheEntry
+from services.search_cache import search_cache, make_search_key
+from services.pre_ranker import pre_ranker
+from services.tracing import traced
+from services.metrics import search_metrics, fetch_metrics
 import asyncio
-import bleach
 import httpx
 from fastapi import HTTPException
 NUM_RESULTS = settings.GOOGLE_SEARCH_NUM_RESULTS
@@ -17,15 +23,18 @@ NUM_RESULTS = settings.GOOGLE_SEARCH_NUM_RESULTS
 logger = logging.getLogger(__name__)
 
 
-async def search(db: Session, query: str, user_id: int = 0) -> List[SearchResult]:
+@traced("search.search")
+async def search(query: str,
+                 user_id: int = 0,
+                 scoring_mode: Optional[str] = None) -> List[SearchResult]:
     """
     Perform web search for the given query using Google Custom Search API
     and score results using AI
 
     Args:
-        db (Session): Database session
         query (str): Search query
         user_id (int): ID of the user performing the search
+        scoring_mode (str, optional): 'llm', 'local' or 'hybrid'; defaults to the server setting
 
     Returns:
         List[SearchResult]: List of scored and sorted search results
@@ -49,7 +58,7 @@ async def search(db: Session, query: str, user_id: int = 0) -> List[SearchResult
         ]
 
         # Score and sort results
-        scored_results = await score_and_rank_results(query, search_results)
+        scored_results = await score_and_rank_results(query, search_results, scoring_mode)
         return scored_results
 
     except Exception as e:
@@ -57,6 +66,7 @@ async def search(db: Session, query: str, user_id: int = 0) -> List[SearchResult
         return []
 
 
+@traced("search.google_search")
 async def google_search(query: str,
                         api_key: str = settings.GOOGLE_SEARCH_API_KEY,
                         cx: str = settings.GOOGLE_SEARCH_ENGINE_ID,
@@ -77,8 +87,6 @@ async def google_search(query: str,
     Returns:
         List[Dict]: List of search results, each containing 'title', 'link', and 'snippet'
     """
-    base_url = "https://www.googleapis.com/customsearch/v1"
-
     params = {
         'key': api_key,
         'cx': cx,
@@ -89,32 +97,12 @@ async def google_search(query: str,
     }
 
     try:
-        # Create SSL context with verified certificates
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-
-        # Use the SSL context in the ClientSession
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
-            async with session.get(base_url, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-
-                # Check if there are search results
-                if 'items' not in data:
-                    return []
-
-                # Extract relevant information from each result
-                results = []
-                for item in data['items']:
-                    result = {
-                        'title': item.get('title', ''),
-                        'link': item.get('link', ''),
-                        'snippet': item.get('snippet', ''),
-                        'displayLink': item.get('displayLink', ''),
-                        'pagemap': item.get('pagemap', {})
-                    }
-                    results.append(result)
-
-                return results
+        if not settings.SEARCH_CACHE_ENABLED:
+            return await _google_search_request(params)
+        # Identical queries share cached results and concurrent calls share one request
+        key = make_search_key(query, num_results, language, safe, cx)
+        return await search_cache.get_or_fetch(
+            key, partial(_google_search_request, params))
 
     except aiohttp.ClientError as e:
         logger.error(f"API request failed: {str(e)}")
@@ -124,10 +112,70 @@ async def google_search(query: str,
         return []
 
 
-async def score_and_rank_results(query: str, results: List[SearchResult]) -> List[SearchResult]:
+@traced("search._google_search_request")
+async def _google_search_request(params: Dict) -> List[Dict]:
+    """
+    Call the Custom Search API. Errors are raised so they are never cached.
+
+    Args:
+        params (Dict): Query parameters for the API
+
+    Returns:
+        List[Dict]: List of search results
+    """
+    base_url = "https://www.googleapis.com/customsearch/v1"
+
+    with search_metrics.track():
+        # Reuse the application-wide session so connections are kept alive
+        session = await http_client_pool.get_session()
+        async with session.get(base_url, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+            # Check if there are search results
+            if 'items' not in data:
+                return []
+
+            # Extract relevant information from each result
+            results = []
+            for item in data['items']:
+                result = {
+                    'title': item.get('title', ''),
+                    'link': item.get('link', ''),
+                    'snippet': item.get('snippet', ''),
+                    'displayLink': item.get('displayLink', ''),
+                    'pagemap': item.get('pagemap', {})
+                }
+                results.append(result)
+
+            return results
+
+
+@traced("search.score_and_rank_results")
+async def score_and_rank_results(query: str,
+                                 results: List[SearchResult],
+                                 scoring_mode: Optional[str] = None) -> List[SearchResult]:
     """
     Score and rank search results based on relevance to the query.
 
+    Results are pre-ranked locally and, depending on the scoring mode, all,
+    some or none of them are scored by the LLM.
+
+    Args:
+        query (str): The search query
+        results (List[SearchResult]): List of search results to score
+        scoring_mode (str, optional): 'llm', 'local' or 'hybrid'; defaults to the server setting
+
+    Returns:
+        List[SearchResult]: Scored and ranked results
+    """
+    return await pre_ranker.rank(query, results, _llm_score_and_rank_results, scoring_mode)
+
+
+async def _llm_score_and_rank_results(query: str, results: List[SearchResult]) -> List[SearchResult]:
+    """
+    Score and rank search results with the LLM.
+
     Args:
         query (str): The search query
         results (List[SearchResult]): List of search results to score
@@ -146,7 +194,8 @@ async def score_and_rank_results(query: str, results: List[SearchResult]) -> Lis
         ]
 
         # Get scores from AI service
-        scores = await ai_service.score_results(query, results_for_scoring)
+        with llm_priority(Priority.BACKGROUND):
+            scores = await ai_service.score_results(query, results_for_scoring)
 
         # Create a map of url to score
         score_map = {score['url']: score['score'] for score in scores}
@@ -171,81 +220,162 @@ async def score_and_rank_results(query: str, results: List[SearchResult]) -> Lis
         return results
 
 
-async def fetch_url_content(url: str) -> URLContent:
+@traced("search.fetch_url_content")
+async def fetch_url_content(url: str, engine: Optional[str] = None) -> URLContent:
+    """
+    Fetch and extract content from a single URL, subject to the fetch scheduler's
+    global concurrency cap and per-domain rate limits. Fresh pages are served
+    from the page cache without touching the network.
 
-    # Configure allowed HTML tags and attributes
-    ALLOWED_TAGS = [
-        'p', 'br', 'b', 'i', 'u', 'em', 'strong', 'a', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-        'table', 'thead', 'tbody', 'tr', 'td', 'th',
-        'ul', 'ol', 'li', 'blockquote', 'pre', 'code', 'hr', 'div', 'span', 'img'
-    ]
+    Args:
+        url (str): The URL to fetch content from
+        engine (str, optional): HTML extraction engine ('lxml' or 'bs4'),
+            defaults to settings.HTML_EXTRACTION_ENGINE
 
-    ALLOWED_ATTRIBUTES = {
-        '*': ['class'],
-        'a': ['href', 'title'],
-        'img': ['src', 'alt', 'title', 'width', 'height'],
-    }       
+    Returns:
+        URLContent: The extracted page content
+    """
+    cached = await _get_fresh_cached_content(url, engine)
+    if cached is not None:
+        return cached
+    return await fetch_scheduler.run(url, partial(_fetch_url_content, engine=engine))
+
+
+async def _extract_url_content(url: str, html: str, engine: str, entry: Optional[CacheEntry] = None) -> URLContent:
+    """Extract a page and store the extraction alongside its cached raw HTML."""
+    # Parse and sanitize off the event loop
+    title, cleaned_html = await extraction_executor.extract(html, engine)
+    content = URLContent(
+        url=url,
+        title=title,
+        text=cleaned_html,
+        content_type='html'
+    )
+    if entry is not None:
+        await page_cache.put_extracted(entry, engine, EXTRACTOR_VERSION, content)
+    return content
+
+
+async def _get_cached_content(url: str, engine: str, entry: CacheEntry) -> Optional[URLContent]:
+    """Get a cached page's content, re-extracting from the raw HTML if needed."""
+    content = await page_cache.get_extracted(entry, engine, EXTRACTOR_VERSION)
+    if content is not None:
+        return content.model_copy(update={'url': url})
+
+    page = await page_cache.get_raw(entry)
+    if page is None:
+        return None
+    return await _extract_url_content(url, page.html, engine, entry)
+
+
+async def _get_fresh_cached_content(url: str, engine: Optional[str] = None) -> Optional[URLContent]:
+    if not settings.PAGE_CACHE_ENABLED:
+        return None
+    engine = engine or settings.HTML_EXTRACTION_ENGINE
+    try:
+        entry = page_cache.lookup(url)
+        if entry is None or not page_cache.is_fresh(entry):
+            return None
+        return await _get_cached_content(url, engine, entry)
+    except Exception as e:
+        logger.warning(f"Page cache lookup failed for {url}: {str(e)}")
+        return None
 
+
+async def _fetch_url_content(url: str, engine: Optional[str] = None) -> URLContent:
+    engine = engine or settings.HTML_EXTRACTION_ENGINE
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(str(url), follow_redirects=True)
+        with fetch_metrics.track():
+            client = await http_client_pool.get_fetch_client()
+
+            # Revalidate stale cache entries with their validators
+            entry = page_cache.lookup(
+                url, record_stats=False) if settings.PAGE_CACHE_ENABLED else None
+            validators = await page_cache.get_validators(entry) if entry is not None else None
+            headers = {}
+            if validators is not None:
+                if validators.etag:
+                    headers['If-None-Match'] = validators.etag
+                if validators.last_modified:
+                    headers['If-Modified-Since'] = validators.last_modified
+
+            response = await client.get(str(url), headers=headers)
+
+            if response.status_code == 304 and validators is not None:
+                logger.debug(f"Page cache revalidated {url}")
+                page_cache.mark_revalidated(entry)
+                content = await _get_cached_content(url, engine, entry)
+                if content is not None:
+                    return content
+                # The cached body is gone, so download the page again
+                response = await client.get(str(url))
+
             response.raise_for_status()
-            
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract title
-        title = soup.title.string if soup.title else "No title found"
-        
-        # Clean up the content
-        # Remove script and style elements
-        for script in soup(["script", "style", "iframe", "noscript"]):
-            script.decompose()
-
-        # Find the main content area (this is a simple heuristic - might need adjustment)
-        main_content = soup.find('main') or soup.find('article') or soup.find('body')
-       
-        # Sanitize the HTML content
-        cleaned_html = bleach.clean(
-            str(main_content),
-            tags=ALLOWED_TAGS,
-            attributes=ALLOWED_ATTRIBUTES,
-            strip=True
-        )            
-        return URLContent   (
-            url=url,
-            title=title,
-            text=cleaned_html,
-            content_type='html'
-        )
-        
+
+            entry = None
+            if settings.PAGE_CACHE_ENABLED and 'no-store' not in response.headers.get('Cache-Control', ''):
+                entry = await page_cache.put_raw(
+                    url,
+                    response.text,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+
+            return await _extract_url_content(url, response.text, engine, entry)
+
     except httpx.RequestError as e:
         raise HTTPException(status_code=400, detail=f"Error fetching URL: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")    
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-async def fetch_urls_content(urls: List[str]) -> List[URLContent]:
+@traced("search.fetch_urls_content")
+async def fetch_urls_content(urls: List[str],
+                             relevance_scores: Optional[Dict[str, float]] = None,
+                             deadline: Optional[float] = None,
+                             engine: Optional[str] = None
+                             ) -> List[URLContent]:
     """
     Fetch and extract content from multiple URLs in parallel.
 
     Args:
         urls (List[str]): List of URLs to fetch content from
+        relevance_scores (Dict[str, float], optional): Relevance score per URL;
+            higher scored URLs are fetched first
+        deadline (float, optional): Seconds allowed for the whole batch. URLs not
+            fetched in time are returned with an error (partial results)
+        engine (str, optional): HTML extraction engine ('lxml' or 'bs4')
 
     Returns:
         List[URLContent]: List of URL contents, with error messages for failed fetches
     """
     try:
-        # Create tasks for all URLs
-        tasks = [fetch_url_content(url) for url in urls]
-
-        # Execute all tasks in parallel
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Serve fresh pages from the cache, then fetch the rest through the
+        # scheduler, which bounds concurrency and spaces out requests to the same domain
+        cached = await asyncio.gather(*[
+            _get_fresh_cached_content(url, engine) for url in urls
+        ])
+        to_fetch = [url for url, content in zip(urls, cached) if content is None]
+        logger.info(
+            f"Fetching {len(to_fetch)} of {len(urls)} URLs ({len(urls) - len(to_fetch)} served from cache)")
+
+        fetched = iter(await fetch_scheduler.run_batch(
+            to_fetch,
+            partial(_fetch_url_content, engine=engine),
+            priorities=relevance_scores,
+            deadline=deadline
+        ))
+        results = [content if content is not None else next(fetched)
+                   for content in cached]
 
         # Process results, converting exceptions to error messages
         processed_results = []
         for url, result in zip(urls, results):
             if isinstance(result, Exception):
+                # Failed fetches were counted as they were raised; URLs that
+                # missed the deadline never finished a fetch, so count them here
+                if not isinstance(result, HTTPException):
+                    fetch_metrics.errors.inc((type(result).__name__,))
                 # If the result is an exception, create an error URLContent
                 processed_results.append(URLContent(
                     url=url,
@@ -0,0 +1,176 @@
+import json
+import logging
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+from services.llm.structured import PartialJSONParser
+
+logger = logging.getLogger(__name__)
+
+STREAM_FORMATS = ("text", "events")
+
+HEADING = re.compile(r"^#{1,6}\s+(.*?)\s*#*$")
+LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(.*)$")
+
+
+def section_key(heading: str) -> str:
+    """Turn a heading such as 'Key Components' into an event type such as 'key_components'."""
+    text = heading.replace("**", "").strip().lower()
+    return re.sub(r"[^a-z0-9]+", "_", text).strip("_")
+
+
+def encode_event(event: Dict[str, Any]) -> str:
+    """Encode an event as one NDJSON line."""
+    return json.dumps(event) + "\n"
+
+
+class MarkdownEventParser:
+    """
+    Turns streamed markdown into events as each line completes.
+
+    Events:
+    - section_started: a heading, with its key
+    - item: a completed list item of the current section
+    - text: any other non-empty line
+    - <section key>: all items of a section once the next section starts or the stream ends
+    - control lines given in `markers` are emitted as events of the mapped type
+    """
+
+    def __init__(self,
+                 default_section: Optional[str] = None,
+                 markers: Optional[Dict[str, str]] = None):
+        self.default_section = default_section
+        self.markers = markers or {}
+        self._buffer = ""
+        self._section = default_section
+        self._items: List[str] = []
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add a chunk of text, returning events for the lines it completes."""
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        events: List[Dict[str, Any]] = []
+        for line in lines:
+            self._line(line, events)
+        return events
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush the final line and section at the end of the stream."""
+        events: List[Dict[str, Any]] = []
+        if self._buffer:
+            self._line(self._buffer, events)
+            self._buffer = ""
+        self._close_section(events)
+        return events
+
+    def _close_section(self, events: List[Dict[str, Any]]) -> None:
+        if self._section is not None and self._items:
+            events.append({"type": self._section, "data": self._items})
+        self._items = []
+
+    def _line(self, line: str, events: List[Dict[str, Any]]) -> None:
+        stripped = line.strip()
+        if not stripped:
+            return
+
+        if stripped in self.markers:
+            # e.g. a restarted analysis; sections start over
+            self._items = []
+            self._section = self.default_section
+            events.append({"type": self.markers[stripped]})
+            return
+
+        heading = HEADING.match(stripped)
+        if heading:
+            self._close_section(events)
+            self._section = section_key(heading.group(1))
+            events.append({
+                "type": "section_started", "section": self._section, "data": heading.group(1)})
+            return
+
+        item = LIST_ITEM.match(line)
+        if item:
+            self._items.append(item.group(1).strip())
+            events.append({"type": "item", "section": self._section, "data": item.group(1).strip()})
+            return
+
+        events.append({"type": "text", "section": self._section, "data": stripped})
+
+
+class JSONEventParser:
+    """
+    Turns a streamed JSON object into events as its fields complete.
+
+    Events:
+    - item: a completed element of an array field, with the field name
+    - <field>: a top-level field's value, once the field is complete
+
+    Each field and element is parsed once, when it completes, so a long
+    response costs time linear in its length.
+    """
+
+    def __init__(self):
+        self._parser = PartialJSONParser()
+        self._emitted_fields = set()
+        self._emitted_items: Dict[str, int] = {}
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add a chunk of text, returning events for the fields and items it completes."""
+        self._parser.feed(chunk)
+        return self._events()
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Emit anything still pending at the end of the stream."""
+        events = self._events()
+        # Fields left open by a truncated response, or not valid JSON on their own
+        try:
+            value = self._parser.value()
+        except ValueError:
+            return events
+        if not isinstance(value, dict):
+            return events
+        for field, data in value.items():
+            if field in self._emitted_fields:
+                continue
+            if isinstance(data, list):
+                for item in data[self._emitted_items.get(field, 0):]:
+                    events.append({"type": "item", "field": field, "data": item})
+            self._emitted_fields.add(field)
+            events.append({"type": field, "data": data})
+        return events
+
+    def _events(self) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        for path, data in self._parser.take_members():
+            field = path[0]
+            # Only members of a top-level object are events
+            if not isinstance(field, str) or field in self._emitted_fields:
+                continue
+            if len(path) == 2:
+                if isinstance(path[1], int):
+                    events.append({"type": "item", "field": field, "data": data})
+                    self._emitted_items[field] = path[1] + 1
+                continue
+            self._emitted_fields.add(field)
+            events.append({"type": field, "data": data})
+        return events
+
+
+async def stream_events(chunks: AsyncIterator[str], parser) -> AsyncIterator[str]:
+    """
+    Parse a text stream incrementally and yield its events as NDJSON.
+
+    Args:
+        chunks: Raw text chunks, e.g. from create_chat_completion_stream
+        parser: A MarkdownEventParser or JSONEventParser
+
+    Yields:
+        str: One JSON event per line
+    """
+    async for chunk in chunks:
+        for event in parser.feed(chunk):
+            yield encode_event(event)
+    for event in parser.finish():
+        yield encode_event(event)
+
+
+__all__ = ['MarkdownEventParser', 'JSONEventParser', 'stream_events', 'STREAM_FORMATS']
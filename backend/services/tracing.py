@@ -0,0 +1,395 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTERS = ("none", "jsonl", "otlp")
+
+# Incoming correlation ids are echoed back in headers and written to traces
+CORRELATION_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None)
+_correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "correlation_id", default=None)
+
+
+def current_span() -> Optional["Span"]:
+    """The innermost open span of the current request, if tracing is enabled."""
+    return _current_span.get()
+
+
+def correlation_id() -> Optional[str]:
+    """The correlation id of the current request."""
+    return _correlation_id.get()
+
+
+def set_correlation_id(value: Optional[str]) -> contextvars.Token:
+    """Set the correlation id from a request header, or generate one if it is missing or invalid."""
+    if not value or not CORRELATION_ID.match(value):
+        value = uuid.uuid4().hex
+    return _correlation_id.set(value)
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "correlation_id",
+                 "kind", "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"],
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+                 start_ns: Optional[int] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.correlation_id = parent.correlation_id if parent else _correlation_id.get()
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+        self._token: Optional[contextvars.Token] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        """End the span and hand it to the exporter; later calls are ignored."""
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            self.tracer._export(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.record_error(exc)
+        _current_span.reset(self._token)
+        self.end()
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "correlation_id": self.correlation_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Shared stand-in for spans when tracing is disabled"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+    async def __aenter__(self) -> "_NoopSpan":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class JSONLinesExporter:
+    """Writes one JSON object per span"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def format(self, spans: List[Span]) -> List[str]:
+        return [json.dumps(span.to_dict(), default=str) for span in spans]
+
+
+class OTLPJSONExporter:
+    """
+    Writes batches of spans as OTLP/JSON ExportTraceServiceRequest lines,
+    readable by the OpenTelemetry Collector's otlpjsonfile receiver.
+    """
+
+    def __init__(self, path: str, service_name: str = settings.APP_NAME):
+        self.path = path
+        self.service_name = service_name
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        attributes = dict(span.attributes)
+        if span.correlation_id:
+            attributes["correlation_id"] = span.correlation_id
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_SERVER for requests, SPAN_KIND_INTERNAL otherwise
+            "kind": 2 if span.kind == "server" else 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": _otlp_attributes(attributes),
+            # STATUS_CODE_ERROR or STATUS_CODE_UNSET
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return otlp_span
+
+    def format(self, spans: List[Span]) -> List[str]:
+        return [json.dumps({"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [self._span(span) for span in spans],
+            }],
+        }]}, default=str)]
+
+
+class Tracer:
+    """
+    Records nested spans for requests and the research pipeline.
+
+    The current span is held in a context variable, so spans started in
+    tasks and async generators nest under the span that was current when
+    they were created. Finished spans are queued and written by a background
+    thread; when the queue is full they are dropped rather than blocking.
+
+    With the 'none' exporter spans are never created: span() returns a shared
+    no-op object and @traced functions are called directly.
+    """
+
+    def __init__(self,
+                 exporter: str = settings.TRACING_EXPORTER,
+                 path: str = settings.TRACING_FILE,
+                 queue_size: int = settings.TRACING_QUEUE_SIZE,
+                 batch_size: int = settings.TRACING_BATCH_SIZE):
+        if exporter not in TRACING_EXPORTERS:
+            raise ValueError(f"Unsupported tracing exporter: {exporter}")
+        self.enabled = exporter != "none"
+        self.exporter = (OTLPJSONExporter(path) if exporter == "otlp"
+                         else JSONLinesExporter(path) if exporter == "jsonl" else None)
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Statistics
+        self._exported = 0
+        self._dropped = 0
+
+    def span(self, name: str, kind: str = "internal", **attributes: Any):
+        """Start a span as a child of the current one; use as a (async) context manager."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), kind, attributes)
+
+    def record_span(self, name: str, start_time: float, **attributes: Any) -> None:
+        """Record an operation that has already finished, given its start time.time()."""
+        if self.enabled:
+            Span(self, name, _current_span.get(), attributes=attributes,
+                 start_ns=int(start_time * 1e9)).end()
+
+    def _export(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self._dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                directory = os.path.dirname(self.exporter.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._thread = threading.Thread(
+                    target=self._write_spans, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _write_spans(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [span for span in batch if span is not None]
+            if not batch:
+                continue
+            try:
+                with open(self.exporter.path, "a", encoding="utf-8") as f:
+                    for line in self.exporter.format(batch):
+                        f.write(line + "\n")
+                self._exported += len(batch)
+            except Exception as e:
+                self._dropped += len(batch)
+                logger.warning(f"Could not export {len(batch)} spans: {str(e)}")
+
+    def flush(self) -> None:
+        """Write all queued spans and stop the exporter thread; it restarts on the next span."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get tracing statistics.
+
+        Returns:
+            Dict[str, float]: Whether tracing is enabled, and spans queued, exported and dropped
+        """
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "exported": self._exported,
+            "dropped": self._dropped,
+        }
+
+
+async def _traced_coroutine(span: Span, func: Callable, args, kwargs):
+    with span:
+        return await func(*args, **kwargs)
+
+
+async def _traced_generator(span: Span, generator: AsyncIterator) -> AsyncIterator:
+    # The span is only current while the generator runs, never in the
+    # consumer between items, since generators share the consumer's context
+    try:
+        while True:
+            token = _current_span.set(span)
+            try:
+                item = await generator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                _current_span.reset(token)
+            yield item
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            span.record_error(e)
+        raise
+    finally:
+        await generator.aclose()
+        span.end()
+
+
+def traced(name: str):
+    """
+    Trace each call of an async function or async generator as a span.
+
+    When tracing is disabled the function is called directly.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return func(*args, **kwargs)
+                span = Span(tracer, name, _current_span.get())
+                return _traced_generator(span, func(*args, **kwargs))
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def coroutine_wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            return _traced_coroutine(Span(tracer, name, _current_span.get()), func, args, kwargs)
+        return coroutine_wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def use_span(span):
+    """Make a span current without ending it on exit, e.g. for a request whose body is still streaming."""
+    if span is NOOP_SPAN:
+        yield span
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+async def trace_body(span, body: AsyncIterator) -> AsyncIterator:
+    """Keep a request span open until its streamed response body is finished."""
+    try:
+        async for chunk in body:
+            yield chunk
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            span.record_error(e)
+        raise
+    finally:
+        span.end()
+
+
+# Create a singleton instance
+tracer = Tracer()
+
+__all__ = ['tracer', 'traced', 'use_span', 'trace_body', 'current_span', 'correlation_id',
+           'set_correlation_id']
@@ -0,0 +1,168 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from config.settings import settings
+from models import User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """The authenticated user as seen by request handlers"""
+    user_id: int
+    email: str
+    username: Optional[str] = None
+
+
+class UserCache:
+    """
+    In-process cache of authenticated users keyed by JWT subject.
+
+    Entries live until the earlier of the token's expiry and `ttl`, so a
+    cached principal never outlives the token that loaded it. Unknown
+    subjects are cached for `negative_ttl` to absorb repeated requests with
+    tokens for deleted users. Committed writes to User rows invalidate
+    their entries through SQLAlchemy session events.
+    """
+
+    def __init__(self,
+                 ttl: float = settings.USER_CACHE_TTL,
+                 negative_ttl: float = settings.USER_CACHE_NEGATIVE_TTL,
+                 max_entries: int = settings.USER_CACHE_MAX_ENTRIES,
+                 enabled: bool = settings.USER_CACHE_ENABLED):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        # subject -> (principal or None for an unknown user, expiry time)
+        self._entries: "OrderedDict[str, Tuple[Optional[UserPrincipal], float]]" = OrderedDict()
+        # Bumped on invalidation so loads that started earlier don't store stale results
+        self._generation = 0
+
+        # Statistics
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Take before loading a user from the database and pass to set()."""
+        return self._generation
+
+    def get(self, subject: str) -> Tuple[bool, Optional[UserPrincipal]]:
+        """
+        Look up a subject.
+
+        Returns:
+            Tuple[bool, Optional[UserPrincipal]]: Whether the subject was cached, and its
+            principal (None if the user is known not to exist)
+        """
+        entry = self._entries.get(subject) if self.enabled else None
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[subject]
+            self._misses += 1
+            return False, None
+        self._entries.move_to_end(subject)
+        if entry[0] is None:
+            self._negative_hits += 1
+        else:
+            self._hits += 1
+        return True, entry[0]
+
+    def set(self,
+            subject: str,
+            principal: Optional[UserPrincipal],
+            token_expires_at: Optional[float],
+            generation: int) -> None:
+        """
+        Cache a loaded principal, or None for an unknown user.
+
+        Args:
+            subject: JWT subject
+            principal: The user, or None if no user exists for the subject
+            token_expires_at: The token's exp claim, bounding the entry's lifetime
+            generation: The generation read before loading
+        """
+        if not self.enabled or generation != self._generation:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if principal is not None else self.negative_ttl)
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        if expires_at <= now:
+            return
+        self._entries[subject] = (principal, expires_at)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str) -> None:
+        """Drop a subject's entry, e.g. after the user changed or was created."""
+        self._generation += 1
+        self._invalidations += 1
+        if self._entries.pop(subject, None) is not None:
+            logger.debug(f"Invalidated cached user {subject}")
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict[str, float]: Hits, negative hits, misses, hit ratio, invalidations and entry count
+        """
+        lookups = self._hits + self._negative_hits + self._misses
+        return {
+            "hits": self._hits,
+            "negative_hits": self._negative_hits,
+            "misses": self._misses,
+            "hit_ratio": (self._hits + self._negative_hits) / lookups if lookups else 0.0,
+            "invalidations": self._invalidations,
+            "entries": len(self._entries),
+        }
+
+
+# Create a singleton instance
+user_cache = UserCache()
+
+
+# Emails of users written in a session's transaction, invalidated once it commits
+_PENDING_KEY = "user_cache_invalidations"
+
+
+def _collect_user_writes(session: Session, flush_context) -> None:
+    # Session state and attribute history still show the flushed changes here
+    for target in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(target, User):
+            # Includes the previous email if it changed
+            emails = {target.email, *inspect(target).attrs.email.history.deleted}
+            session.info.setdefault(_PENDING_KEY, set()).update(email for email in emails if email)
+
+
+def _invalidate_committed_users(session: Session) -> None:
+    # Invalidating at flush would let a concurrent request cache the old row
+    # again before the transaction commits
+    for email in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate(email)
+
+
+def _discard_user_writes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+event.listen(Session, "after_flush", _collect_user_writes)
+event.listen(Session, "after_commit", _invalidate_committed_users)
+event.listen(Session, "after_rollback", _discard_user_writes)
+
+__all__ = ['user_cache', 'UserPrincipal']
@@ -1,11 +1,14 @@
-from database import engine
+import asyncio
+from database import async_engine
 
-def test_connection():
+async def test_connection():
     try:
-        with engine.connect() as connection:
+        async with async_engine.connect() as connection:
             print("Successfully connected to database!")
     except Exception as e:
         print(f"Error connecting to database: {e}")
+    finally:
+        await async_engine.dispose()
 
 if __name__ == "__main__":
-    test_connection() 
\ No newline at end of file
+    asyncio.run(test_connection()) 
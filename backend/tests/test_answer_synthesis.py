@@ -0,0 +1,142 @@
+import asyncio
+import json
+import pytest
+from schemas import ResearchAnswer, URLContent
+from services.ai_service import ai_service
+from services.answer_synthesis import AnswerSynthesizer, split_source_chunks
+
+ANSWER_JSON = json.dumps({
+    "answer": "## Answer", "sources_used": ["https://example.com/0"], "confidence_score": 80
+})
+
+
+def _sources(count: int, paragraphs: int = 3):
+    return [
+        URLContent(url=f"https://example.com/{n}", title=f"Page {n}", content_type='html',
+                   text="".join(f"<p>Fact {i} about source {n}.</p>" for i in range(paragraphs)))
+        for n in range(count)
+    ]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Fake map and reduce calls that record concurrency and reduce input"""
+    state = {"active": 0, "peak": 0, "reduce_input": None, "failing": set()}
+
+    async def extract_source_notes(question, url, title, source_text, model=None):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        if url in state["failing"]:
+            raise RuntimeError("overloaded")
+        if url.endswith("/1"):
+            return ""
+        return f"- note from {url}"
+
+    async def generate_answer_from_sources_stream(question, formatted_sources, model=None):
+        state["reduce_input"] = formatted_sources
+        for i in range(0, len(ANSWER_JSON), 20):
+            yield ANSWER_JSON[i:i + 20]
+
+    async def generate_answer_from_sources(question, formatted_sources, model=None, context_stats=None):
+        state["reduce_input"] = formatted_sources
+        return ai_service.parse_research_answer(ANSWER_JSON, context_stats)
+
+    monkeypatch.setattr(ai_service, "extract_source_notes", extract_source_notes)
+    monkeypatch.setattr(ai_service, "generate_answer_from_sources_stream",
+                        generate_answer_from_sources_stream)
+    monkeypatch.setattr(ai_service, "generate_answer_from_sources", generate_answer_from_sources)
+    monkeypatch.setattr(ai_service.provider, "get_default_model", lambda: "fake-model")
+    return state
+
+
+def test_large_sources_are_split_into_chunks():
+    sources = _sources(2, paragraphs=200)
+    sources.append(URLContent(url="https://example.com/x", title="x", text="", error="timeout"))
+    chunks = split_source_chunks(sources, chunk_tokens=300)
+    assert {c.url for c in chunks} == {"https://example.com/0", "https://example.com/1"}
+    first = [c for c in chunks if c.url.endswith("/0")]
+    assert len(first) > 1
+    assert [c.index for c in first] == list(range(len(first)))
+    assert all(c.count == len(first) for c in first)
+
+
+def test_auto_mode_switches_on_source_count():
+    synthesizer = AnswerSynthesizer(map_concurrency=2, chunk_tokens=1000, map_reduce_min_sources=3)
+    assert synthesizer.resolve_mode("auto", _sources(2)) == "single"
+    assert synthesizer.resolve_mode("auto", _sources(3)) == "map_reduce"
+    assert synthesizer.resolve_mode(None, _sources(5)) == "single"
+    with pytest.raises(ValueError):
+        synthesizer.resolve_mode("tree", _sources(1))
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_stream_emits_map_results_then_answer(fake_llm):
+    synthesizer = AnswerSynthesizer(map_concurrency=2, chunk_tokens=1000, map_reduce_min_sources=3)
+    events = [json.loads(line) async for line in
+              synthesizer.answer_stream("What facts?", _sources(6), mode="map_reduce")]
+    types = [e["type"] for e in events]
+
+    assert types[0] == "map_started"
+    assert events[0]["data"] == {"sources": 6, "chunks": 6}
+    assert types.count("map_result") == 6
+    assert types.index("answer_delta") > max(i for i, t in enumerate(types) if t == "map_result")
+    assert types[-1] == "answer"
+    assert events[-1]["data"]["answer"] == "## Answer"
+    assert events[-1]["data"]["context_stats"]["sources"] == 5
+
+    # Map calls respect the concurrency limit; sources without notes are left out of the reduce
+    assert fake_llm["peak"] == 2
+    assert "note from https://example.com/0" in fake_llm["reduce_input"]
+    assert "https://example.com/1" not in fake_llm["reduce_input"]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_answer(fake_llm):
+    synthesizer = AnswerSynthesizer(map_concurrency=3, chunk_tokens=1000, map_reduce_min_sources=3)
+    answer = await synthesizer.answer("What facts?", _sources(4), mode="map_reduce")
+    assert isinstance(answer, ResearchAnswer)
+    assert answer.confidence_score == 80
+    assert fake_llm["reduce_input"].count("Source (") == 3
+
+
+@pytest.mark.asyncio
+async def test_map_errors_leave_failed_sources_out_of_the_answer(fake_llm):
+    fake_llm["failing"] = {"https://example.com/2"}
+    synthesizer = AnswerSynthesizer(map_concurrency=2, chunk_tokens=1000, map_reduce_min_sources=3)
+    events = [json.loads(line) async for line in
+              synthesizer.answer_stream("What facts?", _sources(4), mode="map_reduce")]
+    types = [e["type"] for e in events]
+
+    errors = [e["data"] for e in events if e["type"] == "map_error"]
+    assert errors == [{"url": "https://example.com/2", "chunk": 0, "error": "overloaded"}]
+    assert types.count("map_result") == 3
+    assert types[-1] == "answer"
+    assert "note from https://example.com/0" in fake_llm["reduce_input"]
+    assert "https://example.com/2" not in fake_llm["reduce_input"]
+
+
+@pytest.mark.asyncio
+async def test_stream_without_notes_ends_in_error(fake_llm):
+    fake_llm["failing"] = {source.url for source in _sources(3)}
+    synthesizer = AnswerSynthesizer(map_concurrency=2, chunk_tokens=1000, map_reduce_min_sources=3)
+    events = [json.loads(line) async for line in
+              synthesizer.answer_stream("What facts?", _sources(3), mode="map_reduce")]
+    types = [e["type"] for e in events]
+
+    assert types.count("map_error") == 3
+    assert types[-1] == "error"
+    assert "answer" not in types and "answer_delta" not in types
+    assert fake_llm["reduce_input"] is None
+
+
+@pytest.mark.asyncio
+async def test_answer_without_notes_is_an_error(fake_llm):
+    fake_llm["failing"] = {source.url for source in _sources(3)}
+    synthesizer = AnswerSynthesizer(map_concurrency=2, chunk_tokens=1000, map_reduce_min_sources=3)
+    answer = await synthesizer.answer("What facts?", _sources(3), mode="map_reduce")
+
+    assert answer.confidence_score == 0.0
+    assert answer.sources_used == []
+    assert fake_llm["reduce_input"] is None
@@ -0,0 +1,60 @@
+import pytest
+import httpx
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from database import get_async_db
+from models import Base
+from schemas import UserCreate
+from services import auth_service
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def test_register_login_and_validate_token(session_factory):
+    async with session_factory() as db:
+        user = await auth_service.create_user(
+            db, UserCreate(email="ada@example.com", password="secret123"))
+        assert user.user_id is not None
+
+        with pytest.raises(HTTPException):
+            await auth_service.create_user(
+                db, UserCreate(email="ada@example.com", password="other123"))
+
+        token = await auth_service.login_user(db, "ada@example.com", "secret123")
+        assert token.username == "ada"
+
+        with pytest.raises(HTTPException) as error:
+            await auth_service.login_user(db, "ada@example.com", "wrong")
+        assert error.value.status_code == 401
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token.access_token)
+    validated = await auth_service.validate_token(credentials, session_factory)
+    assert validated.email == "ada@example.com"
+    assert validated.username == "ada"
+
+
+async def test_health_uses_async_session(session_factory):
+    from main import app
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/health")
+    finally:
+        app.dependency_overrides.pop(get_async_db)
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "healthy", "database": "connected"}
@@ -1,31 +1,25 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from ..database import Base, get_db
-from ..main import app
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from database import Base, get_session_factory
+from main import app
 
 # Test database URL (using SQLite for testing)
-TEST_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(TEST_DATABASE_URL)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+async_engine = create_async_engine(TEST_DATABASE_URL)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 
-# Override the get_db dependency
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
+# Every session, including those opened by validate_token, comes from this factory
+app.dependency_overrides[get_session_factory] = lambda: TestingAsyncSessionLocal
 client = TestClient(app)
 
 @pytest.fixture(autouse=True)
-def setup_database():
-    Base.metadata.create_all(bind=engine)
+async def setup_database():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
     yield
-    Base.metadata.drop_all(bind=engine)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
 
 def test_register():
     response = client.post(
@@ -39,6 +33,7 @@ def test_register():
     data = response.json()
     assert "user_id" in data
     assert data["email"] == "test@example.com"
+    assert "password" not in data
 
 def test_login():
     # Register first
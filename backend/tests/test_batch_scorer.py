@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from schemas import SearchResult
+from services.ai_service import ai_service
+from services.batch_scorer import BatchScorer
+
+
+def _results(prefix: str, count: int):
+    return [
+        SearchResult(title=f"{prefix}{i}", link=f"https://{prefix}.example.com/{i}",
+                     snippet="s", displayLink=f"{prefix}.example.com", pagemap={})
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def scoring_calls(monkeypatch):
+    """Replace the LLM scoring calls with deterministic fakes that record each request"""
+    calls = []
+
+    async def score_results(query, results, model=None):
+        calls.append([query])
+        return [{'url': r['url'], 'score': float(len(r['url']))} for r in results]
+
+    async def score_results_batch(groups, model=None):
+        calls.append([query for query, _ in groups])
+        return [[{'url': r['url'], 'score': float(len(r['url']) + i)} for r in results]
+                for i, (_, results) in enumerate(groups)]
+
+    monkeypatch.setattr(ai_service, "score_results", score_results)
+    monkeypatch.setattr(ai_service, "score_results_batch", score_results_batch)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_requests_within_window_share_one_batch(scoring_calls):
+    scorer = BatchScorer(window=0.05, max_batch_results=100)
+    first, second, third = await asyncio.gather(
+        scorer.score("a", _results("a", 3)),
+        scorer.score("b", _results("b", 2)),
+        scorer.score("c", _results("c", 1)),
+    )
+
+    assert scoring_calls == [["a", "b", "c"]]
+    assert [r.link for r in first] == sorted(
+        (r.link for r in first), key=len, reverse=True)
+    assert all(r.relevance_score > 0 for r in first + second + third)
+    assert len(second) == 2 and len(third) == 1
+
+    stats = scorer.stats()
+    assert stats["batches"] == 1
+    assert stats["max_batch_requests"] == 3
+    assert stats["results"] == 6
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_without_waiting_for_the_window(scoring_calls):
+    """Reaching max_batch_results flushes immediately instead of after the window"""
+    scorer = BatchScorer(window=10, max_batch_results=4)
+    results = await asyncio.wait_for(asyncio.gather(
+        scorer.score("a", _results("a", 2)),
+        scorer.score("b", _results("b", 2)),
+    ), timeout=1)
+
+    assert scoring_calls == [["a", "b"]]
+    assert all(len(r) == 2 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_single_request_uses_single_query_scoring(scoring_calls):
+    scorer = BatchScorer(window=0.01, max_batch_results=100)
+    scored = await scorer.score("a", _results("a", 2))
+    later = await scorer.score("b", _results("b", 1))
+
+    assert scoring_calls == [["a"], ["b"]]
+    assert len(scored) == 2 and len(later) == 1
+    assert await scorer.score("c", []) == []
+
+
+@pytest.mark.asyncio
+async def test_shutdown_cancels_batches_in_flight(monkeypatch):
+    started = asyncio.Event()
+
+    async def score_results(query, results, model=None):
+        started.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(ai_service, "score_results", score_results)
+    scorer = BatchScorer(window=0.01, max_batch_results=100)
+    scoring = asyncio.create_task(scorer.score("a", _results("a", 2)))
+    await started.wait()
+    waiting = asyncio.create_task(scorer.score("b", _results("b", 2)))
+    await asyncio.sleep(0)
+    assert len(scorer._tasks) == 1
+
+    await scorer.shutdown()
+
+    for task in (scoring, waiting):
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert not scorer._tasks
@@ -0,0 +1,56 @@
+from schemas import URLContent
+from services.context_packer import (
+    ContextPacker, estimate_tokens, html_to_text, split_passages
+)
+
+
+def _source(n: int, html: str, error: str = "") -> URLContent:
+    return URLContent(url=f"https://example.com/{n}", title=f"Page {n}", text=html,
+                      content_type='html', error=error)
+
+
+def test_html_to_text_keeps_blocks_and_drops_markup():
+    html = '<div><h1>Title</h1><p>First   <b>bold</b>\n text.</p><ul><li>one</li><li>two</li></ul></div>'
+    assert html_to_text(html) == "Title\nFirst bold text.\none\ntwo"
+    assert html_to_text("None") == ""
+    assert html_to_text("plain text only") == "plain text only"
+
+
+def test_split_passages_respects_target_size():
+    text = "\n".join(f"Short line number {i}." for i in range(40))
+    long_line = " ".join(f"Sentence {i} is here." for i in range(100))
+    passages = split_passages(text + "\n" + long_line, target_tokens=50)
+    assert len(passages) > 5
+    assert all(estimate_tokens(p) <= 60 for p in passages)
+    assert "Short line number 0." in passages[0]
+
+
+def test_pack_fills_budget_with_relevant_passages():
+    relevant = "".join(
+        f"<p>Solar panels convert sunlight into electricity, fact {i}.</p>" for i in range(20))
+    filler = "".join(f"<p>Recipes for banana bread and muffins, variant {i}.</p>" for i in range(20))
+    sources = [
+        _source(1, relevant + filler),
+        _source(2, filler),
+        _source(3, "<p>unreachable</p>", error="timeout"),
+    ]
+
+    packer = ContextPacker(passage_tokens=20)
+    text, stats = packer.pack("How do solar panels make electricity?", sources, budget=150)
+
+    assert stats.sources == 2
+    assert stats.tokens_used <= 150
+    assert stats.tokens_dropped == stats.tokens_total - stats.tokens_used > 0
+    assert "Solar panels" in text
+    assert "unreachable" not in text
+    # Every source keeps its best passage even if it ranks poorly
+    assert stats.sources_used == 2
+    assert "Source (https://example.com/2):" in text
+    assert text.count("banana") < text.count("Solar")
+
+
+def test_pack_within_budget_keeps_everything():
+    sources = [_source(1, "<p>alpha</p><p>beta</p>")]
+    text, stats = ContextPacker(passage_tokens=200).pack("alpha", sources, budget=1000)
+    assert text == "Source (https://example.com/1):\nTitle: Page 1\nalpha\nbeta"
+    assert stats.tokens_dropped == 0
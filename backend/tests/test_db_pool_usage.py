@@ -0,0 +1,67 @@
+import asyncio
+import httpx
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from database import get_session_factory
+from models import Base
+from schemas import UserCreate
+from services import auth_service, research_service
+from services.user_cache import user_cache
+
+STREAMS = 20
+
+
+async def test_concurrent_streams_hold_no_pooled_connections(tmp_path, monkeypatch):
+    from main import app
+
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=AsyncAdaptedQueuePool, pool_size=2, max_overflow=0)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    app.dependency_overrides[get_session_factory] = lambda: factory
+    user_cache.clear()
+
+    async with factory() as db:
+        await auth_service.create_user(db, UserCreate(email="ada@example.com", password="secret123"))
+        token = await auth_service.login_user(db, "ada@example.com", "secret123")
+
+    started = 0
+    all_started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def execute_queries_stream(queries, scoring_mode=None):
+        nonlocal started
+        started += 1
+        if started == STREAMS:
+            all_started.set()
+        yield '{"status": "started"}\n'
+        await release.wait()
+        yield '{"status": "complete"}\n'
+
+    monkeypatch.setattr(research_service, "execute_queries_stream", execute_queries_stream)
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            requests = [
+                asyncio.create_task(client.post(
+                    "/api/research/execute-queries/stream",
+                    json={"queries": [f"query {i}"]},
+                    headers={"Authorization": f"Bearer {token.access_token}"}))
+                for i in range(STREAMS)
+            ]
+            await asyncio.wait_for(all_started.wait(), timeout=10)
+
+            # More streams are open than the pool has connections, and none hold one
+            assert engine.pool.checkedout() == 0
+
+            release.set()
+            responses = await asyncio.gather(*requests)
+    finally:
+        app.dependency_overrides.pop(get_session_factory)
+        user_cache.clear()
+        await engine.dispose()
+
+    assert all(response.status_code == 200 for response in responses)
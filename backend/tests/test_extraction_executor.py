@@ -0,0 +1,41 @@
+import pytest
+from services.extraction_executor import ExtractionExecutor
+
+HTML = "<html><head><title>Page</title></head><body><main><p>Hello</p></main></body></html>"
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ExtractionExecutor(mode="fibers")
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread"])
+async def test_extract_records_stats(mode):
+    executor = ExtractionExecutor(mode=mode, max_workers=2)
+    await executor.startup()
+    try:
+        title, content = await executor.extract(HTML, engine="lxml")
+        with pytest.raises(ValueError):
+            await executor.extract(HTML, engine="unknown")
+    finally:
+        await executor.shutdown()
+
+    assert title == "Page" and "Hello" in content
+    stats = executor.stats()
+    assert stats["completed"] == 1 and stats["failed"] == 1 and stats["queue_depth"] == 0
+
+
+async def test_process_workers_do_not_import_the_application():
+    executor = ExtractionExecutor(mode="process", max_workers=1)
+    await executor.startup()
+    try:
+        title, _ = await executor.extract(HTML, engine="lxml")
+        # Ask the warmed-up worker which modules it has loaded
+        modules = executor._get_executor().submit(
+            eval, "sorted(__import__('sys').modules)").result(timeout=30)
+    finally:
+        await executor.shutdown()
+
+    assert title == "Page"
+    assert "html_extraction" in modules
+    assert not [name for name in modules if name.split(".")[0] in ("services", "config", "main")]
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from services.fetch_scheduler import FetchScheduler, FetchDeadlineExceeded
+
+
+@pytest.mark.asyncio
+async def test_run_batch_respects_global_concurrency():
+    """No more than max_concurrency fetches run at once"""
+    scheduler = FetchScheduler(max_concurrency=2, per_domain_rate=1000,
+                               per_domain_burst=1000, batch_deadline=5)
+    in_flight = 0
+    peak = 0
+
+    async def fetch(url):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return url
+
+    urls = [f"https://site{i}.example.com/" for i in range(8)]
+    results = await scheduler.run_batch(urls, fetch)
+
+    assert results == urls
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_run_batch_fetches_highest_priority_first():
+    """URLs are started in descending priority order"""
+    scheduler = FetchScheduler(max_concurrency=1, per_domain_rate=1000,
+                               per_domain_burst=1000, batch_deadline=5)
+    started = []
+
+    async def fetch(url):
+        started.append(url)
+        return url
+
+    urls = ["https://a.com/low", "https://b.com/high", "https://c.com/mid"]
+    scores = {"https://a.com/low": 10.0,
+              "https://b.com/high": 90.0, "https://c.com/mid": 50.0}
+    results = await scheduler.run_batch(urls, fetch, priorities=scores)
+
+    # Results keep the request order, fetches follow the priority order
+    assert results == urls
+    assert started == ["https://b.com/high", "https://c.com/mid", "https://a.com/low"]
+
+
+@pytest.mark.asyncio
+async def test_run_batch_returns_partial_results_at_deadline():
+    """Slow fetches are reported as deadline errors while fast ones are kept"""
+    scheduler = FetchScheduler(max_concurrency=4, per_domain_rate=1000,
+                               per_domain_burst=1000, batch_deadline=5)
+
+    async def fetch(url):
+        if "slow" in url:
+            await asyncio.sleep(1)
+        return url
+
+    urls = ["https://fast.com/", "https://slow.com/"]
+    results = await scheduler.run_batch(urls, fetch, deadline=0.1)
+
+    assert results[0] == "https://fast.com/"
+    assert isinstance(results[1], FetchDeadlineExceeded)
+
+
+@pytest.mark.asyncio
+async def test_per_domain_rate_limit_spaces_requests():
+    """Requests to one domain beyond the burst wait for new tokens"""
+    scheduler = FetchScheduler(max_concurrency=10, per_domain_rate=20,
+                               per_domain_burst=1, batch_deadline=5)
+    loop = asyncio.get_running_loop()
+    times = []
+
+    async def fetch(url):
+        times.append(loop.time())
+        return url
+
+    urls = [f"https://same.com/{i}" for i in range(3)]
+    await scheduler.run_batch(urls, fetch)
+
+    # Two extra requests at 20/s need roughly 0.1s in total
+    assert times[-1] - times[0] >= 0.08
+
+
+@pytest.mark.asyncio
+async def test_run_batch_returns_exceptions_per_url():
+    """A failing fetch does not affect the others"""
+    scheduler = FetchScheduler(max_concurrency=4, per_domain_rate=1000,
+                               per_domain_burst=1000, batch_deadline=5)
+
+    async def fetch(url):
+        if "bad" in url:
+            raise ValueError("boom")
+        return url
+
+    results = await scheduler.run_batch(["https://ok.com/", "https://bad.com/"], fetch)
+
+    assert results[0] == "https://ok.com/"
+    assert isinstance(results[1], ValueError)
@@ -0,0 +1,69 @@
+import pytest
+from pathlib import Path
+from schemas import URLContent
+from html_extraction import extract_html_content, get_engine
+
+CORPUS_DIR = Path(__file__).parent / "html_corpus"
+CORPUS = sorted(CORPUS_DIR.glob("*.html"))
+
+
+def _to_url_content(path: Path, engine: str) -> URLContent:
+    title, cleaned_html, _ = extract_html_content(
+        path.read_text(encoding="utf-8"), engine)
+    return URLContent(
+        url=f"https://example.com/{path.name}",
+        title=title,
+        text=cleaned_html,
+        content_type='html'
+    )
+
+
+@pytest.mark.parametrize("path", CORPUS, ids=[p.stem for p in CORPUS])
+def test_lxml_engine_matches_beautifulsoup(path):
+    """The lxml fast path produces the same URLContent as the BeautifulSoup path"""
+    assert _to_url_content(path, "lxml") == _to_url_content(path, "bs4")
+
+
+# Malformed pages lxml repairs differently from html.parser (see LxmlEngine)
+DIVERGENT = {
+    "unclosed_block": (
+        "<html><head><title>T</title></head><body><main><div>three</main><p>after",
+        '<div>three<p>after</p></div>', '<div>three</div>'),
+    "no_body": (
+        "<title>T</title><p>para</p>",
+        '<p>para</p>', 'None'),
+    "duplicate_attributes": (
+        '<html><head><title>T</title></head><body><main><a href="x" href="y">l</a></main></body></html>',
+        '<a href="x">l</a>', '<a href="y">l</a>'),
+}
+
+
+@pytest.mark.parametrize("html, lxml_html, bs4_html", DIVERGENT.values(), ids=DIVERGENT.keys())
+def test_known_differences_on_malformed_input(html, lxml_html, bs4_html):
+    assert extract_html_content(html, "lxml")[:2] == ("T", lxml_html)
+    assert extract_html_content(html, "bs4")[:2] == ("T", bs4_html)
+
+
+def test_scripts_styles_and_frames_are_removed():
+    """Removed elements and their contents never reach the output"""
+    html = (CORPUS_DIR / "nested_removed_elements.html").read_text(encoding="utf-8")
+    for engine in ("lxml", "bs4"):
+        title, cleaned_html, _ = extract_html_content(html, engine)
+        assert title == "Nested removal"
+        assert "injected" not in cleaned_html
+        assert "Enable JavaScript" not in cleaned_html
+        assert "color: black" not in cleaned_html
+        assert "<h1>Real article</h1>" in cleaned_html
+
+
+def test_lxml_engine_falls_back_for_unparseable_input():
+    """Documents lxml rejects are handled by the BeautifulSoup engine"""
+    html = '<?xml version="1.0" encoding="utf-8"?><html><title>x</title><body><p>a</p></body></html>'
+    title, cleaned_html, _ = extract_html_content(html, "lxml")
+    assert title == "x"
+    assert cleaned_html == "<p>a</p>"
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        get_engine("html5lib")
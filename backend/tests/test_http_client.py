@@ -0,0 +1,116 @@
+import asyncio
+import sys
+import aiohttp
+import httpx
+import pytest
+from config.settings import settings
+from services import http_client, search_service
+from services.http_client import HTTPClientPool
+
+
+class FakeSearchResponse:
+    """Stands in for the Custom Search API's response"""
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return {"items": [{"title": "Result", "link": "https://example.com/"}]}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A fresh pool used by the search service, counting the clients it creates"""
+    pool = HTTPClientPool()
+    created = []
+    for name in ("_create_session", "_create_fetch_client"):
+        create = getattr(pool, name)
+
+        def counting(create=create):
+            client = create()
+            created.append(client)
+            return client
+        monkeypatch.setattr(pool, name, counting)
+    monkeypatch.setattr(search_service, "http_client_pool", pool)
+    pool.created = created
+    return pool
+
+
+async def test_searches_share_one_session_until_shutdown(pool, monkeypatch):
+    sessions = []
+
+    def get(self, url, params=None):
+        sessions.append(self)
+        return FakeSearchResponse()
+
+    monkeypatch.setattr(aiohttp.ClientSession, "get", get)
+    monkeypatch.setattr(settings, "SEARCH_CACHE_ENABLED", False)
+
+    await pool.startup()
+    results = await asyncio.gather(*[search_service.google_search(f"query {i}") for i in range(3)])
+    await search_service.google_search("query 3")
+
+    assert all(result[0]["link"] == "https://example.com/" for result in results)
+    session = pool.created[0]
+    assert len(sessions) == 4 and all(s is session for s in sessions)
+    assert sum(isinstance(client, aiohttp.ClientSession) for client in pool.created) == 1
+
+    await pool.close()
+    assert session.closed
+    # A later call, e.g. from a script, gets a new session
+    assert await pool.get_session() is not session
+    await pool.close()
+
+
+async def test_page_fetches_share_one_client_until_shutdown(pool, monkeypatch):
+    fetched = []
+
+    def handler(request):
+        fetched.append(str(request.url))
+        return httpx.Response(200, html="<html><title>Page</title><body><p>ok</p></body></html>")
+
+    client_class = httpx.AsyncClient
+    monkeypatch.setattr(http_client.httpx, "AsyncClient",
+                        lambda **kwargs: client_class(transport=httpx.MockTransport(handler), **kwargs))
+    monkeypatch.setattr(settings, "PAGE_CACHE_ENABLED", False)
+
+    urls = [f"https://example.com/{i}" for i in range(3)]
+    results = await search_service.fetch_urls_content(urls)
+    results.append(await search_service.fetch_url_content("https://example.com/3"))
+
+    assert [result.title for result in results] == ["Page"] * 4
+    assert len(fetched) == 4
+    [client] = pool.created
+    assert await pool.get_fetch_client() is client
+
+    await pool.close()
+    assert client.is_closed
+
+
+@pytest.mark.parametrize("h2_installed", [True, False])
+async def test_fetch_client_falls_back_to_http1_without_h2(pool, monkeypatch, h2_installed):
+    options = []
+    client_class = httpx.AsyncClient
+
+    def create(**kwargs):
+        options.append(kwargs)
+        return client_class(**{**kwargs, "http2": False})
+
+    monkeypatch.setattr(http_client.httpx, "AsyncClient", create)
+    monkeypatch.setattr(settings, "FETCH_HTTP2", True)
+    if not h2_installed:
+        # A None entry makes the import raise ImportError
+        monkeypatch.setitem(sys.modules, "h2", None)
+    else:
+        pytest.importorskip("h2")
+
+    await pool.get_fetch_client()
+    await pool.close()
+
+    assert options[0]["http2"] is h2_installed
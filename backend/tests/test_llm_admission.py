@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from services.llm.admission import (
+    AdmissionController, ModelLimiter, Priority, llm_priority, is_overloaded, is_retryable
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _limiter(max_concurrency=2, tokens_per_minute=1_000_000):
+    return ModelLimiter("m", max_concurrency=max_concurrency, min_concurrency=1,
+                        tokens_per_minute=tokens_per_minute, decrease_factor=0.5)
+
+
+def test_error_classification():
+    assert is_overloaded(StatusError(429)) and is_overloaded(StatusError(529))
+    assert not is_overloaded(StatusError(500))
+    assert is_retryable(StatusError(503))
+    assert not is_retryable(StatusError(400))
+    assert not is_retryable(ValueError("bad"))
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_and_priority_order():
+    """Queued requests are admitted by priority once a slot frees up"""
+    limiter = _limiter(max_concurrency=1)
+    first = await limiter.acquire(10, Priority.NORMAL)
+    order = []
+
+    async def wait(name, priority):
+        ticket = await limiter.acquire(10, priority)
+        order.append(name)
+        ticket.record_usage(5, 5)
+        limiter.release(ticket)
+
+    tasks = [asyncio.create_task(wait("background", Priority.BACKGROUND)),
+             asyncio.create_task(wait("interactive", Priority.INTERACTIVE))]
+    await asyncio.sleep(0)
+    assert limiter.stats()["waiting"] == 2
+
+    first.record_usage(5, 5)
+    limiter.release(first)
+    await asyncio.gather(*tasks)
+    assert order == ["interactive", "background"]
+
+
+@pytest.mark.asyncio
+async def test_aimd_limit_adapts():
+    limiter = _limiter(max_concurrency=8)
+    ticket = await limiter.acquire(10, Priority.NORMAL)
+    limiter.release(ticket, overloaded=True, rejected=True)
+    assert limiter.stats()["limit"] == 4
+
+    for _ in range(20):
+        ticket = await limiter.acquire(10, Priority.NORMAL)
+        ticket.record_usage(5, 5)
+        limiter.release(ticket)
+    assert 4 < limiter.stats()["limit"] <= 8
+
+
+@pytest.mark.asyncio
+async def test_token_budget_delays_admission():
+    """A request is held back while the TPM bucket is in debt"""
+    limiter = _limiter(max_concurrency=4, tokens_per_minute=600)  # 10 tokens/second
+    ticket = await limiter.acquire(605, Priority.NORMAL)
+    ticket.record_usage(300, 305)
+    limiter.release(ticket)
+
+    start = asyncio.get_running_loop().time()
+    ticket = await asyncio.wait_for(limiter.acquire(10, Priority.NORMAL), timeout=2)
+    assert asyncio.get_running_loop().time() - start >= 0.4
+    limiter.release(ticket)
+
+
+@pytest.mark.asyncio
+async def test_request_retries_overloads_with_backoff():
+    controller = AdmissionController(enabled=True, max_retries=3, retry_base_delay=0.01)
+    attempts = 0
+
+    async def send():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise StatusError(529)
+        return "ok"
+
+    with llm_priority(Priority.BACKGROUND):
+        async with controller.request("m", 10, send) as (ticket, response):
+            ticket.record_usage(5, 5)
+    assert response == "ok"
+    assert attempts == 3
+    stats = controller.stats()["m"]
+    assert stats["overloads"] == 2
+    assert stats["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_request_does_not_retry_client_errors():
+    controller = AdmissionController(enabled=True, max_retries=3, retry_base_delay=0.01)
+    attempts = 0
+
+    async def send():
+        nonlocal attempts
+        attempts += 1
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        async with controller.request("m", 10, send):
+            pass
+    assert attempts == 1
+    assert controller.stats()["m"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_releases_its_slot():
+    controller = AdmissionController(enabled=True, max_retries=3, retry_base_delay=0.01)
+    sending = asyncio.Event()
+
+    async def send():
+        sending.set()
+        await asyncio.sleep(10)
+
+    async def call():
+        async with controller.request("m", 10, send):
+            pass
+
+    for _ in range(3):
+        sending.clear()
+        task = asyncio.create_task(call())
+        await sending.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert controller.stats()["m"]["active"] == 0
@@ -0,0 +1,134 @@
+import pytest
+from services.llm.base import LLMProvider
+from services.llm.cache import (
+    CachingProvider, MemoryResponseCache, DiskResponseCache, make_cache_key
+)
+
+
+class FakeProvider(LLMProvider):
+    """Provider returning a fixed completion and counting upstream calls"""
+
+    def __init__(self, response: str = "The quick brown fox " * 10):
+        self.response = response
+        self.calls = 0
+
+    def get_default_model(self) -> str:
+        return "fake-model"
+
+    async def generate(self, prompt, model=None, max_tokens=None):
+        self.calls += 1
+        return self.response
+
+    async def generate_stream(self, prompt, model=None, max_tokens=None):
+        self.calls += 1
+        for word in self.response.split(" "):
+            yield word + " "
+
+    async def create_chat_completion(self, messages, model=None, max_tokens=None, system=None, **kwargs):
+        self.calls += 1
+        return self.response
+
+    async def create_chat_completion_stream(self, messages, model=None, max_tokens=None, system=None, **kwargs):
+        self.calls += 1
+        yield self.response[:10]
+        yield self.response[10:]
+
+    async def close(self):
+        pass
+
+
+MESSAGES = [{"role": "user", "content": "What is a fox?"}]
+
+
+def test_cache_key_covers_request_parameters():
+    base = make_cache_key("P", "m", "sys", MESSAGES, 100)
+    assert base == make_cache_key("P", "m", "sys", [dict(MESSAGES[0])], 100)
+    assert base != make_cache_key("Q", "m", "sys", MESSAGES, 100)
+    assert base != make_cache_key("P", "m2", "sys", MESSAGES, 100)
+    assert base != make_cache_key("P", "m", None, MESSAGES, 100)
+    assert base != make_cache_key("P", "m", "sys", MESSAGES, 200)
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_is_memoized():
+    """Identical requests hit the cache; the default model resolves to the same key"""
+    upstream = FakeProvider()
+    provider = CachingProvider(upstream, MemoryResponseCache(max_entries=10, ttl=60))
+
+    first = await provider.create_chat_completion(MESSAGES, system="s", max_tokens=50)
+    second = await provider.create_chat_completion(
+        MESSAGES, model="fake-model", system="s", max_tokens=50)
+    await provider.create_chat_completion(MESSAGES, system="other", max_tokens=50)
+
+    assert first == second == upstream.response
+    assert upstream.calls == 2
+    assert provider.stats()["hits"] == 1
+    assert provider.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_is_cached_and_replayed():
+    """A completed stream is cached and replayed as a stream of the same text"""
+    upstream = FakeProvider()
+    provider = CachingProvider(upstream, MemoryResponseCache(max_entries=10, ttl=60))
+
+    streamed = [c async for c in provider.create_chat_completion_stream(MESSAGES)]
+    replayed = [c async for c in provider.create_chat_completion_stream(MESSAGES)]
+    assert "".join(streamed) == "".join(replayed) == upstream.response
+    assert len(replayed) > 1
+    assert upstream.calls == 1
+    # A streamed completion also serves the equivalent non-streaming call
+    assert await provider.create_chat_completion(MESSAGES) == upstream.response
+    assert upstream.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_is_not_cached():
+    upstream = FakeProvider()
+    provider = CachingProvider(upstream, MemoryResponseCache(max_entries=10, ttl=60))
+
+    stream = provider.generate_stream("prompt")
+    await stream.__anext__()
+    await stream.aclose()
+
+    assert await provider.generate("prompt") == upstream.response
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_lru_and_ttl():
+    cache = MemoryResponseCache(max_entries=2, ttl=60)
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    await cache.get("a")
+    await cache.set("c", "3")
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+    assert len(cache) == 2
+
+    expired = MemoryResponseCache(max_entries=2, ttl=0)
+    await expired.set("a", "1")
+    assert await expired.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_disk_backend_persists_and_evicts(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = DiskResponseCache(path, max_entries=2, ttl=60)
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    await cache.get("a")
+    await cache.set("c", "3")
+    cache.close()
+
+    reopened = DiskResponseCache(path, max_entries=2, ttl=60)
+    assert await reopened.get("a") == "1"
+    assert await reopened.get("b") is None
+    assert await reopened.get("c") == "3"
+    assert len(reopened) == 2
+
+    await reopened.delete("a")
+    await reopened.delete("missing")
+    assert await reopened.get("a") is None
+    assert len(reopened) == 1
+    reopened.close()
@@ -0,0 +1,51 @@
+import logging
+import queue
+from config.logging_config import DroppingQueueHandler, SamplingFilter
+
+
+def make_record(name="services.ai_service", level=logging.DEBUG, msg="scores: %s", args=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(make_record(args=([1],)))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_dropped_records_are_not_formatted():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record())
+
+    formatted = []
+
+    class Argument:
+        def __repr__(self):
+            formatted.append(self)
+            return "argument"
+
+    handler.handle(make_record(msg="%r", args=(Argument(),)))
+    assert handler.dropped == 1
+    assert not formatted
+
+
+def test_arguments_are_merged_before_queueing():
+    handler = DroppingQueueHandler(queue.Queue())
+    scores = [1]
+    handler.handle(make_record(args=(scores,)))
+    scores.append(2)
+
+    record = handler.queue.get_nowait()
+    assert record.msg == "scores: [1]" and record.args is None
+
+
+def test_debug_records_are_sampled_per_logger():
+    sampling = SamplingFilter({"services.ai_service": 10})
+
+    kept = [sampling.filter(make_record("services.ai_service.scoring")) for _ in range(30)]
+    assert sum(kept) == 3
+    assert all(sampling.filter(make_record("services.ai_service", logging.INFO)) for _ in range(5))
+    assert all(sampling.filter(make_record("services.search_service")) for _ in range(5))
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import httpx
+import pytest
+from config.settings import settings
+from services import metrics, search_service
+from services.llm.anthropic_provider import AnthropicProvider
+from services.metrics import (
+    MetricsRegistry, OperationMetrics, fetch_metrics, llm_metrics, llm_tokens, register_cache, registry
+)
+
+
+def test_counts_from_all_threads_are_summed():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("method",))
+
+    def record():
+        for _ in range(1000):
+            requests.inc(("get",))
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert requests.value(("get",)) == 4000
+    assert 'requests_total{method="get"} 4000' in registry.render()
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("model",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, ("m",))
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{model="m",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{model="m",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{model="m",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{model="m"} 3' in lines
+    assert 'latency_seconds_sum{model="m"} 5.55' in lines
+
+
+def test_tracking_counts_in_flight_and_errors_by_type():
+    operation = OperationMetrics(MetricsRegistry(), "op", "operations", ("name",))
+    with operation.track("a"):
+        assert operation.in_flight.value(("a",)) == 1
+    with pytest.raises(TimeoutError):
+        with operation.track("a"):
+            raise TimeoutError()
+
+    assert operation.in_flight.value(("a",)) == 0
+    assert operation.duration.count(("a",)) == 2
+    assert operation.errors.value(("a", "TimeoutError")) == 1
+
+
+def test_cache_hits_and_misses_are_counters(monkeypatch):
+    monkeypatch.setattr(metrics, "_caches", {})
+    register_cache("test", lambda: {"hits": 3, "misses": 1})
+
+    lines = registry.render().splitlines()
+    assert "# TYPE cache_hits_total counter" in lines
+    assert 'cache_hits_total{cache="test"} 3' in lines
+    assert 'cache_misses_total{cache="test"} 1' in lines
+    assert 'cache_hit_ratio{cache="test"} 0.75' in lines
+
+
+class _FailingClient:
+    async def get(self, url, headers=None):
+        raise httpx.ConnectError("connection refused")
+
+
+class _SlowClient:
+    async def get(self, url, headers=None):
+        await asyncio.sleep(10)
+
+
+@pytest.mark.parametrize("client, error_type, deadline", [
+    (_FailingClient(), "ConnectError", None),
+    (_SlowClient(), "FetchDeadlineExceeded", 0.05),
+])
+async def test_failed_fetches_are_counted_once(monkeypatch, client, error_type, deadline):
+    async def get_fetch_client():
+        return client
+
+    monkeypatch.setattr(settings, "PAGE_CACHE_ENABLED", False)
+    monkeypatch.setattr(search_service.http_client_pool, "get_fetch_client", get_fetch_client)
+    before = {labels: value for _, labels, value in fetch_metrics.errors.samples()}
+
+    results = await search_service.fetch_urls_content(["https://example.com/"], deadline=deadline)
+
+    after = {labels: value for _, labels, value in fetch_metrics.errors.samples()}
+    increases = {labels[0]: value - before.get(labels, 0) for labels, value in after.items()
+                 if value != before.get(labels, 0)}
+    assert results[0].error
+    assert increases == {error_type: 1}
+    assert fetch_metrics.in_flight.value() == 0
+
+
+async def test_anthropic_streams_record_real_token_usage():
+    events = [
+        SimpleNamespace(type="message_start",
+                        message=SimpleNamespace(usage=SimpleNamespace(input_tokens=11))),
+        SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(text="Hello")),
+        SimpleNamespace(type="message_delta", usage=SimpleNamespace(output_tokens=7)),
+    ]
+
+    async def stream():
+        for event in events:
+            yield event
+
+    async def create(**params):
+        return stream()
+
+    provider = AnthropicProvider()
+    provider.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+    labels = ("anthropic", "test-model")
+    before = (llm_tokens.value(labels + ("input",)), llm_tokens.value(labels + ("output",)),
+              llm_metrics.duration.count(labels + ("chat_completion_stream",)))
+
+    chunks = [chunk async for chunk in provider.create_chat_completion_stream(
+        [{"role": "user", "content": "hi"}], model="test-model")]
+
+    assert chunks == ["Hello"]
+    assert llm_tokens.value(labels + ("input",)) - before[0] == 11
+    assert llm_tokens.value(labels + ("output",)) - before[1] == 7
+    assert llm_metrics.duration.count(labels + ("chat_completion_stream",)) - before[2] == 1
+    assert llm_metrics.in_flight.value(labels + ("chat_completion_stream",)) == 0
@@ -0,0 +1,109 @@
+import pytest
+from schemas import KnowledgeGraphElements, KnowledgeGraphNode, KnowledgeGraphRelationship
+from services.neo4j_schema import neo4j_schema
+from services.neo4j_service import Neo4jService, build_write_batches, escape_identifier
+
+
+def _elements(people: int = 3):
+    nodes = [KnowledgeGraphNode(id=f"p{i}", label="Person", properties={"name": f"P{i}"})
+             for i in range(people)]
+    nodes.append(KnowledgeGraphNode(id="c1", label="Tech`Corp", properties={}))
+    relationships = [
+        KnowledgeGraphRelationship(source=f"p{i}", target="c1", type="WORKS_AT", properties={})
+        for i in range(people)
+    ]
+    relationships.append(
+        KnowledgeGraphRelationship(source="p0", target="elsewhere", type="KNOWS", properties={}))
+    return KnowledgeGraphElements(nodes=nodes, relationships=relationships)
+
+
+def test_escape_identifier():
+    assert escape_identifier("Person") == "`Person`"
+    assert escape_identifier("a`b") == "`a``b`"
+
+
+def test_batches_group_by_label_and_type():
+    batches = build_write_batches(_elements(people=5), batch_size=2)
+
+    assert [(b.kind, b.key, len(b.rows)) for b in batches] == [
+        ("nodes", "Person", 2),
+        ("nodes", "Person", 2),
+        ("nodes", "Person", 1),
+        ("nodes", "Tech`Corp", 1),
+        ("relationships", "(Person)-[WORKS_AT]->(Tech`Corp)", 2),
+        ("relationships", "(Person)-[WORKS_AT]->(Tech`Corp)", 2),
+        ("relationships", "(Person)-[WORKS_AT]->(Tech`Corp)", 1),
+        ("relationships", "(Person)-[KNOWS]->()", 1),
+    ]
+    assert "MERGE (n:`Tech``Corp` {id: row.id})" in batches[3].query
+    works_at = batches[4].query
+    assert "MATCH (source:`Person` {id: row.source})" in works_at
+    assert "MATCH (target:`Tech``Corp` {id: row.target})" in works_at
+    assert "MATCH (target {id: row.target})" in batches[-1].query
+    assert batches[0].rows[0] == {"id": "p0", "properties": {"name": "P0"}}
+
+
+class FakeResult:
+    async def consume(self):
+        pass
+
+    async def data(self):
+        return []
+
+
+class FakeTransaction:
+    def __init__(self):
+        self.statements = []
+
+    async def run(self, query, **params):
+        self.statements.append((query, params))
+        return FakeResult()
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, parameters=None):
+        self.driver.schema_statements.append(query)
+        return FakeResult()
+
+    async def execute_write(self, work):
+        self.driver.transactions += 1
+        return await work(self.driver.tx)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.tx = FakeTransaction()
+        self.transactions = 0
+        self.schema_statements = []
+
+    def session(self, database=None):
+        return FakeSession(self)
+
+
+async def test_store_writes_all_batches_in_one_transaction(monkeypatch):
+    service = Neo4jService()
+    service.driver = FakeDriver()
+    monkeypatch.setattr(neo4j_schema, "service", service)
+
+    timings = await service.store_knowledge_graph_elements(_elements())
+
+    assert service.driver.transactions == 1
+    assert len(service.driver.tx.statements) == len(timings) == 4
+    assert all(query.startswith("UNWIND $rows AS row") for query, _ in service.driver.tx.statements)
+    assert sum(t["rows"] for t in timings) == 4 + 4
+    # Constraints for new labels are created outside the write transaction
+    assert any("REQUIRE n.id IS UNIQUE" in q for q in service.driver.schema_statements)
+
+
+async def test_store_without_connection_raises():
+    with pytest.raises(RuntimeError):
+        await Neo4jService().store_knowledge_graph_elements(_elements())
@@ -0,0 +1,92 @@
+from services.neo4j_schema import Neo4jSchemaManager, constraint_name, constraint_statement
+
+
+class SchemaError(Exception):
+    """Stands in for the error Neo4j raises when a constraint can't be created"""
+
+    code = "Neo.DatabaseError.Schema.ConstraintCreationFailed"
+
+
+class FakeService:
+    """Records schema statements and answers label and SHOW queries"""
+
+    def __init__(self, labels=(), constraints=(), indexes=(), fail_labels=(), unavailable_labels=()):
+        self.labels = list(labels)
+        self.constraints = list(constraints)
+        self.indexes = list(indexes)
+        self.fail_labels = set(fail_labels)
+        self.unavailable_labels = set(unavailable_labels)
+        self.statements = []
+
+    async def execute_query(self, query, parameters=None):
+        if query.startswith("CALL db.labels()"):
+            return [{"label": label} for label in self.labels]
+        if query.startswith("SHOW CONSTRAINTS"):
+            return self.constraints
+        if query.startswith("SHOW INDEXES"):
+            return self.indexes
+        if any(f"`{label}`" in query for label in self.fail_labels):
+            raise SchemaError("duplicate ids")
+        if any(f"`{label}`" in query for label in self.unavailable_labels):
+            self.unavailable_labels.clear()
+            raise ConnectionError("connection lost")
+        self.statements.append(query)
+        return []
+
+
+def test_constraint_statement_escapes_label():
+    assert constraint_statement("Tech Corp") == (
+        f"CREATE CONSTRAINT `{constraint_name('Tech Corp')}` IF NOT EXISTS "
+        "FOR (n:`Tech Corp`) REQUIRE n.id IS UNIQUE")
+    assert constraint_name("Tech Corp").startswith("kg_Tech_Corp_")
+
+
+def test_constraint_names_are_unique_per_label():
+    labels = ["Tech Corp", "Tech_Corp", "tech corp", "TechCorp", "Tech-Corp!"]
+    assert len({constraint_name(label) for label in labels}) == len(labels)
+
+
+async def test_migrate_creates_indexes_and_constraints_for_existing_labels():
+    service = FakeService(labels=["Person", "ResearchQuestion", "Company"])
+    await Neo4jSchemaManager(service).migrate()
+
+    assert sum("CREATE INDEX" in s for s in service.statements) == 2
+    assert [s for s in service.statements if "CONSTRAINT" in s] == [
+        constraint_statement("Company"), constraint_statement("Person")]
+
+
+async def test_label_constraints_are_created_once_and_failures_not_retried():
+    service = FakeService(fail_labels=["Broken"])
+    manager = Neo4jSchemaManager(service)
+
+    await manager.ensure_label_constraints(["Person", "Broken"])
+    await manager.ensure_label_constraints(["Person", "Broken", "Place"])
+
+    assert service.statements == [constraint_statement("Person"), constraint_statement("Place")]
+
+
+async def test_transient_failures_are_retried():
+    service = FakeService(unavailable_labels=["Person"])
+    manager = Neo4jSchemaManager(service)
+
+    await manager.ensure_label_constraints(["Person"])
+    await manager.ensure_label_constraints(["Person"])
+
+    assert service.statements == [constraint_statement("Person")]
+
+
+async def test_verify_reports_missing_schema():
+    service = FakeService(
+        labels=["Person", "Company"],
+        constraints=[{"labelsOrTypes": ["Person"], "properties": ["id"], "type": "UNIQUENESS"}],
+        indexes=[
+            {"name": "research_question_timestamp", "labelsOrTypes": ["ResearchQuestion"],
+             "properties": ["timestamp"], "state": "POPULATING"},
+        ])
+    report = await Neo4jSchemaManager(service).verify()
+
+    assert report == {
+        "missing_indexes": ["SearchResult.url"],
+        "missing_constraints": ["Company"],
+        "not_online": ["research_question_timestamp"],
+    }
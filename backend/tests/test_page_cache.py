@@ -0,0 +1,199 @@
+import asyncio
+import httpx
+import pytest
+from config.settings import settings
+from schemas import URLContent
+from services import page_cache as page_cache_module, search_service
+from services.page_cache import PageCache, normalize_url
+
+
+def test_normalize_url():
+    """Equivalent URL spellings normalize to the same key"""
+    assert normalize_url("HTTPS://Example.COM:443/a?b=2&a=1#frag") == \
+        normalize_url("https://example.com/a?a=1&b=2")
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/x") == "http://example.com:8080/x"
+
+
+@pytest.mark.asyncio
+async def test_raw_and_extracted_round_trip(tmp_path):
+    """Raw HTML and extractions are stored separately and survive a reopen"""
+    cache = PageCache(directory=str(tmp_path), ttl=60, max_bytes=10 * 1024 * 1024)
+    url = "https://example.com/page"
+    content = URLContent(url=url, title="T", text="<p>x</p>", content_type='html')
+
+    entry = await cache.put_raw(url, "<html><p>x</p></html>", etag='"abc"',
+                                last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    await cache.put_extracted(entry, "lxml", 1, content)
+    cache.close()
+
+    reopened = PageCache(directory=str(tmp_path), ttl=60, max_bytes=10 * 1024 * 1024)
+    entry = reopened.lookup("https://EXAMPLE.com/page#top")
+    assert entry is not None
+    assert reopened.is_fresh(entry)
+
+    page = await reopened.get_raw(entry)
+    assert page.html == "<html><p>x</p></html>"
+    assert page.etag == '"abc"'
+
+    assert await reopened.get_extracted(entry, "lxml", 1) == content
+    # A different engine or extractor version needs re-extraction, not a re-download
+    assert await reopened.get_extracted(entry, "bs4", 1) is None
+    assert await reopened.get_extracted(entry, "lxml", 2) is None
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_revalidation(tmp_path):
+    """Expired entries are stale until revalidated"""
+    cache = PageCache(directory=str(tmp_path), ttl=0, max_bytes=10 * 1024 * 1024)
+    entry = await cache.put_raw("https://example.com/", "<p>x</p>")
+    assert not cache.is_fresh(entry)
+
+    cache.ttl = 60
+    entry.fetched_at = 0
+    assert not cache.is_fresh(entry)
+    cache.mark_revalidated(entry)
+    assert cache.is_fresh(entry)
+    assert cache.stats()["revalidations"] == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_keeps_size_bounded(tmp_path):
+    """Least recently used pages are evicted once the size bound is exceeded"""
+    cache = PageCache(directory=str(tmp_path), ttl=60, max_bytes=4000)
+    body = "".join(f"<p>{i} unique filler text</p>" for i in range(200))
+
+    await cache.put_raw("https://example.com/1", body + "1")
+    await cache.put_raw("https://example.com/2", body + "2")
+    # Touch the first page so the second becomes least recently used
+    cache.lookup("https://example.com/1")
+    for i in range(3, 8):
+        await cache.put_raw(f"https://example.com/{i}", body + str(i))
+        cache.lookup("https://example.com/1")
+
+    assert cache.stats()["bytes"] <= 4000
+    assert cache.lookup("https://example.com/1") is not None
+    assert cache.lookup("https://example.com/2") is None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_index_grows_beyond_initial_capacity(tmp_path):
+    """The memory-mapped index grows when it runs out of slots"""
+    cache = PageCache(directory=str(tmp_path), ttl=60, max_bytes=100 * 1024 * 1024)
+    for i in range(300):
+        await cache.put_raw(f"https://example.com/{i}", "<p>x</p>")
+    cache.close()
+
+    reopened = PageCache(directory=str(tmp_path), ttl=60, max_bytes=100 * 1024 * 1024)
+    reopened.open()
+    assert reopened.stats()["entries"] == 300
+    assert reopened.lookup("https://example.com/299") is not None
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_lookups_are_not_hits(tmp_path):
+    """Only fresh entries count as hits; stale ones are counted separately"""
+    cache = PageCache(directory=str(tmp_path), ttl=60, max_bytes=10 * 1024 * 1024)
+    entry = await cache.put_raw("https://example.com/", "<p>x</p>")
+    cache.lookup("https://example.com/")
+    entry.fetched_at = 0
+    cache.lookup("https://example.com/")
+    cache.lookup("https://example.com/missing")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["stale"], stats["misses"]) == (1, 1, 1)
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_revalidation_reuses_extraction_without_reading_the_body(tmp_path, monkeypatch):
+    """A 304 is answered from meta.json and the stored extraction"""
+    cache = PageCache(directory=str(tmp_path), ttl=0, max_bytes=10 * 1024 * 1024)
+    url = "https://example.com/page"
+    content = URLContent(url=url, title="T", text="<p>x</p>", content_type='html')
+    entry = await cache.put_raw(url, "<p>x</p>", etag='"abc"')
+    await cache.put_extracted(entry, "bs4", search_service.EXTRACTOR_VERSION, content)
+
+    requests = []
+
+    class Client:
+        async def get(self, url, headers=None):
+            requests.append(headers)
+            return httpx.Response(304, request=httpx.Request("GET", url))
+
+    async def get_fetch_client():
+        return Client()
+
+    async def get_raw(entry):
+        raise AssertionError("the raw page should not be read")
+
+    monkeypatch.setattr(settings, "PAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(search_service, "page_cache", cache)
+    monkeypatch.setattr(search_service.http_client_pool, "get_fetch_client", get_fetch_client)
+    monkeypatch.setattr(cache, "get_raw", get_raw)
+
+    assert await search_service._fetch_url_content(url, "bs4") == content
+    assert requests == [{"If-None-Match": '"abc"'}]
+    assert cache.stats()["revalidations"] == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_of_one_page_never_interleave(tmp_path):
+    """Each concurrent write replaces the page whole"""
+    cache = PageCache(directory=str(tmp_path), ttl=60, max_bytes=10 * 1024 * 1024)
+    bodies = [f"<p>{i}</p>" * 20000 for i in range(5)]
+
+    await asyncio.gather(*[cache.put_raw("https://example.com/", body) for body in bodies])
+
+    entry = cache.lookup("https://example.com/")
+    page = await cache.get_raw(entry)
+    assert page.html in bodies
+    assert not [path for path in tmp_path.rglob("*.tmp")]
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_truncated_pages_are_dropped(tmp_path):
+    cache = PageCache(directory=str(tmp_path), ttl=60, max_bytes=10 * 1024 * 1024)
+    entry = await cache.put_raw("https://example.com/", "<p>x</p>" * 1000)
+    raw_path = cache._raw_path(entry.digest)
+    with open(raw_path, "rb") as f:
+        data = f.read()
+    with open(raw_path, "wb") as f:
+        f.write(data[:len(data) // 2])
+
+    assert await cache.get_raw(entry) is None
+    assert cache.lookup("https://example.com/") is None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_cache_writes_still_serve_the_page(tmp_path, monkeypatch):
+    """A full disk makes caching fail, not the fetch"""
+    cache = PageCache(directory=str(tmp_path), ttl=60, max_bytes=10 * 1024 * 1024)
+
+    def disk_full(path, write):
+        raise OSError(28, "No space left on device")
+
+    class Client:
+        async def get(self, url, headers=None):
+            return httpx.Response(200, html="<html><title>T</title><body><p>x</p></body></html>",
+                                  request=httpx.Request("GET", url))
+
+    async def get_fetch_client():
+        return Client()
+
+    monkeypatch.setattr(page_cache_module, "_write_atomic", disk_full)
+    monkeypatch.setattr(settings, "PAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(search_service, "page_cache", cache)
+    monkeypatch.setattr(search_service.http_client_pool, "get_fetch_client", get_fetch_client)
+
+    content = await search_service._fetch_url_content("https://example.com/", "bs4")
+    assert content.title == "T"
+    assert cache.stats()["entries"] == 0
+    cache.close()
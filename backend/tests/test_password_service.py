@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from models import Base, User
+from services import auth_service
+from services.password_service import PasswordService, PasswordServiceBusy
+
+
+@pytest.fixture
+def service():
+    service = PasswordService(rounds=4, max_workers=2, max_pending=2)
+    yield service
+    service.shutdown()
+
+
+async def test_hashing_runs_off_the_event_loop(service, monkeypatch):
+    threads = []
+    hash_password = service.context.hash
+
+    def record_thread(password):
+        threads.append(threading.current_thread().name)
+        return hash_password(password)
+
+    monkeypatch.setattr(service.context, "hash", record_thread)
+    hashed = await service.hash("secret123")
+
+    assert threads[0].startswith("password-hash")
+    assert await service.verify("secret123", hashed)
+    assert not await service.verify("wrong", hashed)
+
+
+async def test_calls_beyond_max_pending_are_rejected(service):
+    results = await asyncio.gather(
+        *[service.hash("secret123") for _ in range(3)], return_exceptions=True)
+
+    assert sum(isinstance(result, PasswordServiceBusy) for result in results) == 1
+    assert service.stats()["rejected"] == 1
+
+
+async def test_login_rehashes_passwords_with_another_cost(monkeypatch):
+    old = PasswordService(rounds=4)
+    new = PasswordService(rounds=5)
+    monkeypatch.setattr(auth_service, "password_service", new)
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    try:
+        async with factory() as db:
+            db.add(User(email="ada@example.com", password=old.hash_sync("secret123")))
+            await db.commit()
+
+            with pytest.raises(HTTPException):
+                await auth_service.login_user(db, "ada@example.com", "wrong")
+            await auth_service.login_user(db, "ada@example.com", "secret123")
+
+        async with factory() as db:
+            user = await auth_service.get_user_by_email(db, "ada@example.com")
+        assert user.password.startswith("$2b$05$")
+        assert new.stats()["rehashes"] == 1
+    finally:
+        new.shutdown()
+        await engine.dispose()
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from schemas import SearchResult
+from services.pre_ranker import PreRanker, bm25_scores, hashed_vectors, tokenize
+
+
+def _result(title: str, snippet: str, n: int) -> SearchResult:
+    return SearchResult(title=title, link=f"https://example.com/{n}", snippet=snippet,
+                        displayLink="example.com", pagemap={})
+
+
+RESULTS = [
+    _result("Python asyncio tutorial", "Learn asyncio event loops and coroutines in Python", 0),
+    _result("Cooking pasta at home", "A guide to boiling pasta and making sauce", 1),
+    _result("Concurrency in Python", "Threads, processes and async programming compared", 2),
+]
+
+
+def test_bm25_prefers_documents_with_query_terms():
+    documents = [tokenize(r.title + " " + r.snippet) for r in RESULTS]
+    scores = bm25_scores(tokenize("python asyncio coroutines"), documents)
+    assert scores.shape == (3,)
+    assert scores[0] > scores[2] > scores[1] == 0
+    assert np.all(scores < 1)
+
+
+def test_hashed_vectors_are_normalized_and_match_variants():
+    vectors = hashed_vectors([tokenize("coroutine"), tokenize("coroutines"), tokenize("pasta")])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+@pytest.mark.asyncio
+async def test_local_mode_never_calls_llm():
+    ranker = PreRanker(mode="local", band_low=20, band_high=60, bm25_weight=0.5)
+
+    async def llm_score(query, results):
+        raise AssertionError("LLM should not be called in local mode")
+
+    ranked = await ranker.rank("python asyncio", RESULTS, llm_score)
+    assert ranked[0].link == "https://example.com/0"
+    assert ranked[-1].link == "https://example.com/1"
+    assert all(0 <= r.relevance_score <= 100 for r in ranked)
+    # Inputs are not mutated
+    assert all(r.relevance_score == 0.0 for r in RESULTS)
+
+
+@pytest.mark.asyncio
+async def test_hybrid_mode_sends_only_middle_band_to_llm():
+    ranker = PreRanker(mode="llm", band_low=20, band_high=60, bm25_weight=0.5)
+    local = dict(zip([r.link for r in RESULTS],
+                     ranker.score("python asyncio", [f"{r.title} {r.snippet}" for r in RESULTS])))
+    ranker.band_low = min(local.values()) + 0.01
+    ranker.band_high = max(local.values()) - 0.01
+    sent = []
+
+    async def llm_score(query, results):
+        sent.extend(r.link for r in results)
+        scored = []
+        for r in results:
+            copy = r.copy()
+            copy.relevance_score = 99.0
+            scored.append(copy)
+        return scored
+
+    ranked = await ranker.rank("python asyncio", RESULTS, llm_score, mode="hybrid")
+    assert sent == ["https://example.com/2"]
+    assert ranked[0].link == "https://example.com/2"
+    assert ranked[0].relevance_score == 99.0
+
+
+@pytest.mark.asyncio
+async def test_hybrid_mode_calibrates_kept_scores_against_llm_scores():
+    ranker = PreRanker(mode="hybrid", band_low=10, band_high=60, bm25_weight=0.5,
+                       calibrated_low=30, calibrated_high=90)
+    # A near-exact title kept above the band, a weaker one the LLM rates 80, and a miss
+    ranker.score = lambda query, texts: np.array([64.8, 38.9, 5.0])
+
+    async def llm_score(query, results):
+        scored = []
+        for r in results:
+            copy = r.copy()
+            copy.relevance_score = 80.0
+            scored.append(copy)
+        return scored
+
+    ranked = await ranker.rank("python asyncio", RESULTS, llm_score)
+    assert [r.link for r in ranked] == [
+        "https://example.com/0", "https://example.com/1", "https://example.com/2"]
+    assert ranked[0].relevance_score == 91.2
+    assert ranked[1].relevance_score == 80.0
+    assert ranked[2].relevance_score == 15.0
+
+
+@pytest.mark.asyncio
+async def test_llm_mode_delegates_everything():
+    ranker = PreRanker(mode="llm", band_low=20, band_high=60, bm25_weight=0.5)
+
+    async def llm_score(query, results):
+        return list(results)
+
+    assert await ranker.rank("q", RESULTS, llm_score) == RESULTS
+    with pytest.raises(ValueError):
+        await ranker.rank("q", RESULTS, llm_score, mode="embedding")
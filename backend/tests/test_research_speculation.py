@@ -0,0 +1,117 @@
+import asyncio
+import json
+import pytest
+from config.settings import settings
+from services.ai_service import ai_service
+from services.research_service import ResearchService, ANALYSIS_RESTART_MARKER
+from services.stream_parser import MarkdownEventParser, stream_events
+
+CONTEXT = "\n\nCurrent Events Context:\n- News: something happened"
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Fake analysis streams and a current events check taking check_delay seconds"""
+    state = {"check_delay": 0.0, "context": None, "prompts": [], "closed": 0}
+
+    async def analyze_question_stream(question, model=None):
+        state["prompts"].append(question)
+        try:
+            for i in range(5):
+                await asyncio.sleep(0.01)
+                yield f"chunk{i} "
+        finally:
+            state["closed"] += 1
+
+    async def analyze_question_context_stream(question, analysis, context_summary, model=None):
+        state["merge_input"] = (analysis, context_summary)
+        yield "## Current Events Context\n"
+        yield "- Something happened, narrowing the scope\n"
+
+    async def context_summary(self, question):
+        await asyncio.sleep(state["check_delay"])
+        return state["context"]
+
+    monkeypatch.setattr(ai_service, "analyze_question_stream", analyze_question_stream)
+    monkeypatch.setattr(ai_service, "analyze_question_context_stream",
+                        analyze_question_context_stream)
+    monkeypatch.setattr(ResearchService, "_current_events_context_summary", context_summary)
+    return state
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+async def test_speculative_without_context_streams_plain_analysis(fake_llm):
+    fake_llm["check_delay"] = 0.02
+    chunks = await _collect(ResearchService().analyze_question_stream("q", speculative=True))
+
+    assert "".join(chunks) == "chunk0 chunk1 chunk2 chunk3 chunk4 "
+    assert fake_llm["prompts"] == ["q"]
+
+
+async def test_speculative_streams_before_check_completes(fake_llm):
+    fake_llm["check_delay"] = 0.5
+    stream = ResearchService().analyze_question_stream("q", speculative=True)
+    first = await asyncio.wait_for(anext(stream), timeout=0.25)
+    await stream.aclose()
+
+    assert first == "chunk0 "
+
+
+async def test_speculative_merge_appends_context_section(fake_llm, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_SPECULATION_STRATEGY", "merge")
+    fake_llm["check_delay"] = 0.02
+    fake_llm["context"] = CONTEXT
+    text = "".join(await _collect(ResearchService().analyze_question_stream("q", speculative=True)))
+
+    assert text.startswith("chunk0 chunk1 chunk2 chunk3 chunk4 ")
+    assert text.endswith("## Current Events Context\n- Something happened, narrowing the scope\n")
+    assert fake_llm["merge_input"] == ("chunk0 chunk1 chunk2 chunk3 chunk4 ", CONTEXT)
+    assert fake_llm["prompts"] == ["q"]
+
+
+async def test_speculative_restart_cancels_plain_analysis(fake_llm, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_SPECULATION_STRATEGY", "restart")
+    fake_llm["check_delay"] = 0.025
+    fake_llm["context"] = CONTEXT
+    chunks = await _collect(ResearchService().analyze_question_stream("q", speculative=True))
+
+    restart = chunks.index(ANALYSIS_RESTART_MARKER)
+    assert 0 < restart < 5
+    assert "".join(chunks[restart + 1:]) == "chunk0 chunk1 chunk2 chunk3 chunk4 "
+    assert fake_llm["prompts"] == ["q", "q" + CONTEXT]
+    assert fake_llm["closed"] == 2
+
+
+async def test_sequential_analyzes_enhanced_question(fake_llm):
+    fake_llm["context"] = CONTEXT
+    chunks = await _collect(ResearchService().analyze_question_stream("q", speculative=False))
+
+    assert len(chunks) == 5
+    assert fake_llm["prompts"] == ["q" + CONTEXT]
+
+
+async def test_merged_context_reaches_structured_events(fake_llm, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_SPECULATION_STRATEGY", "merge")
+    fake_llm["check_delay"] = 0.02
+    fake_llm["context"] = CONTEXT
+    stream = ResearchService().analyze_question_stream("q", speculative=True)
+    parser = MarkdownEventParser(markers={ANALYSIS_RESTART_MARKER.strip(): "restart"})
+    events = [json.loads(line) for line in await _collect(stream_events(stream, parser))]
+
+    assert {"type": "current_events_context",
+            "data": ["Something happened, narrowing the scope"]} in events
+
+
+async def test_restart_marker_becomes_a_restart_event(fake_llm, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_SPECULATION_STRATEGY", "restart")
+    fake_llm["check_delay"] = 0.025
+    fake_llm["context"] = CONTEXT
+    stream = ResearchService().analyze_question_stream("q", speculative=True)
+    parser = MarkdownEventParser(markers={ANALYSIS_RESTART_MARKER.strip(): "restart"})
+    events = [json.loads(line) for line in await _collect(stream_events(stream, parser))]
+
+    assert [event["type"] for event in events].count("restart") == 1
+    assert all(ANALYSIS_RESTART_MARKER.strip() not in json.dumps(event) for event in events)
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from services.search_cache import SearchCache, make_search_key
+
+RESULTS = [{'title': 'T', 'link': 'https://example.com', 'snippet': 's',
+            'displayLink': 'example.com', 'pagemap': {}}]
+
+
+def test_make_search_key_normalizes_query():
+    """Case and whitespace differences share a key; other parameters do not"""
+    assert make_search_key("  Python  Asyncio ", 10, "en", "off", "cx") == \
+        make_search_key("python asyncio", 10, "en", "off", "cx")
+    assert make_search_key("python", 10, "en", "off", "cx") != make_search_key("python", 5, "en", "off", "cx")
+    assert make_search_key("python", 10, "en", "off", "cx") != make_search_key("python", 10, "de", "off", "cx")
+    assert make_search_key("python", 10, "en", "off", "cx") != make_search_key("python", 10, "en", "off", "other")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_queries_share_one_request():
+    """In-flight requests are coalesced and later calls are served from memory"""
+    cache = SearchCache(ttl=60, max_bytes=1024 * 1024, sqlite_path=None)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return RESULTS
+
+    results = await asyncio.gather(*[cache.get_or_fetch("k", fetch) for _ in range(5)])
+    assert all(r == RESULTS for r in results)
+    assert await cache.get_or_fetch("k", fetch) == RESULTS
+    assert calls == 1
+    assert cache.stats()["coalesced"] == 4
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    """A failed upstream call propagates to all waiters and is retried next time"""
+    cache = SearchCache(ttl=60, max_bytes=1024 * 1024, sqlite_path=None)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exceeded")
+
+    async def succeeding():
+        return RESULTS
+
+    outcomes = await asyncio.gather(
+        cache.get_or_fetch("k", failing), cache.get_or_fetch("k", failing),
+        return_exceptions=True)
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert await cache.get_or_fetch("k", succeeding) == RESULTS
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_memory_bound():
+    """Expired entries are refetched and the LRU stays within its byte bound"""
+    cache = SearchCache(ttl=0, max_bytes=1024 * 1024, sqlite_path=None)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return RESULTS
+
+    await cache.get_or_fetch("k", fetch)
+    await cache.get_or_fetch("k", fetch)
+    assert calls == 2
+
+    cache = SearchCache(ttl=60, max_bytes=400, sqlite_path=None)
+    for i in range(10):
+        await cache.get_or_fetch(f"k{i}", fetch)
+    assert cache.stats()["bytes"] <= 400
+    assert cache.stats()["entries"] < 10
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backing_survives_restart(tmp_path):
+    """Results stored in SQLite are served by a fresh cache instance"""
+    path = str(tmp_path / "search.sqlite3")
+    first = SearchCache(ttl=60, max_bytes=1024 * 1024, sqlite_path=path)
+
+    async def fetch():
+        return RESULTS
+
+    await first.get_or_fetch("k", fetch)
+    first.close()
+
+    async def unexpected():
+        raise AssertionError("should be served from disk")
+
+    second = SearchCache(ttl=60, max_bytes=1024 * 1024, sqlite_path=path)
+    assert await second.get_or_fetch("k", unexpected) == RESULTS
+    assert second.stats()["disk_hits"] == 1
+    second.close()
@@ -0,0 +1,124 @@
+import json
+from services.stream_parser import (
+    JSONEventParser, MarkdownEventParser, section_key, stream_events
+)
+
+ANALYSIS = """## Key Components
+- First component
+- Second **component**
+
+## Scope Boundaries
+Some context.
+- Only cities
+"""
+
+
+def _feed_in_chunks(parser, text, size=7):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events + parser.finish()
+
+
+def test_section_key():
+    assert section_key("Key Components") == "key_components"
+    assert section_key("**Success Criteria:**") == "success_criteria"
+
+
+def test_markdown_events_follow_sections_and_items():
+    events = _feed_in_chunks(MarkdownEventParser(), ANALYSIS)
+
+    assert events == [
+        {"type": "section_started", "section": "key_components", "data": "Key Components"},
+        {"type": "item", "section": "key_components", "data": "First component"},
+        {"type": "item", "section": "key_components", "data": "Second **component**"},
+        {"type": "key_components", "data": ["First component", "Second **component**"]},
+        {"type": "section_started", "section": "scope_boundaries", "data": "Scope Boundaries"},
+        {"type": "text", "section": "scope_boundaries", "data": "Some context."},
+        {"type": "item", "section": "scope_boundaries", "data": "Only cities"},
+        {"type": "scope_boundaries", "data": ["Only cities"]},
+    ]
+
+
+def test_markdown_item_is_emitted_once_its_line_completes():
+    parser = MarkdownEventParser(default_section="queries")
+
+    assert parser.feed("- first que") == []
+    assert parser.feed("ry\n- sec") == [{"type": "item", "section": "queries", "data": "first query"}]
+    assert parser.finish() == [
+        {"type": "item", "section": "queries", "data": "sec"},
+        {"type": "queries", "data": ["first query", "sec"]},
+    ]
+
+
+def test_markdown_markers_reset_sections():
+    parser = MarkdownEventParser(markers={"<!-- restart -->": "restart"})
+    events = _feed_in_chunks(parser, "## A\n- one\n<!-- restart -->\n## A\n- two\n")
+
+    assert {"type": "restart"} in events
+    assert [e for e in events if e["type"] == "a"] == [{"type": "a", "data": ["two"]}]
+
+
+def test_json_fields_are_emitted_as_they_complete():
+    text = json.dumps({
+        "requires_current_context": True,
+        "reasoning": "Recent events",
+        "search_queries": ["q1", "q2"],
+    })
+    parser = JSONEventParser()
+    events = []
+    seen_reasoning_before_end = False
+    for i in range(0, len(text), 4):
+        events.extend(parser.feed(text[i:i + 4]))
+        if not parser._parser.complete and {"type": "reasoning", "data": "Recent events"} in events:
+            seen_reasoning_before_end = True
+    events.extend(parser.finish())
+
+    assert seen_reasoning_before_end
+    assert events == [
+        {"type": "requires_current_context", "data": True},
+        {"type": "reasoning", "data": "Recent events"},
+        {"type": "item", "field": "search_queries", "data": "q1"},
+        {"type": "item", "field": "search_queries", "data": "q2"},
+        {"type": "search_queries", "data": ["q1", "q2"]},
+    ]
+
+
+def test_json_fields_are_parsed_once():
+    items = [f"query {i}" for i in range(200)]
+    text = json.dumps({"reasoning": "r", "search_queries": items})
+    parser = JSONEventParser()
+
+    def reparse():
+        raise AssertionError("the whole response should not be re-parsed per chunk")
+
+    parser._parser.value = reparse
+    events = []
+    for i in range(0, len(text), 3):
+        events.extend(parser.feed(text[i:i + 3]))
+
+    assert [e["data"] for e in events if e["type"] == "item"] == items
+    assert events[-1] == {"type": "search_queries", "data": items}
+
+
+def test_json_fields_left_open_are_emitted_at_the_end():
+    parser = JSONEventParser()
+    events = _feed_in_chunks(parser, '{"reasoning": "r", "search_queries": ["q1", "q2"')
+
+    assert events == [
+        {"type": "reasoning", "data": "r"},
+        {"type": "item", "field": "search_queries", "data": "q1"},
+        {"type": "item", "field": "search_queries", "data": "q2"},
+        {"type": "search_queries", "data": ["q1", "q2"]},
+    ]
+
+
+async def test_stream_events_encodes_ndjson():
+    async def chunks():
+        yield "- a\n"
+        yield "- b"
+
+    lines = [line async for line in stream_events(chunks(), MarkdownEventParser(default_section="queries"))]
+
+    assert all(line.endswith("\n") for line in lines)
+    assert json.loads(lines[-1]) == {"type": "queries", "data": ["a", "b"]}
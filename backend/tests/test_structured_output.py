@@ -0,0 +1,163 @@
+import json
+from typing import List
+import pytest
+from schemas import QuestionAnalysis, RelevanceScore
+from services.llm.base import LLMProvider
+from services.llm.cache import CachingProvider, MemoryResponseCache
+from services.llm.structured import (
+    PartialJSONParser, StructuredOutput, StructuredOutputError, parse_json
+)
+
+ANALYSIS = {
+    "key_components": ["a"], "scope_boundaries": ["b"],
+    "success_criteria": ["c"], "conflicting_viewpoints": []
+}
+
+
+class FakeProvider(LLMProvider):
+    """Provider returning queued chat and structured responses and recording requests"""
+
+    def __init__(self, structured=None, chat=None):
+        self.structured = list(structured or [])
+        self.chat = list(chat or [])
+        self.requests = []
+
+    def get_default_model(self) -> str:
+        return "fake-model"
+
+    async def generate(self, prompt, model=None, max_tokens=None):
+        raise NotImplementedError
+
+    async def generate_stream(self, prompt, model=None, max_tokens=None):
+        raise NotImplementedError
+        yield
+
+    async def create_chat_completion(self, messages, model=None, max_tokens=None, system=None, **kwargs):
+        self.requests.append(("chat", messages))
+        return self.chat.pop(0)
+
+    async def create_chat_completion_stream(self, messages, model=None, max_tokens=None, system=None, **kwargs):
+        raise NotImplementedError
+        yield
+
+    async def create_structured_completion(self, messages, schema, name, model=None, max_tokens=None, system=None):
+        self.requests.append(("structured", schema))
+        return self.structured.pop(0)
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": [1, 2]}\n```', {"a": [1, 2]}),
+    ('Here you go: [{"url": "x", "score": 5}] Thanks!', [{"url": "x", "score": 5}]),
+    ('{"answer": "Truncated ans', {"answer": "Truncated ans"}),
+    ('{"answer": "x", "sources_used": ["https://a", "https://b', {"answer": "x", "sources_used": ["https://a", "https://b"]}),
+    ('{"answer": "x", "sources_used": ["https://a"], "confidence_sc', {"answer": "x", "sources_used": ["https://a"]}),
+    ('{"a": 1, "b": tr', {"a": 1}),
+    ('{"a": "quote \\" and slash \\', {"a": 'quote " and slash '}),
+    ('{"a": {"b": [1, {"c": ', {"a": {"b": [1, {}]}}),
+])
+def test_parse_json_tolerates_fences_and_truncation(text, expected):
+    assert parse_json(text) == expected
+
+
+def test_parse_json_without_json_raises():
+    with pytest.raises(ValueError):
+        parse_json("I cannot answer that.")
+
+
+def test_partial_parser_is_incremental():
+    text = json.dumps({"items": ["one", "two"], "done": True})
+    parser = PartialJSONParser()
+    values = []
+    for i in range(0, len(text), 5):
+        parser.feed(text[i:i + 5])
+        try:
+            values.append(parser.value())
+        except ValueError:
+            pass
+
+    assert parser.complete
+    assert values[-1] == {"items": ["one", "two"], "done": True}
+    assert {"items": ["one"]} in values
+
+
+def test_partial_parser_reports_members_as_they_complete():
+    text = 'Sure: {"items": ["one", {"a": 1}], "nested": {"x": [1]}, "empty": [], "done": true}'
+    parser = PartialJSONParser()
+    members = []
+    for char in text:
+        parser.feed(char)
+        members.extend(parser.take_members())
+
+    assert members == [
+        (("items", 0), "one"),
+        (("items", 1), {"a": 1}),
+        (("items",), ["one", {"a": 1}]),
+        (("nested", "x"), [1]),
+        (("nested",), {"x": [1]}),
+        (("empty",), []),
+        (("done",), True),
+    ]
+
+
+async def test_generate_validates_native_output():
+    provider = FakeProvider(structured=[json.dumps(ANALYSIS)])
+    result = await StructuredOutput(native=True).generate(
+        provider, QuestionAnalysis, [{"role": "user", "content": "q"}])
+
+    assert result == QuestionAnalysis(**ANALYSIS)
+    kind, schema = provider.requests[0]
+    assert kind == "structured" and "key_components" in schema["properties"]
+
+
+async def test_list_outputs_are_wrapped_for_tool_use():
+    provider = FakeProvider(structured=[json.dumps({"result": [{"url": "x", "score": 70}]})])
+    result = await StructuredOutput(native=True).generate(
+        provider, List[RelevanceScore], [{"role": "user", "content": "q"}], name="scores")
+
+    assert result == [RelevanceScore(url="x", score=70)]
+    assert provider.requests[0][1]["type"] == "object"
+
+
+async def test_invalid_output_is_repaired_without_regenerating():
+    provider = FakeProvider(
+        structured=['{"key_components": ["a"]}'],
+        chat=[json.dumps(ANALYSIS)])
+    engine = StructuredOutput(native=True, repair_attempts=1)
+    result = await engine.generate(provider, QuestionAnalysis, [{"role": "user", "content": "q"}])
+
+    assert result == QuestionAnalysis(**ANALYSIS)
+    assert [kind for kind, _ in provider.requests] == ["structured", "chat"]
+    repair_prompt = provider.requests[1][1][0]["content"]
+    assert '{"key_components": ["a"]}' in repair_prompt and "scope_boundaries" in repair_prompt
+    assert engine.stats()["repaired"] == 1
+
+
+async def test_generate_raises_after_failed_repairs():
+    provider = FakeProvider(chat=["not json", "still not json"])
+    engine = StructuredOutput(native=False, repair_attempts=1)
+
+    with pytest.raises(StructuredOutputError):
+        await engine.generate(provider, QuestionAnalysis, [{"role": "user", "content": "q"}])
+    assert engine.stats()["failures"] == 1
+
+
+async def test_failed_validation_is_not_served_from_cache():
+    upstream = FakeProvider(
+        structured=['{"key_components": ["a"]}', json.dumps(ANALYSIS)],
+        chat=["still not json"])
+    provider = CachingProvider(upstream, MemoryResponseCache(max_entries=10, ttl=60))
+    engine = StructuredOutput(native=True, repair_attempts=1)
+    messages = [{"role": "user", "content": "q"}]
+
+    with pytest.raises(StructuredOutputError):
+        await engine.generate(provider, QuestionAnalysis, messages)
+    assert len(provider.cache) == 0
+
+    result = await engine.generate(provider, QuestionAnalysis, messages)
+    assert result == QuestionAnalysis(**ANALYSIS)
+    assert [kind for kind, _ in upstream.requests] == ["structured", "chat", "structured"]
+    assert len(provider.cache) == 1
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import httpx
+import pytest
+from services import research_service, tracing
+from services.tracing import (
+    JSONLinesExporter, OTLPJSONExporter, NOOP_SPAN, Tracer, current_span, traced, tracer
+)
+
+
+@pytest.fixture
+def spans(tmp_path, monkeypatch):
+    """Enable the shared tracer, writing JSON lines to a temporary file, and read back its spans"""
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "exporter", JSONLinesExporter(str(path)))
+
+    def read():
+        tracer.flush()
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+    yield read
+    tracer.flush()
+
+
+@traced("test.step")
+async def step(value):
+    await asyncio.sleep(0)
+    return value
+
+
+@traced("test.items")
+async def items():
+    for i in range(2):
+        yield await step(i)
+
+
+async def test_spans_nest_through_coroutines_generators_and_tasks(spans):
+    consumer_spans = []
+    with tracer.span("request") as root:
+        async for _ in items():
+            # The generator's span is not current in the consumer between items
+            consumer_spans.append(current_span())
+        await asyncio.gather(asyncio.create_task(step("task")))
+
+    assert consumer_spans == [root, root]
+    recorded = {span["span_id"]: span for span in spans()}
+    by_name = {}
+    for span in recorded.values():
+        by_name.setdefault(span["name"], []).append(span)
+
+    generator_span = by_name["test.items"][0]
+    assert generator_span["parent_id"] == root.span_id
+    parents = sorted(recorded[span["parent_id"]]["name"] for span in by_name["test.step"])
+    assert parents == ["request", "test.items", "test.items"]
+    assert len({span["trace_id"] for span in recorded.values()}) == 1
+
+
+async def test_errors_are_recorded(spans):
+    @traced("test.failing")
+    async def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await failing()
+
+    [span] = spans()
+    assert span["status"] == "error" and span["error"] == "ValueError: boom"
+
+
+def test_disabled_tracer_calls_functions_directly():
+    disabled = Tracer(exporter="none")
+    assert disabled.span("anything") is NOOP_SPAN
+
+    async def generator():
+        yield 1
+
+    wrapped = traced("test.disabled")(generator)
+    assert not tracer.enabled
+    assert type(wrapped()).__name__ == "async_generator"
+    assert wrapped().__qualname__ == generator().__qualname__
+
+
+def test_otlp_export_format():
+    span = tracing.Span(tracer, "llm.chat_completion", None, attributes={"input_tokens": 12})
+    span.end_ns = span.start_ns + 1000
+    [line] = OTLPJSONExporter("unused", service_name="research").format([span])
+
+    resource_spans = json.loads(line)["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "research"}
+    otlp_span = resource_spans["scopeSpans"][0]["spans"][0]
+    assert len(otlp_span["traceId"]) == 32 and len(otlp_span["spanId"]) == 16
+    assert otlp_span["endTimeUnixNano"] == str(span.start_ns + 1000)
+    assert {"key": "input_tokens", "value": {"intValue": "12"}} in otlp_span["attributes"]
+
+
+async def test_request_spans_cover_streamed_responses(spans, monkeypatch):
+    from main import app
+    from services import auth_service
+
+    async def execute_queries_stream(queries, scoring_mode=None):
+        for query in queries:
+            yield await step(query)
+
+    monkeypatch.setattr(research_service, "execute_queries_stream", execute_queries_stream)
+    app.dependency_overrides[auth_service.validate_token] = lambda: None
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/api/research/execute-queries/stream",
+                json={"queries": ["a", "b"]},
+                headers={"X-Correlation-ID": "req-123"})
+    finally:
+        app.dependency_overrides.pop(auth_service.validate_token)
+
+    assert response.headers["X-Correlation-ID"] == "req-123"
+    recorded = spans()
+    [request_span] = [span for span in recorded if span["kind"] == "server"]
+    steps = [span for span in recorded if span["name"] == "test.step"]
+    assert request_span["name"] == "POST /api/research/execute-queries/stream"
+    assert request_span["attributes"]["status_code"] == 200
+    assert len(steps) == 2
+    assert all(span["parent_id"] == request_span["span_id"] for span in steps)
+    assert all(span["correlation_id"] == "req-123" for span in recorded)
+
+
+async def test_untraced_responses_are_not_wrapped():
+    from fastapi import Request
+    from fastapi.responses import StreamingResponse
+    from main import log_requests
+
+    async def body():
+        yield b"ok"
+
+    response = StreamingResponse(body())
+    iterator = response.body_iterator
+
+    async def call_next(request):
+        return response
+
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    assert await log_requests(request, call_next) is response
+    assert response.body_iterator is iterator
+    assert "X-Correlation-ID" in response.headers
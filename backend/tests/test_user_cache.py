@@ -0,0 +1,107 @@
+import time
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from models import Base
+from schemas import UserCreate
+from services import auth_service
+from services.user_cache import UserCache, UserPrincipal, user_cache
+
+ADA = UserPrincipal(1, "ada@example.com")
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    user_cache.clear()
+    yield factory
+    user_cache.clear()
+    await engine.dispose()
+
+
+def test_entries_do_not_outlive_the_token():
+    cache = UserCache(ttl=300, negative_ttl=30, max_entries=10, enabled=True)
+    cache.set(ADA.email, ADA, time.time() - 1, cache.generation)
+    assert cache.get(ADA.email) == (False, None)
+
+    cache.set(ADA.email, ADA, time.time() + 60, cache.generation)
+    assert cache.get(ADA.email) == (True, ADA)
+
+
+def test_unknown_users_are_cached_negatively():
+    cache = UserCache(ttl=300, negative_ttl=30, max_entries=10, enabled=True)
+    cache.set("nobody@example.com", None, time.time() + 60, cache.generation)
+    assert cache.get("nobody@example.com") == (True, None)
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = UserCache(ttl=300, negative_ttl=30, max_entries=2, enabled=True)
+    for subject in ("a", "b"):
+        cache.set(subject, ADA, None, cache.generation)
+    cache.get("a")
+    cache.set("c", ADA, None, cache.generation)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, ADA)
+
+
+def test_loads_started_before_an_invalidation_are_not_stored():
+    cache = UserCache(ttl=300, negative_ttl=30, max_entries=10, enabled=True)
+    generation = cache.generation
+    cache.invalidate(ADA.email)
+    cache.set(ADA.email, ADA, None, generation)
+    assert cache.get(ADA.email) == (False, None)
+
+
+async def test_validate_token_caches_users_and_is_invalidated_by_writes(session_factory):
+    async with session_factory() as db:
+        await auth_service.create_user(db, UserCreate(email="ada@example.com", password="secret123"))
+        token = await auth_service.login_user(db, "ada@example.com", "secret123")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token.access_token)
+
+    first = await auth_service.validate_token(credentials, session_factory)
+    misses = user_cache.stats()["misses"]
+    second = await auth_service.validate_token(credentials, session_factory)
+    assert first == second
+    assert user_cache.stats()["misses"] == misses
+
+    # Deleting the user invalidates the cached principal
+    async with session_factory() as db:
+        user = await auth_service.get_user_by_email(db, "ada@example.com")
+        await db.delete(user)
+        await db.commit()
+    with pytest.raises(HTTPException) as error:
+        await auth_service.validate_token(credentials, session_factory)
+    assert error.value.status_code == 401
+    assert user_cache.get("ada@example.com") == (True, None)
+
+    # Registering again invalidates the negative entry
+    async with session_factory() as db:
+        await auth_service.create_user(db, UserCreate(email="ada@example.com", password="secret123"))
+    assert (await auth_service.validate_token(credentials, session_factory)).email == "ada@example.com"
+
+
+async def test_writes_invalidate_only_once_committed(session_factory):
+    async with session_factory() as db:
+        await auth_service.create_user(db, UserCreate(email="ada@example.com", password="secret123"))
+
+    async with session_factory() as db:
+        user = await auth_service.get_user_by_email(db, "ada@example.com")
+        user_cache.set("ada@example.com", ADA, None, user_cache.generation)
+        user.password = "rehashed"
+        await db.flush()
+        assert user_cache.get("ada@example.com") == (True, ADA)
+
+        await db.rollback()
+        await db.commit()
+        assert user_cache.get("ada@example.com") == (True, ADA)
+
+        user = await auth_service.get_user_by_email(db, "ada@example.com")
+        user.password = "rehashed"
+        await db.commit()
+    assert user_cache.get("ada@example.com") == (False, None)
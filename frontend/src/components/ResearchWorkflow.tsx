@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { researchApi, QuestionAnalysisResponse, SearchResult, ResearchAnswer as ResearchAnswerType, ResearchEvaluation, QuestionImprovement as QuestionImprovementType } from '../lib/api/researchApi';
+import { researchApi, ANALYSIS_RESTART_MARKER, QuestionAnalysisResponse, SearchResult, ResearchAnswer as ResearchAnswerType, ResearchEvaluation, QuestionImprovement as QuestionImprovementType } from '../lib/api/researchApi';
 import { searchApi, URLContent } from '../lib/api/searchApi';
 import {
     InitialQuestion,
@@ -93,6 +93,15 @@ const ResearchWorkflow: React.FC = () => {
                 }
 
                 accumulatedContent += update.data;
+
+                // A restarted analysis replaces everything streamed before it
+                const restartIndex = accumulatedContent.lastIndexOf(ANALYSIS_RESTART_MARKER);
+                if (restartIndex !== -1) {
+                    accumulatedContent = accumulatedContent
+                        .slice(restartIndex + ANALYSIS_RESTART_MARKER.length)
+                        .replace(/^\n+/, '');
+                }
+
                 // Update display content
                 setAnalysisMarkdown(accumulatedContent);
             }
@@ -126,6 +135,9 @@ const ResearchWorkflow: React.FC = () => {
                 else if (firstLine.includes('conflicting viewpoints')) {
                     finalAnalysis.conflicting_viewpoints = items;
                 }
+                else if (firstLine.includes('current events context')) {
+                    finalAnalysis.current_events_context = items;
+                }
             });
 
             setAnalysis(finalAnalysis);
@@ -161,6 +173,10 @@ ${analysis.scope_boundaries.map(b => `- ${b}`).join('\n')}
 
 Success Criteria:
 ${analysis.success_criteria.map(c => `- ${c}`).join('\n')}
+${analysis.current_events_context?.length ? `
+Current Events Context:
+${analysis.current_events_context.map(c => `- ${c}`).join('\n')}
+` : ''}
             `.trim();
 
             setEnhancedQuestion(enhancedQuestionText);
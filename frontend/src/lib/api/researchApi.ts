@@ -7,8 +7,13 @@ export interface QuestionAnalysisResponse {
     scope_boundaries: string[];
     success_criteria: string[];
     conflicting_viewpoints: string[];
+    // Present when the analysis was written before current events context was available
+    current_events_context?: string[];
 }
 
+// Sent by the speculative analysis stream when it starts over with current events context
+export const ANALYSIS_RESTART_MARKER = '<!-- analysis-restart -->';
+
 export interface ResearchEvaluation {
     completeness_score: number;
     accuracy_score: number;